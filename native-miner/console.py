@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Non-Blocking Console Renderer
+One thread owns the terminal. Everyone else hands it log lines and status
+updates without waiting, so a slow console (remote session, Windows console,
+redirected file) can no longer block the threads that read XMRig's and the
+bridge's output - which used to fill XMRig's stdout pipe and stall it.
+
+- log() appends to a bounded ring buffer (QUEUE_CAPACITY lines); when the
+  renderer falls behind, the oldest lines are dropped and counted, and a
+  "N lines dropped" notice is printed once it catches up
+- status() only stores the latest status; the bar is redrawn at most every
+  REDRAW_INTERVAL, and only when its text changed or log lines scrolled it away
+- headless mode writes JSON lines instead (one object per log line, status
+  objects at most every HEADLESS_STATUS_INTERVAL when they changed), without
+  colors or cursor control - for servers and log collectors
+
+Usage:
+  python console.py                    # demo: flood the renderer, watch drops
+  python console.py --headless
+"""
+
+import re
+import sys
+import json
+import time
+import threading
+from collections import deque
+
+QUEUE_CAPACITY = 1000             # Log lines buffered before the oldest are dropped
+REDRAW_INTERVAL = 0.25            # Seconds between terminal writes (lines are batched)
+HEADLESS_STATUS_INTERVAL = 10     # Seconds between status objects in headless mode
+
+CLEAR_LINE = "\033[2K"
+ANSI = re.compile(r'\033\[[0-9;]*[A-Za-z]')
+
+def strip_ansi(text):
+    return ANSI.sub('', text)
+
+class Renderer:
+    def __init__(self, stream=None, headless=False, capacity=QUEUE_CAPACITY,
+                 redraw_interval=REDRAW_INTERVAL, status_interval=HEADLESS_STATUS_INTERVAL):
+        self.stream = stream or sys.stdout
+        self.headless = headless
+        self.redraw_interval = redraw_interval
+        self.status_interval = status_interval
+        self.lines = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.dropped = 0               # Lines lost since the last notice
+        self.dropped_total = 0
+        self.status_line = None        # Latest bar text (terminal mode)
+        self.status_fields = None      # Latest status dict (headless mode)
+        self.drawn_line = None
+        self.drawn_fields = None
+        self.last_status_at = 0.0
+        self.running = False
+        self.thread = None
+
+    # -------------------------------------------------------------------------
+    # Producers (any thread; never block on the terminal)
+    # -------------------------------------------------------------------------
+    def log(self, msg, level='info', prefix='[i]', color=''):
+        with self.lock:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+                self.dropped_total += 1
+            self.lines.append((time.time(), level, prefix, color, msg))
+        self.wake.set()
+
+    def raw(self, text=''):
+        """A line printed as is (banners, spacing); skipped in headless mode"""
+        if not self.headless:
+            self.log(text, level=None)
+
+    def status(self, line, fields=None):
+        """Replace the status bar text (and the fields reported in headless mode)"""
+        with self.lock:
+            self.status_line = line
+            self.status_fields = fields
+        self.wake.set()
+
+    # -------------------------------------------------------------------------
+    # Renderer thread
+    # -------------------------------------------------------------------------
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='console', daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self, timeout=2):
+        """Write what is still queued, then stop"""
+        self.running = False
+        self.wake.set()
+        if self.thread:
+            self.thread.join(timeout)
+            self.thread = None
+        else:
+            self._render()
+
+    def _run(self):
+        last_write = 0.0
+        while self.running:
+            self.wake.wait(1)
+            # Batch everything that arrives within one redraw interval
+            delay = last_write + self.redraw_interval - time.monotonic()
+            if delay > 0 and self.running:
+                time.sleep(delay)
+            self.wake.clear()
+            if self._render():
+                last_write = time.monotonic()
+        self._render()
+
+    def _take(self):
+        with self.lock:
+            lines = list(self.lines)
+            self.lines.clear()
+            dropped, self.dropped = self.dropped, 0
+            return lines, dropped, self.status_line, self.status_fields
+
+    def _render(self):
+        lines, dropped, status_line, status_fields = self._take()
+        if self.headless:
+            text = self._render_json(lines, dropped, status_fields)
+        else:
+            text = self._render_terminal(lines, dropped, status_line)
+        if not text:
+            return False
+        try:
+            self.stream.write(text)
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass
+        return True
+
+    def _render_terminal(self, lines, dropped, status_line):
+        out = []
+        if dropped:
+            # The lost lines came before the ones still queued
+            lines.insert(0, (time.time(), 'warning', '[!]', '\033[93m',
+                             f"{dropped} log lines dropped (console too slow)"))
+        for at, level, prefix, color, msg in lines:
+            if level is None:
+                out.append(f"\r{CLEAR_LINE}{msg}\n")
+            else:
+                stamp = time.strftime('%H:%M:%S', time.localtime(at))
+                out.append(f"\r{CLEAR_LINE}\033[97m[{stamp}] {color}{prefix}\033[0m {msg}\n")
+        # Printed lines scroll the bar away; otherwise redraw only if it changed
+        if status_line is not None and (out or status_line != self.drawn_line):
+            out.append(f"\r{CLEAR_LINE}{status_line}")
+            self.drawn_line = status_line
+        return ''.join(out)
+
+    def _render_json(self, lines, dropped, status_fields):
+        out = []
+        if dropped:
+            out.append(json.dumps({'time': round(time.time(), 3), 'type': 'dropped', 'count': dropped}))
+        for at, level, prefix, color, msg in lines:
+            out.append(json.dumps({'time': round(at, 3), 'type': 'log', 'level': level, 'msg': strip_ansi(msg)}))
+        now = time.monotonic()
+        if (status_fields is not None and status_fields != self.drawn_fields
+                and now - self.last_status_at >= self.status_interval):
+            out.append(json.dumps(dict({'time': round(time.time(), 3), 'type': 'status'}, **status_fields)))
+            self.drawn_fields = status_fields
+            self.last_status_at = now
+        return ''.join(line + '\n' for line in out)
+
+if __name__ == '__main__':
+    renderer = Renderer(headless='--headless' in sys.argv).start()
+    for i in range(5000):
+        renderer.log(f"message {i}")
+        if i % 500 == 0:
+            renderer.status(f"status {i}", {'i': i})
+    time.sleep(0.5)
+    renderer.log(f"{renderer.dropped_total} lines dropped in total")
+    renderer.close()
+    print()
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Opt-in Diagnostics for the Bridge
+Lock contention, thread/memory dumps and a sampling profiler, so we can see
+where the bridge's threads spend their time.
+
+Enable with `--diagnostics` on the command line or BRIDGE_DIAGNOSTICS=1.
+The switch is read when this module is imported, before the bridge creates
+its locks: when it is off, make_lock() returns a plain threading.Lock and
+nothing else runs, so normal operation pays nothing.
+
+- make_lock(name): lock that records acquisitions, contended acquisitions,
+  wait time and hold time
+- SIGUSR1 (SIGBREAK / Ctrl+Break on Windows): print every thread's stack,
+  the top tracemalloc allocation sites and the lock table
+- SamplingProfiler: samples thread stacks (default 20 Hz, all threads or
+  only the named ones) and writes collapsed stacks for flamegraph.pl /
+  speedscope. Each sample walks every sampled thread's stack while holding
+  the GIL, so the cost grows with the number of rig connections
+
+Usage:
+  python ws_bridge.py --diagnostics --profile-out bridge.folded
+  python ws_bridge.py --diagnostics --profile-threads websocket,status --profile-hz 100
+  kill -USR1 <bridge pid>
+  flamegraph.pl bridge.folded > bridge.svg
+"""
+
+import os
+import sys
+import time
+import signal
+import threading
+import traceback
+import tracemalloc
+
+ENABLED = '--diagnostics' in sys.argv or os.environ.get('BRIDGE_DIAGNOSTICS', '') not in ('', '0')
+PROFILE_INTERVAL = 0.05        # Seconds between profiler samples (20 Hz)
+TRACEMALLOC_FRAMES = 4         # Frames kept per allocation (more = slower)
+TRACEMALLOC_TOP = 15           # Allocation sites shown in a dump
+
+# =============================================================================
+# LOCKS
+# =============================================================================
+class InstrumentedLock:
+    """threading.Lock that records wait and hold times.
+
+    Stats are updated while the lock is held, so they need no extra locking.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._acquired_at = 0.0
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        wait = 0.0
+        if not self._lock.acquire(False):
+            if not blocking:
+                return False
+            start = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            wait = time.perf_counter() - start
+            self.contended += 1
+        self._acquired_at = time.perf_counter()
+        self.acquisitions += 1
+        self.wait_total += wait
+        if wait > self.wait_max:
+            self.wait_max = wait
+        return True
+
+    def release(self):
+        hold = time.perf_counter() - self._acquired_at
+        self.hold_total += hold
+        if hold > self.hold_max:
+            self.hold_max = hold
+        self._lock.release()
+
+    def locked(self):
+        return self._lock.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def stats(self):
+        n = self.acquisitions or 1
+        return {
+            'name': self.name,
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'waitTotalMs': self.wait_total * 1000,
+            'waitMaxMs': self.wait_max * 1000,
+            'holdAvgMs': self.hold_total / n * 1000,
+            'holdMaxMs': self.hold_max * 1000,
+        }
+
+_locks = []
+
+def make_lock(name):
+    """A lock for module-level state: instrumented only in diagnostics mode"""
+    if not ENABLED:
+        return threading.Lock()
+    lock = InstrumentedLock(name)
+    _locks.append(lock)
+    return lock
+
+def lock_report():
+    """Lines of the lock table, most waited-on first"""
+    rows = sorted((lock.stats() for lock in _locks), key=lambda s: -s['waitTotalMs'])
+    lines = [f"  {'lock':<20} {'acquired':>9} {'contended':>9} {'wait ms':>9} "
+             f"{'max wait':>9} {'avg hold':>9} {'max hold':>9}"]
+    for s in rows:
+        lines.append(f"  {s['name']:<20} {s['acquisitions']:>9} {s['contended']:>9} "
+                     f"{s['waitTotalMs']:>9.1f} {s['waitMaxMs']:>9.2f} "
+                     f"{s['holdAvgMs']:>9.3f} {s['holdMaxMs']:>9.2f}")
+    return lines
+
+# =============================================================================
+# DUMPS
+# =============================================================================
+def dump_state(out=None):
+    """Print all thread stacks, top allocations and the lock table"""
+    out = out or sys.stderr
+    names = {t.ident: t.name for t in threading.enumerate()}
+    lines = [f"===== Diagnostics dump {time.strftime('%Y-%m-%d %H:%M:%S')} ====="]
+    for ident, frame in sys._current_frames().items():
+        lines.append(f"--- Thread {names.get(ident, '?')} ({ident})")
+        lines.extend(line.rstrip('\n') for line in traceback.format_stack(frame))
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        lines.append(f"--- Memory: {current / 1024:.0f} KB traced, peak {peak / 1024:.0f} KB")
+        for stat in tracemalloc.take_snapshot().statistics('lineno')[:TRACEMALLOC_TOP]:
+            lines.append(f"  {stat}")
+    if _locks:
+        lines.append("--- Locks")
+        lines.extend(lock_report())
+    print('\n'.join(lines), file=out, flush=True)
+
+def _on_dump_signal(signum, frame):
+    dump_state()
+
+def install_dump_handler():
+    """Dump on SIGUSR1 (SIGBREAK on Windows). Returns the signal's name, or None."""
+    signum = getattr(signal, 'SIGUSR1', None) or getattr(signal, 'SIGBREAK', None)
+    if signum is None:
+        return None
+    signal.signal(signum, _on_dump_signal)
+    return signal.Signals(signum).name
+
+# =============================================================================
+# SAMPLING PROFILER
+# =============================================================================
+class SamplingProfiler:
+    """Samples thread stacks (wall clock, idle waits included).
+
+    Counts are kept per collapsed stack ("thread;file:func;..."), the input
+    format of flamegraph.pl and speedscope. `threads` limits sampling to
+    threads with those names (None: every thread).
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, threads=None):
+        self.interval = interval
+        self.threads = frozenset(threads) if threads else None
+        self.counts = {}
+        self.samples = 0
+        self.running = False
+        self.thread = None
+
+    def _collapse(self, name, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        stack.append(name)
+        return ';'.join(reversed(stack))
+
+    def _run(self):
+        me = threading.get_ident()
+        names, listed = {}, time.monotonic() - 1
+        while self.running:
+            if time.monotonic() - listed >= 1:
+                # Thread names change rarely; listing them each sample costs as much as the sampling
+                names = {t.ident: t.name for t in threading.enumerate()
+                         if self.threads is None or t.name in self.threads}
+                listed = time.monotonic()
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident)
+                if ident == me or (name is None and self.threads is not None):
+                    continue
+                key = self._collapse(name or 'thread', frame)
+                self.counts[key] = self.counts.get(key, 0) + 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+def start(profile=True, interval=PROFILE_INTERVAL, threads=None):
+    """Turn on everything for diagnostics mode. Returns the profiler (or None)."""
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    install_dump_handler()
+    if not profile:
+        return None
+    profiler = SamplingProfiler(interval, threads)
+    profiler.start()
+    return profiler
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Stand-in Proxy for Bridge Testing
+Minimal WebSocket server (standard library only) that plays the proxy side
+of the bridge protocol. replay.py uses it to drive a bridge from a recorded
+trace; it never talks to a real pool.
+
+Point a bridge at it with:
+  python ws_bridge.py --proxy-url ws://127.0.0.1:<port>/proxy?clientId=test
+"""
+
+import base64
+import hashlib
+import socket
+import struct
+import threading
+import time
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# =============================================================================
+# FRAMING
+# =============================================================================
+def _unmask(data, mask):
+    n = len(data)
+    if not n:
+        return data
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, 'big') ^ int.from_bytes(key, 'big')).to_bytes(n, 'big')
+
+def _frame(opcode, payload):
+    header = bytes([0x80 | opcode])
+    n = len(payload)
+    if n < 126:
+        header += bytes([n])
+    elif n < 65536:
+        header += bytes([126]) + struct.pack('>H', n)
+    else:
+        header += bytes([127]) + struct.pack('>Q', n)
+    return header + payload
+
+class ProxyConnection:
+    """One bridge connected to the stand-in proxy"""
+
+    def __init__(self, sock, path):
+        self.sock = sock
+        self.path = path
+        self.connected_at = time.monotonic()
+        self.closed = False
+        self.send_lock = threading.Lock()
+
+    def _recv_exact(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = self.sock.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("connection closed")
+            data += chunk
+        return data
+
+    def recv(self):
+        """Next text message, or None once the connection is gone"""
+        message = b''
+        try:
+            while True:
+                b0, b1 = self._recv_exact(2)
+                opcode = b0 & 0x0F
+                n = b1 & 0x7F
+                if n == 126:
+                    n = struct.unpack('>H', self._recv_exact(2))[0]
+                elif n == 127:
+                    n = struct.unpack('>Q', self._recv_exact(8))[0]
+                mask = self._recv_exact(4) if b1 & 0x80 else None
+                payload = self._recv_exact(n)
+                if mask:
+                    payload = _unmask(payload, mask)
+
+                if opcode == OP_PING:
+                    self._send_frame(OP_PONG, payload)
+                elif opcode == OP_CLOSE:
+                    self.close()
+                    return None
+                elif opcode != OP_PONG:
+                    message += payload
+                    if b0 & 0x80:
+                        return message.decode('utf-8', 'replace')
+        except (OSError, ConnectionError, ValueError):
+            self.closed = True
+            return None
+
+    def _send_frame(self, opcode, payload):
+        with self.send_lock:
+            self.sock.sendall(_frame(opcode, payload))
+
+    def send(self, text):
+        """Send a text frame. Returns False if the connection is gone."""
+        if self.closed:
+            return False
+        try:
+            self._send_frame(OP_TEXT, text.encode())
+            return True
+        except OSError:
+            self.closed = True
+            return False
+
+    def close(self):
+        """Close cleanly (the bridge sees on_close and reconnects)"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._send_frame(OP_CLOSE, struct.pack('>H', 1000))
+        except OSError:
+            pass
+        self.abort()
+
+    def abort(self):
+        """Drop the TCP connection without a close frame"""
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+# =============================================================================
+# SERVER
+# =============================================================================
+class FakeProxy:
+    """Accepts bridge WebSocket connections and hands messages to callbacks.
+
+    on_connect(conn), on_message(conn, text) and on_close(conn) run on the
+    connection's reader thread.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, on_connect=None, on_message=None, on_close=None):
+        self.on_connect = on_connect
+        self.on_message = on_message
+        self.on_close = on_close
+        self.connections = []
+        self.lock = threading.Lock()
+        self.running = False
+        self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_sock.bind((host, port))
+        self.server_sock.listen(16)
+        self.server_sock.settimeout(0.5)
+        self.host, self.port = self.server_sock.getsockname()[:2]
+
+    def url(self, client_id='test'):
+        return f"ws://{self.host}:{self.port}/proxy?clientId={client_id}"
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        for conn in self.active():
+            conn.abort()
+        try:
+            self.server_sock.close()
+        except OSError:
+            pass
+
+    def active(self):
+        with self.lock:
+            return [c for c in self.connections if not c.closed]
+
+    def current(self):
+        """Most recent open connection, or None"""
+        active = self.active()
+        return active[-1] if active else None
+
+    def wait_for_connection(self, timeout=30, after=None):
+        """Wait for an open connection (newer than `after` if given)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            conn = self.current()
+            if conn and conn is not after:
+                return conn
+            time.sleep(0.02)
+        return None
+
+    def broadcast(self, text):
+        sent = 0
+        for conn in self.active():
+            sent += conn.send(text)
+        return sent
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, _ = self.server_sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _handshake(self, sock):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return None
+            request += chunk
+        lines = request.decode('latin-1').split('\r\n')
+        path = lines[0].split(' ')[1] if len(lines[0].split(' ')) > 1 else '/'
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if not key:
+            return None
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        sock.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return path
+
+    def _serve(self, sock):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            path = self._handshake(sock)
+        except OSError:
+            path = None
+        if path is None:
+            sock.close()
+            return
+
+        conn = ProxyConnection(sock, path)
+        with self.lock:
+            self.connections.append(conn)
+        if self.on_connect:
+            self.on_connect(conn)
+        while True:
+            text = conn.recv()
+            if text is None:
+                break
+            if self.on_message:
+                self.on_message(conn, text)
+        conn.closed = True
+        if self.on_close:
+            self.on_close(conn)
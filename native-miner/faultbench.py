@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Bridge Fault-Injection Harness
+Measures what proxy disconnects cost: lost/duplicated shares, time rigs spend
+on stale jobs, and time to recover.
+
+Each scenario starts a fresh bridge against a scripted stand-in proxy
+(fakeproxy.py) that issues a new job every JOB_INTERVAL seconds and answers
+submits. Simulated rigs log in and submit shares at a steady rate. At
+FAULT_AT seconds the proxy injects the scenario's fault:
+  drop         - TCP connection dropped without a close frame
+  close        - clean WebSocket close
+  stall        - proxy stops reading and sending for a while
+  delay        - every frame delayed in both directions
+  reject_auth  - connection dropped, then the next auths are rejected
+  dup_jobs     - every job sent twice
+Results are appended to a JSON-lines file keyed by bridge version, so runs
+of different bridge builds can be compared.
+
+Usage:
+  python faultbench.py                         # all scenarios
+  python faultbench.py drop stall --rigs 8
+  python faultbench.py --compare               # table of stored results
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from fakeproxy import FakeProxy
+from replay import FakeRig, free_port, wait_for_port, percentiles, _parse
+
+BRIDGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ws_bridge.py")
+RESULTS_FILE = "faultbench-results.jsonl"   # In the current directory
+
+JOB_INTERVAL = 2.0             # New job from the "pool" this often
+FAULT_AT = 5.0                 # Seconds into the run the fault starts
+RUN_TIME = 30.0                # Seconds of rig activity per scenario
+DRAIN_TIME = 5.0               # Seconds to wait for queued shares after the run
+SHARE_RATE = 2.0               # Shares per second per rig
+
+SCENARIOS = {
+    'baseline': {},
+    'drop': {'drop': True},
+    'close': {'close': True},
+    'stall': {'stall': 15.0},
+    'delay': {'delay': 0.5, 'duration': 10.0},
+    'reject_auth': {'drop': True, 'reject_auth': 2},
+    'dup_jobs': {'dup_jobs': True, 'duration': 10.0},
+}
+
+# =============================================================================
+# SCRIPTED PROXY
+# =============================================================================
+class ScriptedProxy:
+    """Stand-in proxy that plays the pool side and injects faults on request"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.job_seq = 0
+        self.jobs = []               # (monotonic time, job_id) the proxy issued
+        self.shares = []             # (monotonic time, (job_id, nonce)) received
+        self.auths = []              # monotonic times of accepted auths
+        self.bridge_version = None
+        self.delay = 0.0
+        self.dup_jobs = False
+        self.stalled_until = 0.0
+        self.held = []               # (conn, kind, text) held while stalled
+        self.reject_auth = 0
+        self.running = True
+        self.proxy = FakeProxy(on_message=self._on_message)
+
+    # --- outgoing / incoming with faults ---
+
+    def _send(self, conn, text):
+        with self.lock:
+            if time.monotonic() < self.stalled_until:
+                self.held.append((conn, 'out', text))
+                return
+            delay = self.delay
+        if delay:
+            threading.Timer(delay, conn.send, args=(text,)).start()
+        else:
+            conn.send(text)
+
+    def _on_message(self, conn, text):
+        with self.lock:
+            if time.monotonic() < self.stalled_until:
+                self.held.append((conn, 'in', text))
+                return
+            delay = self.delay
+        if delay:
+            threading.Timer(delay, self._handle, args=(conn, text)).start()
+        else:
+            self._handle(conn, text)
+
+    def _handle(self, conn, text):
+        msg = _parse(text)
+        msg_type = msg.get('type')
+        if msg_type == 'auth':
+            with self.lock:
+                rejected = self.reject_auth > 0
+                self.reject_auth -= rejected
+            if rejected:
+                conn.send(json.dumps({'type': 'error', 'params': {'error': 'auth rejected'}}))
+                conn.close()
+                return
+            self.auths.append(time.monotonic())
+            self._send(conn, json.dumps({'type': 'authed', 'params': {'hashes': 0}}))
+            if self.jobs:
+                self._send(conn, self._job_message(self.jobs[-1][1]))
+        elif msg_type == 'submit':
+            params = msg.get('params') or {}
+            self.shares.append((time.monotonic(), (params.get('job_id'), params.get('nonce'))))
+            self._send(conn, json.dumps({'type': 'share_result', 'id': msg.get('id'), 'status': 'submitted'}))
+        elif msg_type == 'status_update':
+            version = (msg.get('params') or {}).get('version')
+            if version:
+                self.bridge_version = version
+        elif msg_type == 'ping':
+            self._send(conn, json.dumps({'type': 'pong'}))
+
+    def _job_message(self, job_id):
+        return json.dumps({'type': 'job', 'params': {
+            'job_id': job_id, 'blob': '0' * 152, 'target': 'b88d0600',
+            'seed_hash': '0' * 64, 'height': self.job_seq, 'algo': 'rx/0'}})
+
+    def new_job(self):
+        self.job_seq += 1
+        job_id = f'job-{self.job_seq}'
+        self.jobs.append((time.monotonic(), job_id))
+        conn = self.proxy.current()
+        if conn:
+            text = self._job_message(job_id)
+            self._send(conn, text)
+            if self.dup_jobs:
+                self._send(conn, text)
+
+    def release_held(self):
+        with self.lock:
+            held, self.held = self.held, []
+        for conn, kind, text in held:
+            if kind == 'out':
+                conn.send(text)
+            else:
+                self._handle(conn, text)
+
+    def job_loop(self):
+        while self.running:
+            self.new_job()
+            time.sleep(JOB_INTERVAL)
+
+# =============================================================================
+# SIMULATED RIG
+# =============================================================================
+class SimRig(FakeRig):
+    """Fake XMRig that submits shares on the newest job it has heard of"""
+
+    def __init__(self, session, port, rate):
+        super().__init__(session, port)
+        self.rate = rate
+        self.submitted = []          # (monotonic time, (job_id, nonce))
+        self.nonce = 0
+        self.running = True
+        self.send(json.dumps({'id': 1, 'jsonrpc': '2.0', 'method': 'login',
+                              'params': {'login': 'faultbench', 'pass': f'rig{session}', 'agent': 'faultbench'}}))
+
+    def jobs(self):
+        """(time, job_id) of every job this rig was given"""
+        jobs = []
+        for t, msg in list(self.received):
+            result = msg.get('result')
+            if isinstance(result, dict) and isinstance(result.get('job'), dict):
+                jobs.append((t, result['job'].get('job_id')))
+            elif msg.get('method') == 'job':
+                jobs.append((t, (msg.get('params') or {}).get('job_id')))
+        return jobs
+
+    def submit_loop(self):
+        msg_id = 1
+        while self.running:
+            time.sleep(1.0 / self.rate)
+            jobs = self.jobs()
+            if not jobs or jobs[-1][1] == 'waiting':
+                continue
+            msg_id += 1
+            self.nonce += 1
+            key = (jobs[-1][1], f'{self.session:04x}{self.nonce:04x}')
+            self.submitted.append((time.monotonic(), key))
+            self.send(json.dumps({'id': msg_id, 'jsonrpc': '2.0', 'method': 'submit',
+                                  'params': {'id': f'rig{self.session}', 'job_id': key[0],
+                                             'nonce': key[1], 'result': 'ab' * 32}}))
+
+# =============================================================================
+# SCENARIO RUNNER
+# =============================================================================
+def stale_seconds(rig, proxy_jobs, end):
+    """Time the rig spent on a job older than the proxy's current one"""
+    order = {job_id: i for i, (_, job_id) in enumerate(proxy_jobs)}
+    timeline = [(t, 'proxy', i) for i, (t, _) in enumerate(proxy_jobs)]
+    timeline += [(t, 'rig', order[job_id]) for t, job_id in rig.jobs() if job_id in order]
+    timeline.sort(key=lambda e: e[0])
+    proxy_current = rig_current = -1
+    stale = 0.0
+    last = None
+    for t, side, index in timeline:
+        t = min(t, end)
+        if last is not None and rig_current < proxy_current:
+            stale += t - last
+        last = t
+        if side == 'proxy':
+            proxy_current = max(proxy_current, index)
+        else:
+            rig_current = max(rig_current, index)
+    if last is not None and rig_current < proxy_current:
+        stale += end - last
+    return stale
+
+def run_scenario(name, fault, rigs=4, bridge_script=BRIDGE_SCRIPT, log_path=None):
+    proxy = ScriptedProxy()
+    proxy.proxy.start()
+    port = free_port()
+    log = open(log_path, 'a') if log_path else subprocess.DEVNULL
+    bridge = subprocess.Popen(
+        [sys.executable, bridge_script, '--proxy-url', proxy.proxy.url('faultbench'), '--port', str(port),
+         '--no-history'],
+        stdout=log, stderr=subprocess.STDOUT
+    )
+    sim_rigs = []
+    try:
+        if not proxy.proxy.wait_for_connection(30) or not wait_for_port(port, 30):
+            raise RuntimeError("bridge did not come up")
+        threading.Thread(target=proxy.job_loop, daemon=True).start()
+        time.sleep(0.2)
+        for i in range(rigs):
+            rig = SimRig(i + 1, port, SHARE_RATE)
+            threading.Thread(target=rig.submit_loop, daemon=True).start()
+            sim_rigs.append(rig)
+
+        start = time.monotonic()
+        time.sleep(FAULT_AT)
+        fault_start = time.monotonic()
+        conn = proxy.proxy.current()
+        if fault.get('reject_auth'):
+            proxy.reject_auth = fault['reject_auth']
+        if fault.get('drop') and conn:
+            conn.abort()
+        if fault.get('close') and conn:
+            conn.close()
+        if fault.get('stall'):
+            proxy.stalled_until = fault_start + fault['stall']
+        if fault.get('delay'):
+            proxy.delay = fault['delay']
+        if fault.get('dup_jobs'):
+            proxy.dup_jobs = True
+
+        fault_end = fault_start + fault.get('stall', fault.get('duration', 0.0))
+        while time.monotonic() < start + RUN_TIME:
+            if fault_end and time.monotonic() >= fault_end:
+                proxy.delay = 0.0
+                proxy.dup_jobs = False
+                proxy.release_held()
+                fault_end = 0.0
+            time.sleep(0.05)
+        for rig in sim_rigs:
+            rig.running = False
+        proxy.running = False
+        run_end = time.monotonic()
+        time.sleep(DRAIN_TIME)
+    finally:
+        proxy.running = False
+        bridge.terminate()
+        try:
+            bridge.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            bridge.kill()
+        proxy.proxy.stop()
+        for rig in sim_rigs:
+            rig.close()
+        if log_path:
+            log.close()
+
+    submitted = {}
+    for rig in sim_rigs:
+        for t, key in rig.submitted:
+            submitted[key] = t
+    received = {}
+    duplicates = 0
+    for t, key in proxy.shares:
+        if key in received:
+            duplicates += 1
+        else:
+            received[key] = t
+    lost = [key for key in submitted if key not in received]
+    latency = [received[key] - t for key, t in submitted.items() if key in received]
+    recover = next((t - fault_start for key, t in sorted(received.items(), key=lambda kv: kv[1])
+                    if submitted.get(key, 0) >= fault_start), None) if fault else 0.0
+    stale = [stale_seconds(rig, proxy.jobs, run_end) for rig in sim_rigs]
+
+    return {
+        'scenario': name,
+        'bridge': proxy.bridge_version,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'rigs': rigs,
+        'sharesSubmitted': len(submitted),
+        'sharesLost': len(lost),
+        'sharesDuplicated': duplicates,
+        'staleJobSeconds': round(sum(stale) / len(stale), 3) if stale else 0.0,
+        'timeToRecover': round(recover, 3) if recover is not None else None,
+        'reconnects': max(0, len(proxy.auths) - 1),
+        'shareLatencyMs': percentiles(latency),
+    }
+
+# =============================================================================
+# RESULTS
+# =============================================================================
+def save_result(result, path=RESULTS_FILE):
+    with open(path, 'a') as f:
+        f.write(json.dumps(result) + '\n')
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_result(r):
+    ttr = f"{r['timeToRecover']:.2f}s" if r['timeToRecover'] is not None else "never"
+    print(f"  {r['scenario']:12} lost {r['sharesLost']:>4}/{r['sharesSubmitted']:<5} dup {r['sharesDuplicated']:>3}  "
+          f"stale {r['staleJobSeconds']:6.2f}s  recover {ttr:>7}  reconnects {r['reconnects']}")
+
+def print_comparison(results):
+    """Latest result per (bridge version, scenario)"""
+    latest = {}
+    for r in results:
+        latest[(r.get('bridge'), r['scenario'])] = r
+    print(f"  {'bridge':10} {'scenario':12} {'lost':>6} {'dup':>4} {'stale s':>8} {'recover s':>10}")
+    for (bridge, scenario), r in sorted(latest.items(), key=lambda kv: (kv[0][1], str(kv[0][0]))):
+        ttr = f"{r['timeToRecover']:.2f}" if r['timeToRecover'] is not None else "never"
+        print(f"  {str(bridge):10} {scenario:12} {r['sharesLost']:>6} {r['sharesDuplicated']:>4} "
+              f"{r['staleJobSeconds']:>8.2f} {ttr:>10}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inject proxy faults and measure the bridge's share loss and recovery")
+    parser.add_argument('scenarios', nargs='*', help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument('--rigs', type=int, default=4, help="Simulated rigs (default 4)")
+    parser.add_argument('--bridge', default=BRIDGE_SCRIPT, help="Bridge script to test")
+    parser.add_argument('--results', default=RESULTS_FILE, help=f"JSON-lines file results are appended to (default ./{RESULTS_FILE})")
+    parser.add_argument('--log', help="Append the bridge's output here")
+    parser.add_argument('--compare', action='store_true', help="Print stored results by bridge version and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print_comparison(load_results(args.results))
+        return 0
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    for name in names:
+        print(f"[Faultbench] Running {name}...")
+        result = run_scenario(name, SCENARIOS[name], args.rigs, args.bridge, args.log)
+        save_result(result, args.results)
+        print_result(result)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
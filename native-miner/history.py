@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+On-Disk Performance History
+Fixed-size, memory-mapped ring buffers of hashrate, temperature, power and
+share counts, so stats survive restarts without an external database.
+
+Each process writes its own series file (history/miner.bin,
+history/bridge.bin). A file holds one ring per resolution:
+  10 s  x 17280  (2 days)
+  1 min x 20160  (14 days)
+  1 h   x 8760   (1 year)
+Records are fixed-width (28 bytes): bucket start, average hashrate,
+temperature and watts, and accepted/submitted/rejected shares in the bucket.
+Writing is a struct.pack_into() into the mapping once per bucket, so
+recording costs next to nothing. A restart flushes the partial bucket, so a
+bucket start can appear twice; sum the share columns when merging.
+
+Usage:
+  python history.py query history/bridge.bin --res 60 --since 86400
+  python history.py serve                 # http://127.0.0.1:3380/history
+"""
+
+import os
+import sys
+import json
+import math
+import mmap
+import time
+import struct
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+HISTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history")
+HISTORY_PORT = 3380
+DEFAULT_TIERS = ((10, 17280), (60, 20160), (3600, 8760))   # (seconds, records)
+
+MAGIC = b'XMRHIST1'
+HEADER = struct.Struct('<8sII')          # magic, version, tier count
+TIER = struct.Struct('<IIII')            # resolution, capacity, head, count
+RECORD = struct.Struct('<IfffIII')       # start, hashrate, temp, watts, accepted, submitted, rejected
+HEADER_SIZE = 256
+MAX_TIERS = (HEADER_SIZE - HEADER.size) // TIER.size
+
+def _none(value):
+    return None if math.isnan(value) else round(value, 3)
+
+# =============================================================================
+# STORE
+# =============================================================================
+class HistoryStore:
+    """Ring-buffer file; single writer, any number of readers"""
+
+    def __init__(self, path, tiers=DEFAULT_TIERS, writable=True):
+        self.path = path
+        if writable:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            size = HEADER_SIZE + sum(capacity for _, capacity in tiers) * RECORD.size
+            fresh = not os.path.exists(path) or os.path.getsize(path) != size
+            self.file = open(path, 'r+b' if not fresh else 'w+b')
+            if fresh:
+                self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+            if fresh or self.map[:8] != MAGIC:
+                self._init_header(tiers)
+        else:
+            self.file = open(path, 'rb')
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, _, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a history file")
+        self.tiers = []
+        offset = HEADER_SIZE
+        for i in range(count):
+            resolution, capacity, _, _ = TIER.unpack_from(self.map, HEADER.size + i * TIER.size)
+            self.tiers.append((resolution, capacity, offset))
+            offset += capacity * RECORD.size
+
+    def _init_header(self, tiers):
+        if len(tiers) > MAX_TIERS:
+            raise ValueError(f"at most {MAX_TIERS} resolutions")
+        self.map[:HEADER_SIZE] = b'\0' * HEADER_SIZE
+        HEADER.pack_into(self.map, 0, MAGIC, 1, len(tiers))
+        for i, (resolution, capacity) in enumerate(tiers):
+            TIER.pack_into(self.map, HEADER.size + i * TIER.size, resolution, capacity, 0, 0)
+
+    def _cursor(self, index):
+        _, _, head, count = TIER.unpack_from(self.map, HEADER.size + index * TIER.size)
+        return head, count
+
+    def append(self, index, record):
+        """Write one record to a tier's ring"""
+        resolution, capacity, offset = self.tiers[index]
+        head, count = self._cursor(index)
+        RECORD.pack_into(self.map, offset + head * RECORD.size, *record)
+        # Record first, then the cursor, so readers never see an unwritten slot
+        TIER.pack_into(self.map, HEADER.size + index * TIER.size,
+                       resolution, capacity, (head + 1) % capacity, min(count + 1, capacity))
+
+    def read(self, index, start=0, end=None):
+        """Records of one tier with start <= bucket start < end, oldest first"""
+        _, capacity, offset = self.tiers[index]
+        head, count = self._cursor(index)
+        first = (head - count) % capacity
+        rows = []
+        for i in range(count):
+            slot = (first + i) % capacity
+            record = RECORD.unpack_from(self.map, offset + slot * RECORD.size)
+            if record[0] >= start and (end is None or record[0] < end):
+                rows.append(record)
+        return rows
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+# =============================================================================
+# WRITER (downsampling)
+# =============================================================================
+class _Bucket:
+    __slots__ = ('start', 'hashrate', 'hashrate_n', 'temp', 'temp_n', 'watts', 'watts_n',
+                 'accepted', 'submitted', 'rejected')
+
+    def __init__(self, start):
+        self.start = start
+        self.hashrate = self.temp = self.watts = 0.0
+        self.hashrate_n = self.temp_n = self.watts_n = 0
+        self.accepted = self.submitted = self.rejected = 0
+
+    def add(self, hashrate, temp, watts, accepted, submitted, rejected):
+        if hashrate is not None:
+            self.hashrate += hashrate
+            self.hashrate_n += 1
+        if temp is not None:
+            self.temp += temp
+            self.temp_n += 1
+        if watts is not None:
+            self.watts += watts
+            self.watts_n += 1
+        self.accepted += accepted
+        self.submitted += submitted
+        self.rejected += rejected
+
+    def record(self):
+        return (
+            int(self.start),
+            self.hashrate / self.hashrate_n if self.hashrate_n else 0.0,
+            self.temp / self.temp_n if self.temp_n else float('nan'),
+            self.watts / self.watts_n if self.watts_n else float('nan'),
+            self.accepted, self.submitted, self.rejected,
+        )
+
+class HistoryWriter:
+    """Feeds samples into every resolution of a store.
+
+    Share counters are passed as running totals; the writer stores the
+    increase per bucket (a smaller total means the process restarted).
+    """
+
+    def __init__(self, path, tiers=DEFAULT_TIERS):
+        self.store = HistoryStore(path, tiers)
+        self.buckets = [None] * len(self.store.tiers)
+        self.totals = None
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def _deltas(self, totals):
+        previous, self.totals = self.totals, totals
+        if previous is None:
+            return (0, 0, 0)
+        return tuple(t - p if t >= p else t for t, p in zip(totals, previous))
+
+    def record(self, hashrate=None, temp=None, watts=None, accepted=0, submitted=0, rejected=0, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.closed:
+                return
+            deltas = self._deltas((accepted, submitted, rejected))
+            for i, (resolution, _, _) in enumerate(self.store.tiers):
+                start = int(now // resolution * resolution)
+                bucket = self.buckets[i]
+                if bucket is not None and bucket.start != start:
+                    self.store.append(i, bucket.record())
+                    bucket = None
+                if bucket is None:
+                    bucket = self.buckets[i] = _Bucket(start)
+                bucket.add(hashrate, temp, watts, *deltas)
+
+    def flush(self):
+        """Write partly filled buckets (on shutdown)"""
+        with self.lock:
+            if self.closed:
+                return
+            for i, bucket in enumerate(self.buckets):
+                if bucket is not None:
+                    self.store.append(i, bucket.record())
+                    self.buckets[i] = None
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                self.store.close()
+
+# =============================================================================
+# QUERY
+# =============================================================================
+def query(path, start=None, end=None, resolution=None):
+    """Rows between start and end (epoch seconds), oldest first.
+
+    Without a resolution, the finest one whose ring still reaches back to
+    `start` is used.
+    """
+    store = HistoryStore(path, writable=False)
+    try:
+        now = time.time()
+        start = now - 3600 if start is None else start
+        if resolution is None:
+            candidates = [i for i, (res, cap, _) in enumerate(store.tiers) if now - res * cap <= start]
+            index = candidates[0] if candidates else len(store.tiers) - 1
+        else:
+            matches = [i for i, (res, _, _) in enumerate(store.tiers) if res == resolution]
+            if not matches:
+                raise ValueError(f"no {resolution}s resolution in {path}")
+            index = matches[0]
+        rows = store.read(index, start, end)
+        return {
+            'resolution': store.tiers[index][0],
+            'fields': ['time', 'hashrate', 'temperature', 'watts', 'accepted', 'submitted', 'rejected'],
+            'rows': [[r[0], round(r[1], 2), _none(r[2]), _none(r[3]), r[4], r[5], r[6]] for r in rows],
+        }
+    finally:
+        store.close()
+
+def list_series(directory=HISTORY_DIR):
+    try:
+        return sorted(f[:-4] for f in os.listdir(directory) if f.endswith('.bin'))
+    except OSError:
+        return []
+
+# =============================================================================
+# HTTP ENDPOINT
+# =============================================================================
+def make_handler(directory):
+    class HistoryHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split('/') if p]
+            if parts == ['history']:
+                return self._reply(200, {'series': list_series(directory)})
+            if len(parts) != 2 or parts[0] != 'history' or parts[1] not in list_series(directory):
+                return self._reply(404, {'error': 'not found'})
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            try:
+                now = time.time()
+                start = float(params['from']) if 'from' in params else now - float(params.get('since', 3600))
+                end = float(params['to']) if 'to' in params else None
+                resolution = int(params['res']) if 'res' in params else None
+                result = query(os.path.join(directory, parts[1] + '.bin'), start, end, resolution)
+            except (ValueError, OSError) as e:
+                return self._reply(400, {'error': str(e)})
+            self._reply(200, result)
+    return HistoryHandler
+
+def serve(directory=HISTORY_DIR, host='127.0.0.1', port=HISTORY_PORT):
+    """Blocking HTTP server: GET /history, /history/<series>?since=&from=&to=&res="""
+    server = ThreadingHTTPServer((host, port), make_handler(directory))
+    server.daemon_threads = True
+    server.serve_forever()
+
+def start_server(directory=HISTORY_DIR, host='127.0.0.1', port=HISTORY_PORT, wait=0):
+    """Serve history on a background thread.
+
+    Returns the server, or None if the port is still taken after `wait`
+    seconds (an upgraded bridge waits for its predecessor to let go).
+    """
+    deadline = time.time() + wait
+    while True:
+        try:
+            server = ThreadingHTTPServer((host, port), make_handler(directory))
+            break
+        except OSError:
+            if time.time() >= deadline:
+                return None
+            time.sleep(0.5)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or serve the miner's performance history")
+    sub = parser.add_subparsers(dest='command', required=True)
+    q = sub.add_parser('query', help="Print rows from a series file")
+    q.add_argument('path')
+    q.add_argument('--since', type=float, default=3600, help="Seconds back from now (default 3600)")
+    q.add_argument('--res', type=int, help="Resolution in seconds (default: finest that covers the range)")
+    s = sub.add_parser('serve', help="Serve history over HTTP")
+    s.add_argument('--dir', default=HISTORY_DIR)
+    s.add_argument('--host', default='127.0.0.1')
+    s.add_argument('--port', type=int, default=HISTORY_PORT)
+    args = parser.parse_args(argv)
+
+    if args.command == 'query':
+        result = query(args.path, time.time() - args.since, None, args.res)
+        print(f"# resolution {result['resolution']}s, {len(result['rows'])} rows")
+        print('\t'.join(result['fields']))
+        for row in result['rows']:
+            print('\t'.join('' if v is None else str(v) for v in row))
+    else:
+        print(f"Serving {args.dir} on http://{args.host}:{args.port}/history")
+        serve(args.dir, args.host, args.port)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
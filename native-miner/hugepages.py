@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Huge-Page Readiness for RandomX
+Checks whether the RandomX dataset can live in huge pages, reserves the
+pages when we are allowed to, picks the matching XMRig options, and reads
+back from XMRig where the memory actually landed.
+
+Without huge pages every dataset read risks a TLB miss and RandomX runs
+roughly a third slower; 1 GB pages add a few percent on top of 2 MB ones.
+
+Pages needed with 2 MB pages (XMRig's layout):
+  dataset 2080 MB per NUMA node -> 1040 pages each
+  cache   256 MB                -> 128 pages
+  one 2 MB scratchpad per thread
+With 1 GB pages the dataset takes 3 pages per node; cache and scratchpads
+stay on 2 MB pages.
+
+- Pools from /proc/meminfo and /sys/kernel/mm/hugepages/hugepages-<size>kB
+- Reserving writes nr_hugepages (root only); the kernel may grant fewer
+  pages when memory is fragmented, so the result is read back
+- Windows: large pages need the "Lock pages in memory" privilege, which
+  XMRig grants itself when run once as administrator (then sign out/in)
+- proc_root / sys_root can point at fake trees for testing
+
+Usage:
+  python hugepages.py --threads 8            # what is needed and available
+  python hugepages.py --threads 8 --reserve  # also reserve (root)
+"""
+
+import os
+import re
+import sys
+import argparse
+import platform
+
+PROC_ROOT = "/proc"
+SYS_ROOT = "/sys"
+
+DATASET_MB = 2080
+CACHE_MB = 256
+SCRATCHPAD_MB = 2
+PAGE_2M_KB = 2048
+PAGE_1G_KB = 1048576
+# Estimated hashrate lost with the dataset entirely outside huge pages
+NO_HUGE_PAGES_PENALTY = 0.35
+
+HUGE_PAGES_LINE = re.compile(r'huge pages\s+(\d+)%\s+(\d+)/(\d+)', re.IGNORECASE)
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _read_int(path):
+    text = _read(path)
+    try:
+        return int(text) if text is not None else None
+    except ValueError:
+        return None
+
+# =============================================================================
+# POOLS
+# =============================================================================
+def read_meminfo(proc_root=PROC_ROOT):
+    """/proc/meminfo as {key: int} (kB values without the unit)"""
+    info = {}
+    for line in (_read(os.path.join(proc_root, 'meminfo')) or '').splitlines():
+        key, _, value = line.partition(':')
+        try:
+            info[key.strip()] = int(value.split()[0])
+        except (ValueError, IndexError):
+            pass
+    return info
+
+def page_pools(sys_root=SYS_ROOT, proc_root=PROC_ROOT):
+    """{page size kB: {'total', 'free', 'reserved'}} for every huge-page size"""
+    pools = {}
+    root = os.path.join(sys_root, 'kernel', 'mm', 'hugepages')
+    try:
+        names = [n for n in os.listdir(root) if n.startswith('hugepages-') and n.endswith('kB')]
+    except OSError:
+        names = []
+    for name in names:
+        d = os.path.join(root, name)
+        pools[int(name[len('hugepages-'):-2])] = {
+            'total': _read_int(os.path.join(d, 'nr_hugepages')) or 0,
+            'free': _read_int(os.path.join(d, 'free_hugepages')) or 0,
+            'reserved': _read_int(os.path.join(d, 'resv_hugepages')) or 0,
+        }
+    if not pools:
+        # Older kernels / no sysfs: the default size only
+        info = read_meminfo(proc_root)
+        if 'Hugepagesize' in info:
+            pools[info['Hugepagesize']] = {
+                'total': info.get('HugePages_Total', 0),
+                'free': info.get('HugePages_Free', 0),
+                'reserved': info.get('HugePages_Rsvd', 0),
+            }
+    return pools
+
+def numa_nodes(sys_root=SYS_ROOT):
+    try:
+        nodes = [n for n in os.listdir(os.path.join(sys_root, 'devices', 'system', 'node'))
+                 if n.startswith('node') and n[4:].isdigit()]
+    except OSError:
+        return 1
+    return max(1, len(nodes))
+
+def pages_needed(threads, nodes=1, one_gb=False):
+    """(2 MB pages, 1 GB pages) for the dataset, cache and scratchpads"""
+    small = CACHE_MB // 2 + threads * SCRATCHPAD_MB // 2
+    if one_gb:
+        return small, nodes * -(-DATASET_MB // 1024)
+    return small + nodes * DATASET_MB // 2, 0
+
+# =============================================================================
+# RESERVATION
+# =============================================================================
+def can_reserve():
+    return hasattr(os, 'geteuid') and os.geteuid() == 0
+
+def reserve(size_kb, total, sys_root=SYS_ROOT):
+    """Ask the kernel for `total` pages of a size; returns the total it granted"""
+    path = os.path.join(sys_root, 'kernel', 'mm', 'hugepages', f'hugepages-{size_kb}kB', 'nr_hugepages')
+    try:
+        with open(path, 'w') as f:
+            f.write(str(total))
+    except OSError:
+        pass
+    return _read_int(path) or 0
+
+# =============================================================================
+# READINESS
+# =============================================================================
+def check(threads, reserve_pages=False, one_gb=False, proc_root=PROC_ROOT, sys_root=SYS_ROOT):
+    """Huge-page readiness for `threads` RandomX threads.
+
+    Returns {'ready', 'oneGb', 'needed', 'available', 'reserved', 'xmrigArgs', 'reasons'};
+    'ready' is None when it can't be known (Windows, no hugetlbfs).
+    """
+    result = {'ready': None, 'oneGb': False, 'needed': {}, 'available': {}, 'reserved': {},
+              'xmrigArgs': [], 'reasons': []}
+    if platform.system() == 'Windows' and proc_root == PROC_ROOT:
+        result['reasons'].append("Windows: large pages need 'Lock pages in memory' - run XMRig once "
+                                 "as administrator, then sign out and in")
+        return result
+    pools = page_pools(sys_root, proc_root)
+    if PAGE_2M_KB not in pools:
+        result['reasons'].append("No 2 MB huge-page pool (hugetlbfs not available)")
+        return result
+
+    nodes = numa_nodes(sys_root)
+    can_write = reserve_pages and can_reserve()
+    use_1g = False
+    if one_gb and PAGE_1G_KB in pools:
+        _, big = pages_needed(threads, nodes, True)
+        pool = pools[PAGE_1G_KB]
+        if pool['free'] < big and can_write:
+            granted = reserve(PAGE_1G_KB, pool['total'] + big - pool['free'], sys_root)
+            result['reserved']['1G'] = max(0, granted - pool['total'])
+            pool['free'] += max(0, granted - pool['total'])
+            pool['total'] = granted
+        use_1g = pool['free'] >= big
+        result['needed']['1G'] = big
+        result['available']['1G'] = pool['free']
+        if not use_1g:
+            result['reasons'].append(f"1 GB pages: {pool['free']} free, {big} needed - using 2 MB pages")
+
+    small, _ = pages_needed(threads, nodes, use_1g)
+    pool = pools[PAGE_2M_KB]
+    if pool['free'] < small and can_write:
+        granted = reserve(PAGE_2M_KB, pool['total'] + small - pool['free'], sys_root)
+        result['reserved']['2M'] = max(0, granted - pool['total'])
+        pool['free'] += max(0, granted - pool['total'])
+        pool['total'] = granted
+    result['needed']['2M'] = small
+    result['available']['2M'] = pool['free']
+    result['oneGb'] = use_1g
+    result['ready'] = pool['free'] >= small
+
+    layout = f"{nodes} NUMA node{'s' if nodes > 1 else ''}, {threads} threads"
+    if result['reserved'].get('2M'):
+        result['reasons'].append(f"Reserved {result['reserved']['2M']} x 2 MB pages")
+    if result['reserved'].get('1G'):
+        result['reasons'].append(f"Reserved {result['reserved']['1G']} x 1 GB pages")
+    if result['ready']:
+        kind = "1 GB dataset pages + " if use_1g else ""
+        result['reasons'].append(f"Huge pages ready: {kind}{small} x 2 MB needed, {pool['free']} free ({layout})")
+    else:
+        if can_write:
+            hint = " - the kernel could not find enough free contiguous memory"
+        else:
+            hint = f" - as root: echo {pool['total'] + small - pool['free']} > /proc/sys/vm/nr_hugepages"
+        result['reasons'].append(f"Huge pages short: {small} x 2 MB needed, {pool['free']} free ({layout}); "
+                                 f"~{estimated_penalty(0):.0f}% slower without them{hint}")
+    if use_1g:
+        result['xmrigArgs'].append('--randomx-1gb-pages')
+    return result
+
+# =============================================================================
+# WHAT XMRIG GOT
+# =============================================================================
+def parse_xmrig_line(line):
+    """(kind, percent, used, total) from XMRig's allocation lines, or None.
+
+    kind is 'dataset' for "randomx allocated ... huge pages 100% 1168/1168"
+    and 'threads' for "cpu READY threads 8/8 ... huge pages 100% 8/8".
+    """
+    match = HUGE_PAGES_LINE.search(line)
+    if not match:
+        return None
+    lower = line.lower()
+    kind = 'dataset' if 'allocated' in lower or 'dataset' in lower else 'threads' if 'ready' in lower else 'other'
+    percent, used, total = (int(g) for g in match.groups())
+    return kind, percent, used, total
+
+def from_summary(summary):
+    """{'percent', 'used', 'total', 'penaltyPct'} from XMRig's /2/summary, or None"""
+    pages = (summary or {}).get('hugepages')
+    if isinstance(pages, list) and len(pages) == 2 and pages[1]:
+        used, total = pages
+        percent = used * 100 // total
+        return {'percent': percent, 'used': used, 'total': total, 'penaltyPct': round(estimated_penalty(percent), 1)}
+    return None
+
+def estimated_penalty(percent):
+    """Estimated % of hashrate lost when only `percent`% of the memory is in huge pages"""
+    return (100 - percent) / 100 * NO_HUGE_PAGES_PENALTY * 100
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check (and reserve) huge pages for RandomX")
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--reserve', action='store_true', help="Reserve missing pages (root)")
+    parser.add_argument('--1gb', dest='one_gb', action='store_true', help="Try 1 GB pages for the dataset")
+    parser.add_argument('--proc', default=PROC_ROOT)
+    parser.add_argument('--sys', default=SYS_ROOT)
+    args = parser.parse_args()
+    result = check(args.threads, args.reserve, args.one_gb, args.proc, args.sys)
+    for reason in result['reasons']:
+        print(reason)
+    if result['xmrigArgs']:
+        print(f"XMRig options: {' '.join(result['xmrigArgs'])}")
+    sys.exit(0 if result['ready'] is not False else 1)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Bridge Load Benchmark
+Measures how many shares per second a bridge build can take from a large
+number of rigs, and how long a new job takes to reach all of them, for
+different `--workers` settings.
+
+Each run starts a fresh bridge against a stand-in proxy (fakeproxy.py) that
+answers every submit and sends a new job every JOB_INTERVAL seconds. Rig
+driver processes open RIGS stratum connections; each rig logs in and then
+submits in a closed loop (next submit as soon as the bridge answers), so the
+bridge is always saturated. Reported per run:
+  submits/s     - stratum submits answered by the bridge (steady state)
+  proxy/s       - submits that reached the proxy
+  fan-out p50/p95 - ms from the proxy sending a job until the last rig has it
+  duplicates    - job notifications a rig got for a job it already had
+                  (must be 0: each rig gets each job exactly once)
+
+Results are appended to a JSON-lines file, like faultbench.py. Scaling is
+only meaningful with spare cores: rig drivers, proxy and bridge share the
+machine.
+
+Usage:
+  python loadbench.py                          # 0, 2 and 4 workers, 200 rigs
+  python loadbench.py --workers 0 1 2 4 8 --rigs 1000 --duration 30
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from fakeproxy import FakeProxy
+from replay import free_port, wait_for_port, percentiles
+from faultbench import save_result, load_results
+
+BRIDGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ws_bridge.py")
+RESULTS_FILE = "loadbench-results.jsonl"   # In the current directory
+
+JOB_INTERVAL = 1.0             # New job from the "pool" this often
+WARMUP = 3.0                   # Seconds of load before measuring
+DURATION = 15.0                # Seconds measured per run
+CONNECT_TIMEOUT = 30
+
+# =============================================================================
+# RIG DRIVERS
+# =============================================================================
+def drive_rigs(port, first, count, start_at, end_at, results):
+    """Run `count` closed-loop rigs from one process; put totals on `results`"""
+    sel = selectors.DefaultSelector()
+    rigs = {}
+    for session in range(first, first + count):
+        sock = socket.create_connection(('127.0.0.1', port), timeout=CONNECT_TIMEOUT)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setblocking(False)
+        rigs[sock] = {'session': session, 'buffer': b'', 'nonce': 0, 'job': None, 'notified': set()}
+        sel.register(sock, selectors.EVENT_READ)
+        sock.sendall(json.dumps({'id': 1, 'jsonrpc': '2.0', 'method': 'login',
+                                 'params': {'login': 'loadbench', 'pass': f'rig{session}'}}).encode() + b'\n')
+
+    acks = 0
+    duplicates = 0
+    jobs = {}                    # job_id -> (count, latest wall-clock receipt)
+
+    def submit(sock, rig):
+        rig['nonce'] += 1
+        line = json.dumps({'id': rig['nonce'] + 1, 'jsonrpc': '2.0', 'method': 'submit',
+                           'params': {'job_id': rig['job'], 'nonce': f"{rig['session']:06x}{rig['nonce']:08x}",
+                                      'result': 'ab' * 32}})
+        try:
+            sock.send(line.encode() + b'\n')
+        except OSError:
+            pass
+
+    while time.time() < end_at:
+        for key, _ in sel.select(timeout=0.5):
+            sock, rig = key.fileobj, rigs[key.fileobj]
+            try:
+                data = sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                data = b''
+            if not data:
+                sel.unregister(sock)
+                continue
+            now = time.time()
+            rig['buffer'] += data
+            while b'\n' in rig['buffer']:
+                line, rig['buffer'] = rig['buffer'].split(b'\n', 1)
+                msg = json.loads(line)
+                if msg.get('method') == 'job':
+                    job_id = msg['params'].get('job_id')
+                    if job_id in rig['notified']:
+                        duplicates += 1
+                    rig['notified'].add(job_id)
+                    seen, _ = jobs.get(job_id, (0, 0))
+                    jobs[job_id] = (seen + 1, now)
+                    rig['job'] = job_id
+                elif isinstance(msg.get('result'), dict) and 'job' in msg['result']:
+                    rig['job'] = msg['result']['job'].get('job_id')
+                    submit(sock, rig)
+                elif msg.get('id') is not None:
+                    if start_at <= now < end_at:
+                        acks += 1
+                    submit(sock, rig)
+    for sock in rigs:
+        sock.close()
+    results.put({'acks': acks, 'jobs': jobs, 'duplicates': duplicates,
+                 'rigsWithJobs': sum(1 for rig in rigs.values() if rig['notified'])})
+
+# =============================================================================
+# RUN
+# =============================================================================
+def run(workers, rigs, drivers, duration=DURATION, bridge_script=BRIDGE_SCRIPT, log_path=None):
+    proxy_submits = []           # wall-clock time of every submit the proxy received
+    job_sent = {}                # job_id -> wall-clock time sent
+    lock = threading.Lock()
+
+    def on_message(conn, text):
+        msg = json.loads(text)
+        msg_type = msg.get('type')
+        if msg_type == 'submit':
+            proxy_submits.append(time.time())
+            conn.send(json.dumps({'type': 'share_result', 'id': msg.get('id'), 'status': 'submitted'}))
+        elif msg_type == 'auth':
+            conn.send(json.dumps({'type': 'authed', 'params': {'hashes': 0}}))
+        elif msg_type == 'ping':
+            conn.send(json.dumps({'type': 'pong'}))
+
+    proxy = FakeProxy(on_message=on_message)
+    proxy.start()
+    port = free_port()
+    log = open(log_path, 'a') if log_path else subprocess.DEVNULL
+    cmd = [sys.executable, bridge_script, '--proxy-url', proxy.url('loadbench'), '--port', str(port),
+           '--no-history', '--backlog', '1024']
+    if workers:
+        cmd += ['--workers', str(workers)]
+    bridge = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT)
+    running = True
+
+    def job_loop(conn):
+        seq = 0
+        while running:
+            seq += 1
+            job_id = f'lb{seq}'
+            with lock:
+                job_sent[job_id] = time.time()
+            conn.send(json.dumps({'type': 'job', 'params': {'job_id': job_id, 'blob': '07' * 76,
+                                                            'target': 'b88d0600', 'seed_hash': '00' * 32,
+                                                            'height': seq, 'algo': 'rx/0'}}))
+            time.sleep(JOB_INTERVAL)
+
+    try:
+        conn = proxy.wait_for_connection(CONNECT_TIMEOUT)
+        if conn is None or not wait_for_port(port, CONNECT_TIMEOUT):
+            raise RuntimeError("bridge did not come up")
+        threading.Thread(target=job_loop, args=(conn,), daemon=True).start()
+        time.sleep(JOB_INTERVAL)
+
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        start_at = time.time() + WARMUP + 2   # Connection setup happens before the warmup
+        end_at = start_at + duration
+        per_driver = [rigs // drivers + (1 if i < rigs % drivers else 0) for i in range(drivers)]
+        procs, first = [], 0
+        for count in per_driver:
+            p = ctx.Process(target=drive_rigs, args=(port, first, count, start_at, end_at, results))
+            p.start()
+            procs.append(p)
+            first += count
+        totals = [results.get(timeout=duration + WARMUP + 60) for _ in procs]
+        for p in procs:
+            p.join()
+    finally:
+        running = False
+        bridge.terminate()
+        try:
+            bridge.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            bridge.kill()
+        proxy.stop()
+
+    # Fan-out: last receipt of a job that every rig got, minus when the proxy sent it
+    received = {}
+    for t in totals:
+        for job_id, (seen, latest) in t['jobs'].items():
+            count, last = received.get(job_id, (0, 0))
+            received[job_id] = (count + seen, max(last, latest))
+    fanout = [last - job_sent[j] for j, (count, last) in received.items()
+              if count == rigs and j in job_sent and start_at <= job_sent[j] < end_at]
+    measured = [t for t in proxy_submits if start_at <= t < end_at]
+    return {
+        'bridge': bridge_version(bridge_script),
+        'workers': workers,
+        'rigs': rigs,
+        'cpus': os.cpu_count(),
+        'duration': duration,
+        'submitsPerSec': sum(t['acks'] for t in totals) / duration,
+        'proxySubmitsPerSec': len(measured) / duration,
+        'fanoutMs': percentiles(fanout),
+        'duplicateJobs': sum(t['duplicates'] for t in totals),
+        'rigsWithJobs': sum(t['rigsWithJobs'] for t in totals),
+        'time': time.time(),
+    }
+
+def bridge_version(script):
+    with open(script) as f:
+        for line in f:
+            if line.startswith('BRIDGE_VERSION'):
+                return line.split('=', 1)[1].strip().strip('"\'')
+    return None
+
+def print_result(r):
+    fanout = r['fanoutMs']
+    p50 = f"{fanout['p50']:.1f}" if fanout.get('p50') is not None else '-'
+    p95 = f"{fanout['p95']:.1f}" if fanout.get('p95') is not None else '-'
+    print(f"  workers {r['workers']:>2}  rigs {r['rigs']:>5}  submits/s {r['submitsPerSec']:>9.0f}  "
+          f"proxy/s {r['proxySubmitsPerSec']:>9.0f}  fan-out p50 {p50:>7} ms  p95 {p95:>7} ms")
+    if r.get('duplicateJobs'):
+        print(f"             {r['duplicateJobs']} duplicate job notification(s) - rigs must get each job once")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure bridge share throughput and job fan-out under load")
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4],
+                        help="--workers settings to compare (0 = single process; default 0 2 4)")
+    parser.add_argument('--rigs', type=int, default=200, help="Simulated rigs (default 200)")
+    parser.add_argument('--drivers', type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                        help="Rig driver processes")
+    parser.add_argument('--duration', type=float, default=DURATION, help=f"Seconds measured (default {DURATION:.0f})")
+    parser.add_argument('--bridge', default=BRIDGE_SCRIPT, help="Bridge script to test")
+    parser.add_argument('--results', default=RESULTS_FILE, help=f"JSON-lines file results are appended to (default ./{RESULTS_FILE})")
+    parser.add_argument('--log', help="Append the bridge's output here")
+    parser.add_argument('--compare', action='store_true', help="Print stored results and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        for r in load_results(args.results):
+            print_result(r)
+        return 0
+
+    print(f"[Loadbench] {args.rigs} rigs, {args.drivers} driver process(es), {os.cpu_count()} CPUs")
+    baseline = None
+    duplicates = 0
+    for workers in args.workers:
+        result = run(workers, args.rigs, args.drivers, args.duration, args.bridge, args.log)
+        save_result(result, args.results)
+        print_result(result)
+        duplicates += result['duplicateJobs']
+        if baseline is None:
+            baseline = result['submitsPerSec'] or None
+        elif baseline:
+            print(f"             {result['submitsPerSec'] / baseline:.2f}x the first setting")
+    return 1 if duplicates else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -21,11 +21,23 @@ import urllib.request
 import platform
 import uuid
 import hashlib
+import secrets
+import shutil
+import tempfile
+import signal
+
+from power import PowerSampler, hashes_per_joule
+from resources import detect_resources, effective_threads, LoadSampler, process_cpu_seconds
+from topology import plan_threads, affinity_mask, format_cpu_list
+from xmrig_api import XmrigApi, PauseHolds
+import hugepages
+from history import HistoryWriter, HISTORY_DIR
+from console import Renderer, strip_ansi
 
 # =============================================================================
 # CONFIGURATION - CONNECTS THROUGH PROXY
 # =============================================================================
-CLIENT_VERSION = "4.1.1"  # Fixed ping_interval > ping_timeout
+CLIENT_VERSION = "4.6.0"  # Huge-page readiness and reporting
 WORKER_NAME = "windows-miner"
 
 # Generate a unique client ID (persisted in a file)
@@ -59,8 +71,35 @@ TEMP_RESUME = 70    # Resume at 70°C
 # XMRig settings
 XMRIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "xmrig")
 XMRIG_EXE = os.path.join(XMRIG_DIR, "xmrig.exe")
+XMRIG_API_PORT = 3334          # XMRig HTTP API (local only) - used to pause/resume in place
 XMRIG_URL = "https://github.com/xmrig/xmrig/releases/download/v6.21.1/xmrig-6.21.1-msvc-win64.zip"
 
+# Power / efficiency (Linux RAPL; usually needs root to read energy counters)
+POWER_SAMPLE_INTERVAL = 5     # Seconds between power samples
+# Pick the thread count with the best hashes per joule (--efficiency or MINER_EFFICIENCY=1)
+EFFICIENCY_MODE = '--efficiency' in sys.argv or os.environ.get('MINER_EFFICIENCY', '') not in ('', '0')
+POWER_CAP_WATTS = None        # Efficiency mode: only consider settings under this CPU power
+EFFICIENCY_SETTLE = 60        # Seconds after a restart before measuring (dataset init)
+EFFICIENCY_MEASURE = 60       # Seconds measured per thread count
+
+# CPU budget (cgroup quota, affinity, L3 size, competing load)
+RESOURCE_AWARE = True         # Shrink/grow threads when other workloads need the CPU
+RESOURCE_SAMPLE_INTERVAL = 10 # Seconds between load samples
+RESOURCE_STABLE_SAMPLES = 6   # Same new target this many samples in a row before acting
+RESOURCE_MIN_CHANGE_INTERVAL = 300  # Seconds between restarts for load changes
+CPU_AFFINITY = True           # Pin XMRig to the planner's CPUs (one per core first, spread over L3s)
+
+# Huge pages (RandomX runs ~1/3 slower without them)
+# Reserve the missing pages at startup (Linux, root only; lasts until reboot). Off: the command is printed instead
+HUGEPAGES_RESERVE = '--reserve-hugepages' in sys.argv or os.environ.get('MINER_HUGEPAGES_RESERVE', '') not in ('', '0')
+HUGEPAGES_1GB = False         # Put the dataset in 1 GB pages when they can be had
+
+# Performance history (history/miner.bin; query with history.py or the bridge's endpoint)
+HISTORY_ENABLED = True
+
+# Console: JSON lines on stdout instead of the colored UI (servers, log collectors)
+HEADLESS = '--headless' in sys.argv or os.environ.get('MINER_HEADLESS', '') not in ('', '0')
+
 # Bridge script
 BRIDGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ws_bridge.py")
 
@@ -91,10 +130,16 @@ status_bar = {
     'status': 'Starting...',
     'temp': None,
     'difficulty': 0,
-    'pool_suspended': False
+    'pool_suspended': False,
+    'watts': None,
+    'hpj': None,
+    'huge_pages': None
 }
 status_bar_enabled = True
 
+# The only writer to the terminal; log_* and the status bar never wait on it
+console = Renderer(headless=HEADLESS)
+
 def format_uptime(seconds):
     """Format uptime as H:MM:SS"""
     h = int(seconds // 3600)
@@ -115,6 +160,9 @@ def print_status_bar():
     temp = status_bar['temp']
     diff = status_bar['difficulty']
     suspended = status_bar['pool_suspended']
+    watts = status_bar['watts']
+    hpj = status_bar['hpj']
+    huge = status_bar['huge_pages']
     
     # Build status line
     if suspended:
@@ -122,57 +170,70 @@ def print_status_bar():
     else:
         temp_str = f" | 🌡️ {temp:.0f}°C" if temp else ""
         diff_str = f" | Diff: {diff}" if diff > 0 else ""
-        line = f"{Colors.CYAN}⛏️ {hr:.1f} H/s{Colors.RESET} | ✅ {acc} | ❌ {rej} | ⏱️ {up}{temp_str}{diff_str} | {st}"
+        power_str = f" | ⚡ {watts:.0f}W" if watts is not None else ""
+        power_str += f" {hpj:.2f} H/J" if hpj is not None else ""
+        if huge is not None:
+            penalty = hugepages.estimated_penalty(huge)
+            power_str += f" | HP {huge}%" + (f" (~-{penalty:.0f}%)" if penalty >= 1 else "")
+        line = f"{Colors.CYAN}⛏️ {hr:.1f} H/s{Colors.RESET} | ✅ {acc} | ❌ {rej} | ⏱️ {up}{temp_str}{power_str}{diff_str} | {st}"
     
-    # Print at bottom (save cursor, move to bottom, clear, print, restore)
-    print(f"\r{Colors.CLEAR_LINE}{line}", end='', flush=True)
+    # Drawn by the console thread (rate-limited, skipped when unchanged)
+    console.status(line, dict(status_bar, status=strip_ansi(st)))
 
-def log_with_status(msg, color=Colors.WHITE, prefix="[i]"):
-    """Log a message and redraw status bar"""
-    # Clear current line, print message, then status bar
-    print(f"\r{Colors.CLEAR_LINE}{Colors.WHITE}[{time.strftime('%H:%M:%S')}] {color}{prefix}{Colors.RESET} {msg}")
-    print_status_bar()
+def log_with_status(msg, color=Colors.WHITE, prefix="[i]", level='info'):
+    """Log a message; the console thread prints it above the status bar"""
+    console.log(msg, level, prefix, color)
 
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
 def print_banner():
+    if HEADLESS:
+        return
     clear_screen()
-    print(f"{Colors.CYAN}╔══════════════════════════════════════════════════════════════════════════════╗{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.YELLOW}  ██╗  ██╗███╗   ███╗██████╗     ███╗   ███╗██╗███╗   ██╗███████╗██████╗      {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.YELLOW}  ╚██╗██╔╝████╗ ████║██╔══██╗    ████╗ ████║██║████╗  ██║██╔════╝██╔══██╗     {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.YELLOW}   ╚███╔╝ ██╔████╔██║██████╔╝    ██╔████╔██║██║██╔██╗ ██║█████╗  ██████╔╝     {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.YELLOW}   ██╔██╗ ██║╚██╔╝██║██╔══██╗    ██║╚██╔╝██║██║██║╚██╗██║██╔══╝  ██╔══██╗     {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.YELLOW}  ██╔╝ ██╗██║ ╚═╝ ██║██║  ██║    ██║ ╚═╝ ██║██║██║ ╚████║███████╗██║  ██║     {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.YELLOW}  ╚═╝  ╚═╝╚═╝     ╚═╝╚═╝  ╚═╝    ╚═╝     ╚═╝╚═╝╚═╝  ╚═══╝╚══════╝╚═╝  ╚═╝     {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}╠══════════════════════════════════════════════════════════════════════════════╣{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.WHITE}  Windows Native Miner v{CLIENT_VERSION} - Connects via Proxy (Combined Mining)     {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.GREEN}  Proxy: {PROXY_HOST}                                          {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}║{Colors.BLUE}  Client ID: {MINER_CLIENT_ID}                                       {Colors.CYAN}║{Colors.RESET}")
-    print(f"{Colors.CYAN}╚══════════════════════════════════════════════════════════════════════════════╝{Colors.RESET}")
-    print()
+    console.raw(f"{Colors.CYAN}╔══════════════════════════════════════════════════════════════════════════════╗{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.YELLOW}  ██╗  ██╗███╗   ███╗██████╗     ███╗   ███╗██╗███╗   ██╗███████╗██████╗      {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.YELLOW}  ╚██╗██╔╝████╗ ████║██╔══██╗    ████╗ ████║██║████╗  ██║██╔════╝██╔══██╗     {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.YELLOW}   ╚███╔╝ ██╔████╔██║██████╔╝    ██╔████╔██║██║██╔██╗ ██║█████╗  ██████╔╝     {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.YELLOW}   ██╔██╗ ██║╚██╔╝██║██╔══██╗    ██║╚██╔╝██║██║██║╚██╗██║██╔══╝  ██╔══██╗     {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.YELLOW}  ██╔╝ ██╗██║ ╚═╝ ██║██║  ██║    ██║ ╚═╝ ██║██║██║ ╚████║███████╗██║  ██║     {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.YELLOW}  ╚═╝  ╚═╝╚═╝     ╚═╝╚═╝  ╚═╝    ╚═╝     ╚═╝╚═╝╚═╝  ╚═══╝╚══════╝╚═╝  ╚═╝     {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}╠══════════════════════════════════════════════════════════════════════════════╣{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.WHITE}  Windows Native Miner v{CLIENT_VERSION} - Connects via Proxy (Combined Mining)     {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.GREEN}  Proxy: {PROXY_HOST}                                          {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}║{Colors.BLUE}  Client ID: {MINER_CLIENT_ID}                                       {Colors.CYAN}║{Colors.RESET}")
+    console.raw(f"{Colors.CYAN}╚══════════════════════════════════════════════════════════════════════════════╝{Colors.RESET}")
+    console.raw()
 
 def log_info(msg):
-    log_with_status(msg, Colors.BLUE, "[i]")
+    log_with_status(msg, Colors.BLUE, "[i]", 'info')
 
 def log_success(msg):
-    log_with_status(msg, Colors.GREEN, "[+]")
+    log_with_status(msg, Colors.GREEN, "[+]", 'success')
 
 def log_warning(msg):
-    log_with_status(msg, Colors.YELLOW, "[!]")
+    log_with_status(msg, Colors.YELLOW, "[!]", 'warning')
 
 def log_error(msg):
-    log_with_status(msg, Colors.RED, "[x]")
+    log_with_status(msg, Colors.RED, "[x]", 'error')
 
 def log_hash(msg):
-    log_with_status(msg, Colors.CYAN, "[#]")
+    log_with_status(msg, Colors.CYAN, "[#]", 'hash')
 
 # =============================================================================
 # SYSTEM DETECTION
 # =============================================================================
-def get_cpu_info():
-    """Get CPU information"""
-    cores = os.cpu_count() or 4
+def plan_cpu():
+    """(resources, thread plan) for this machine; (None, None) if detection fails"""
+    try:
+        res = detect_resources()
+        return res, plan_threads(res['cpus'], res['quota'])
+    except Exception:
+        return None, None
+
+def get_cpu_info(plan):
+    """Get CPU information (cores = threads XMRig may use: quota, affinity, cache topology)"""
+    cores = plan['threads'] if plan else (os.cpu_count() or 4)
     try:
         if platform.system() == "Windows":
             import subprocess
@@ -253,10 +314,10 @@ def download_xmrig():
             downloaded = block_num * block_size
             if total_size > 0:
                 percent = min(100, downloaded * 100 // total_size)
-                print(f"\r{Colors.BLUE}[i]{Colors.RESET} Downloading: {percent}%", end='', flush=True)
+                console.status(f"{Colors.BLUE}[i]{Colors.RESET} Downloading: {percent}%", {'download': percent})
         
         urllib.request.urlretrieve(XMRIG_URL, zip_path, report_progress)
-        print()
+        console.status(None)
         
         log_info("Extracting XMRig...")
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
@@ -289,7 +350,7 @@ def download_xmrig():
 # MINER PROCESS
 # =============================================================================
 class MinerProcess:
-    def __init__(self):
+    def __init__(self, plan, cores, cpu_name):
         self.process = None
         self.bridge_process = None
         self.running = False
@@ -298,8 +359,22 @@ class MinerProcess:
         self.rejected = 0
         self.throttled = False
         self.paused = False
-        self.cores, self.cpu_name = get_cpu_info()
-        self.threads = self.cores  # Full power
+        self.pause_method = None  # 'api', 'signal' or 'stop' while paused
+        self.paused_at = None
+        self.paused_cpu_start = None
+        self.restart_on_resume = False  # Thread count changed while paused
+        self.huge_pages = None  # % of the RandomX dataset in huge pages (from XMRig's log)
+        self.huge_page_args = []  # From hugepages.check() at startup
+        self.api_token = secrets.token_hex(16)
+        self.api = XmrigApi(f"http://127.0.0.1:{XMRIG_API_PORT}", self.api_token)
+        self.holds_dir = tempfile.mkdtemp(prefix='xmrig-pause-')  # Who holds XMRig paused (shared with the bridge)
+        self.holds = PauseHolds(self.holds_dir)
+        self.cores, self.cpu_name = cores, cpu_name
+        self.plan = plan  # From plan_cpu() in main()
+        self.full_threads = self.cores  # Thread count when not throttled
+        self.preferred_threads = self.cores  # Upper bound chosen by efficiency mode
+        self.tuning = False
+        self.threads = self.full_threads  # Full power
     
     def start_bridge(self):
         """Start the WebSocket-to-Stratum bridge"""
@@ -308,9 +383,13 @@ class MinerProcess:
             return False
         
         log_info("Starting WebSocket bridge...")
+        if not os.path.isdir(self.holds_dir):
+            self.holds = PauseHolds(self.holds_dir)  # Removed by stop(): start with no holders
         try:
             self.bridge_process = subprocess.Popen(
-                [sys.executable, BRIDGE_SCRIPT],
+                [sys.executable, BRIDGE_SCRIPT,
+                 "--xmrig-api", self.api.url, "--xmrig-token", self.api_token,
+                 "--pause-holds", self.holds_dir],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 text=True,
@@ -366,8 +445,19 @@ class MinerProcess:
             "-a", "rx/0",
             "-t", str(self.threads),
             "--no-color",
-            "--print-time", "10"
+            "--print-time", "10",
+            # Local API so pauses don't restart XMRig (and rebuild the RandomX dataset)
+            "--http-host", "127.0.0.1",
+            "--http-port", str(XMRIG_API_PORT),
+            "--http-access-token", self.api_token,
+            "--http-no-restricted",
         ]
+        cmd += self.huge_page_args
+        if CPU_AFFINITY and self.plan and self.plan['source'] != 'none':
+            # Fewer threads (throttle, load) keep the front of the plan's order
+            mask = affinity_mask(self.plan['order'], self.threads)
+            if mask:
+                cmd += ["--cpu-affinity", hex(mask)]
         
         log_info(f"Starting XMRig with {self.threads} threads...")
         log_info(f"Connecting to local bridge: {pool_url}")
@@ -401,6 +491,19 @@ class MinerProcess:
                 if not line:
                     continue
                 
+                # Where the RandomX dataset landed: "randomx allocated ... huge pages 100% 1168/1168"
+                huge = hugepages.parse_xmrig_line(line)
+                if huge:
+                    kind, percent, used, total = huge
+                    if kind == 'dataset':
+                        self.huge_pages = percent
+                        if percent == 100:
+                            log_success(f"RandomX dataset in huge pages ({used}/{total})")
+                        else:
+                            log_warning(f"Only {percent}% of the RandomX dataset in huge pages ({used}/{total}) - "
+                                        f"~{hugepages.estimated_penalty(percent):.0f}% slower")
+                    continue
+                
                 # Parse hashrate
                 if "speed" in line.lower() and "h/s" in line.lower():
                     try:
@@ -441,10 +544,17 @@ class MinerProcess:
         finally:
             self.running = False
     
+    def _continue_if_stopped(self):
+        """A SIGSTOPped XMRig only handles SIGTERM once continued"""
+        if self.pause_method == 'signal' and self.process:
+            os.kill(self.process.pid, signal.SIGCONT)
+            self.pause_method = None
+    
     def stop(self):
         """Stop XMRig and bridge"""
         if self.process:
             log_warning("Stopping XMRig...")
+            self._continue_if_stopped()
             self.process.terminate()
             try:
                 self.process.wait(timeout=5)
@@ -460,13 +570,73 @@ class MinerProcess:
             except:
                 self.bridge_process.kill()
             self.bridge_process = None
+        shutil.rmtree(self.holds_dir, ignore_errors=True)
             
         self.running = False
         self.hashrate = 0
     
+    def pause(self):
+        """Stop hashing without tearing down XMRig: API pause, else SIGSTOP, else stop"""
+        if not self.process:
+            return
+        self.paused_at = time.time()
+        self.paused_cpu_start = process_cpu_seconds(self.process.pid)
+        self.holds.hold('thermal')
+        if self.api.pause():
+            self.pause_method = 'api'
+        elif hasattr(signal, 'SIGSTOP'):
+            os.kill(self.process.pid, signal.SIGSTOP)
+            self.pause_method = 'signal'
+        else:
+            self.pause_method = 'stop'
+            self.stop()
+        log_info(f"XMRig paused ({self.pause_method})")
+    
+    def ensure_paused(self):
+        """Re-apply an API pause if XMRig came back unpaused (e.g. it was restarted)"""
+        if self.pause_method == 'api' and self.api.is_paused() is False:
+            self.api.pause()
+    
+    def resume(self):
+        """Undo pause(); with the API or SIGCONT hashing restarts within a second"""
+        others = self.holds.release('thermal')
+        if self.pause_method == 'api' and others:
+            # The bridge holds XMRig paused for the proxy; its resume will restart it
+            self.pause_method = None
+            log_info(f"Thermal pause lifted; XMRig stays paused for: {', '.join(sorted(others))}")
+            return
+        method, self.pause_method = self.pause_method, None
+        restart, self.restart_on_resume = self.restart_on_resume, False
+        start = time.time()
+        if method == 'api':
+            if not self.api.resume():
+                log_warning("XMRig API resume failed - restarting XMRig")
+                self.set_threads(self.threads)
+        elif method == 'signal' and self.process:
+            os.kill(self.process.pid, signal.SIGCONT)
+        else:
+            self.start()
+        if restart and method in ('api', 'signal'):
+            self.set_threads(self.threads)
+        log_info(f"XMRig resumed ({method or 'start'}, {(time.time() - start) * 1000:.0f} ms)")
+    
+    def paused_cpu_percent(self):
+        """XMRig's CPU use since it was paused, in % of one core (None if unknown)"""
+        if not self.process or self.paused_cpu_start is None or not self.paused_at:
+            return None
+        used = process_cpu_seconds(self.process.pid)
+        elapsed = time.time() - self.paused_at
+        if used is None or elapsed <= 0:
+            return None
+        return (used - self.paused_cpu_start) / elapsed * 100
+    
     def set_threads(self, threads):
         """Change thread count (requires restart)"""
         self.threads = max(1, min(threads, self.cores))
+        if self.pause_method:
+            # Applied on resume; restarting now would undo the pause
+            self.restart_on_resume = True
+            return
         if self.running:
             log_info(f"Restarting with {self.threads} threads...")
             # Only restart XMRig, not the bridge
@@ -503,54 +673,204 @@ class TempMonitor:
             if temp is not None:
                 if temp >= TEMP_STOP:
                     if not self.miner.paused:
-                        log_error(f"🔥 CPU TEMP: {temp:.0f}°C - STOPPING MINER!")
+                        log_error(f"🔥 CPU TEMP: {temp:.0f}°C - PAUSING MINER!")
                         self.miner.paused = True
-                        self.miner.stop()
+                        self.miner.pause()
+                    else:
+                        self.miner.ensure_paused()
                         
                 elif temp >= TEMP_THROTTLE:
                     if not self.miner.throttled:
                         log_warning(f"⚠️  CPU TEMP: {temp:.0f}°C - Throttling to 50%")
                         self.miner.throttled = True
-                        self.miner.set_threads(max(1, self.miner.cores // 2))
+                        self.miner.set_threads(max(1, self.miner.full_threads // 2))
                         
                 elif temp < TEMP_RESUME:
                     if self.miner.paused:
                         log_success(f"✓ CPU TEMP: {temp:.0f}°C - Resuming mining")
                         self.miner.paused = False
-                        self.miner.start()
+                        self.miner.resume()
                     elif self.miner.throttled:
                         log_success(f"✓ CPU TEMP: {temp:.0f}°C - Restoring full power")
                         self.miner.throttled = False
-                        self.miner.set_threads(self.miner.cores)
+                        self.miner.set_threads(self.miner.full_threads)
             
             time.sleep(10)
 
+# =============================================================================
+# RESOURCE MONITOR
+# =============================================================================
+class ResourceMonitor:
+    """Follows competing CPU load and resizes XMRig to the cores actually free.
+
+    Only acts when the same new thread count is seen RESOURCE_STABLE_SAMPLES
+    times in a row, and at most every RESOURCE_MIN_CHANGE_INTERVAL seconds,
+    because every change restarts XMRig.
+    """
+    def __init__(self, miner, resources):
+        self.miner = miner
+        self.running = False
+        self.resources = resources
+        self.sampler = LoadSampler(self.resources['cpus'])
+        self.load = None
+        
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._monitor_loop, daemon=True).start()
+        
+    def stop(self):
+        self.running = False
+    
+    def _own_pids(self):
+        procs = (self.miner.process, self.miner.bridge_process)
+        return [p.pid for p in procs if p is not None]
+        
+    def _monitor_loop(self):
+        last_change = 0
+        pending, streak = None, 0
+        while self.running:
+            time.sleep(RESOURCE_SAMPLE_INTERVAL)
+            self.load = self.sampler.sample(self._own_pids())
+            if self.load is None or self.miner.tuning:
+                continue
+            
+            target = min(effective_threads(self.resources, self.load), self.miner.preferred_threads)
+            if target == self.miner.full_threads:
+                pending, streak = None, 0
+                continue
+            streak = streak + 1 if target == pending else 1
+            pending = target
+            if streak < RESOURCE_STABLE_SAMPLES or time.time() - last_change < RESOURCE_MIN_CHANGE_INTERVAL:
+                continue
+            
+            log_info(f"Other load on the CPU: {self.load:.1f} cores - using {target} threads "
+                     f"(was {self.miner.full_threads})")
+            self.miner.full_threads = target
+            if not self.miner.throttled and not self.miner.paused:
+                self.miner.set_threads(target)
+            last_change = time.time()
+            pending, streak = None, 0
+
+# =============================================================================
+# EFFICIENCY TUNER
+# =============================================================================
+class EfficiencyTuner:
+    """Tries a few thread counts and keeps the one with the best hashes per joule.
+
+    Each candidate runs for EFFICIENCY_SETTLE + EFFICIENCY_MEASURE seconds.
+    Candidates above POWER_CAP_WATTS are skipped; if none fit under the cap
+    the lowest-power setting wins.
+    """
+    def __init__(self, miner, sampler, power_cap=POWER_CAP_WATTS):
+        self.miner = miner
+        self.sampler = sampler
+        self.power_cap = power_cap
+        self.results = {}  # {threads: (hashrate, watts)}
+        
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+    
+    def candidates(self):
+        cores = self.miner.cores
+        return sorted({max(1, round(cores * f)) for f in (1.0, 0.75, 0.5, 0.25)}, reverse=True)
+    
+    def _measure(self, threads):
+        self.miner.set_threads(threads)
+        time.sleep(EFFICIENCY_SETTLE)
+        hashrates, watts = [], []
+        self.sampler.sample()
+        end = time.time() + EFFICIENCY_MEASURE
+        while time.time() < end:
+            time.sleep(POWER_SAMPLE_INTERVAL)
+            w = self.sampler.sample()
+            if w is not None and self.miner.hashrate:
+                hashrates.append(self.miner.hashrate)
+                watts.append(w)
+            if self.miner.paused or self.miner.throttled:
+                return None
+        if not watts:
+            return None
+        return sum(hashrates) / len(hashrates), sum(watts) / len(watts)
+    
+    def _run(self):
+        if not self.sampler.available:
+            log_warning("Efficiency mode needs RAPL power counters (Linux, usually root) - skipped")
+            return
+        self.miner.tuning = True
+        try:
+            self._tune()
+        finally:
+            self.miner.tuning = False
+    
+    def _tune(self):
+        log_info(f"Efficiency mode: testing {self.candidates()} threads"
+                 + (f" under {self.power_cap}W" if self.power_cap else ""))
+        for threads in self.candidates():
+            result = self._measure(threads)
+            if result is None:
+                log_warning(f"Efficiency mode: {threads} threads not measured (paused/throttled)")
+                continue
+            hashrate, watts = result
+            self.results[threads] = result
+            log_info(f"Efficiency mode: {threads} threads -> {hashrate:.1f} H/s, {watts:.0f}W, "
+                     f"{hashes_per_joule(hashrate, watts):.2f} H/J")
+        if not self.results:
+            self.miner.set_threads(self.miner.full_threads)
+            return
+        
+        fitting = {t: r for t, r in self.results.items() if not self.power_cap or r[1] <= self.power_cap}
+        if fitting:
+            best = max(fitting, key=lambda t: hashes_per_joule(*fitting[t]) or 0)
+        else:
+            best = min(self.results, key=lambda t: self.results[t][1])
+            log_warning(f"Efficiency mode: nothing fits under {self.power_cap}W, using the lowest power")
+        self.miner.full_threads = self.miner.preferred_threads = best
+        if not self.miner.throttled and not self.miner.paused:
+            self.miner.set_threads(best)
+        hashrate, watts = self.results[best]
+        log_success(f"Efficiency mode: using {best} threads ({hashes_per_joule(hashrate, watts):.2f} H/J, {watts:.0f}W)")
+
 # =============================================================================
 # MAIN
 # =============================================================================
+def exit_with_error():
+    """Flush the console, keep the window open (unless headless) and exit"""
+    console.close()
+    if not HEADLESS:
+        input("\nPress Enter to exit...")
+    sys.exit(1)
+
 def main():
+    console.start()
     print_banner()
     
     # System info
-    cores, cpu_name = get_cpu_info()
+    res, plan = plan_cpu()
+    cores, cpu_name = get_cpu_info(plan)
     log_info(f"CPU: {cpu_name}")
-    log_info(f"Cores: {cores}")
+    if res:
+        quota = f", quota {res['quota']:.1f} cores" if res['quota'] is not None else ""
+        log_info(f"Cores: {cores} usable of {res['logical']} (allowed {len(res['cpus'])}{quota})")
+        log_info(f"Thread plan: {plan['threads']} threads on CPUs {format_cpu_list(plan['affinity'])} "
+                 f"(from {plan['source']})")
+        for reason in plan['reasons']:
+            log_info(f"  {reason}")
+    else:
+        log_info(f"Cores: {cores}")
     log_info(f"Platform: {platform.system()} {platform.release()}")
-    print()
+    console.raw()
     
     # Check connection
     if not check_connection():
         log_error("Cannot connect to internet. Please check your connection.")
-        input("\nPress Enter to exit...")
-        sys.exit(1)
-    print()
+        exit_with_error()
+    console.raw()
     
     # Download XMRig if needed
     if not download_xmrig():
         log_error("Cannot proceed without XMRig")
-        input("\nPress Enter to exit...")
-        sys.exit(1)
-    print()
+        exit_with_error()
+    console.raw()
     
     # Check for websockets library
     try:
@@ -559,37 +879,64 @@ def main():
         log_warning("Installing websockets library...")
         subprocess.run([sys.executable, "-m", "pip", "install", "websockets"], check=True)
         log_success("websockets installed!")
-    print()
+    console.raw()
     
     # Important note about proxy connection
-    print(f"{Colors.YELLOW}{'='*78}{Colors.RESET}")
-    print(f"{Colors.YELLOW}  ✓ This miner connects through the proxy server (WebSocket bridge){Colors.RESET}")
-    print(f"{Colors.YELLOW}  ✓ Your hashrate will be COMBINED with all other miners{Colors.RESET}")
-    print(f"{Colors.YELLOW}  ✓ You can be controlled from the Owner Panel{Colors.RESET}")
-    print(f"{Colors.YELLOW}{'='*78}{Colors.RESET}")
-    print()
+    console.raw(f"{Colors.YELLOW}{'='*78}{Colors.RESET}")
+    console.raw(f"{Colors.YELLOW}  ✓ This miner connects through the proxy server (WebSocket bridge){Colors.RESET}")
+    console.raw(f"{Colors.YELLOW}  ✓ Your hashrate will be COMBINED with all other miners{Colors.RESET}")
+    console.raw(f"{Colors.YELLOW}  ✓ You can be controlled from the Owner Panel{Colors.RESET}")
+    console.raw(f"{Colors.YELLOW}{'='*78}{Colors.RESET}")
+    console.raw()
     
     # Create miner
-    miner = MinerProcess()
+    miner = MinerProcess(plan, cores, cpu_name)
     
     # Start temp monitor
     temp_monitor = TempMonitor(miner)
     temp_monitor.start()
     
+    # Follow competing CPU load (Linux /proc)
+    resource_monitor = None
+    if RESOURCE_AWARE and res and os.path.exists('/proc/stat'):
+        resource_monitor = ResourceMonitor(miner, res)
+        resource_monitor.start()
+    
+    # Power sampling (hashes per joule)
+    power_sampler = PowerSampler()
+    if power_sampler.available:
+        log_info(f"Power: RAPL zones {', '.join(z.name for z in power_sampler.zones)}")
+    
+    history_writer = None
+    if HISTORY_ENABLED:
+        try:
+            history_writer = HistoryWriter(os.path.join(HISTORY_DIR, 'miner.bin'))
+        except (OSError, ValueError) as e:
+            log_warning(f"History disabled: {e}")
+    
+    # Huge pages for the RandomX dataset (reserved now, so XMRig finds them free)
+    readiness = hugepages.check(miner.threads, HUGEPAGES_RESERVE, HUGEPAGES_1GB)
+    miner.huge_page_args = readiness['xmrigArgs']
+    for reason in readiness['reasons']:
+        (log_warning if readiness['ready'] is False else log_info)(reason)
+    
     # Start mining
     log_info("Starting miner (Full Power Mode)...")
     if not miner.start():
         log_error("Failed to start miner")
-        input("\nPress Enter to exit...")
-        sys.exit(1)
+        exit_with_error()
     
-    print()
+    console.raw()
     log_success("Mining started! Press Ctrl+C to stop.")
-    print()
-    print()  # Extra line for status bar
+    console.raw()
+    console.raw()  # Extra line for status bar
+    
+    if EFFICIENCY_MODE:
+        EfficiencyTuner(miner, PowerSampler()).start()
     
     # Main loop - update status bar
     start_time = time.time()
+    last_power_sample = start_time
     try:
         while True:
             time.sleep(1)
@@ -599,10 +946,20 @@ def main():
             status_bar['hashrate'] = miner.hashrate
             status_bar['accepted'] = miner.accepted
             status_bar['rejected'] = miner.rejected
+            status_bar['huge_pages'] = miner.huge_pages
             status_bar['temp'] = get_cpu_temp()
+            if power_sampler.available and time.time() - last_power_sample >= POWER_SAMPLE_INTERVAL:
+                last_power_sample = time.time()
+                status_bar['watts'] = power_sampler.sample()
+                status_bar['hpj'] = hashes_per_joule(miner.hashrate, status_bar['watts'])
+            if history_writer:
+                history_writer.record(miner.hashrate, status_bar['temp'], status_bar['watts'],
+                                      miner.accepted, miner.accepted + miner.rejected, miner.rejected)
             
             if miner.paused:
-                status_bar['status'] = f"{Colors.RED}PAUSED (temp){Colors.RESET}"
+                cpu = miner.paused_cpu_percent()
+                cpu = f", XMRig CPU {cpu:.1f}%" if cpu is not None else ""
+                status_bar['status'] = f"{Colors.RED}PAUSED (temp{cpu}){Colors.RESET}"
             elif miner.throttled:
                 status_bar['status'] = f"{Colors.YELLOW}THROTTLED{Colors.RESET}"
             elif miner.running:
@@ -614,12 +971,17 @@ def main():
             print_status_bar()
             
     except KeyboardInterrupt:
-        print()
-        print()
+        console.raw()
+        console.raw()
         log_warning("Stopping miner...")
         temp_monitor.stop()
+        if resource_monitor:
+            resource_monitor.stop()
         miner.stop()
+        if history_writer:
+            history_writer.close()
         log_info("Goodbye!")
+        console.close()
 
 if __name__ == "__main__":
     main()
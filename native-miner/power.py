@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+CPU Power Sampling (Linux powercap / RAPL)
+Reads the RAPL energy counters under /sys/class/powercap and turns them into
+watts, so the miner and bridge can report hashes per joule.
+
+- Uses the package zones (intel-rapl:N, name "package-N"); falls back to
+  "psys" or any top-level zone when there are no package zones
+- Handles counter wraparound using max_energy_range_uj
+- `root` can point at a fake sysfs tree for testing
+- Unavailable (None) on Windows, without RAPL, or when energy_uj is root-only
+
+Usage:
+  python power.py            # print watts every second
+"""
+
+import os
+import sys
+import time
+
+POWERCAP_ROOT = "/sys/class/powercap"
+
+def _read_int(path):
+    with open(path, 'r') as f:
+        return int(f.read().strip())
+
+def _read_str(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+class RaplZone:
+    """One energy counter (microjoules) with wraparound handling"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = _read_str(os.path.join(path, 'name')) or os.path.basename(path)
+        try:
+            self.max_range = _read_int(os.path.join(path, 'max_energy_range_uj'))
+        except (OSError, ValueError):
+            self.max_range = 0
+        self.last = self.read()
+
+    def read(self):
+        return _read_int(os.path.join(self.path, 'energy_uj'))
+
+    def delta(self):
+        """Microjoules used since the previous call"""
+        current = self.read()
+        used = current - self.last
+        if used < 0:
+            # Counter wrapped
+            used += self.max_range if self.max_range else 0
+            used = max(used, 0)
+        self.last = current
+        return used
+
+def find_zones(root=POWERCAP_ROOT):
+    """Top-level RAPL zones worth summing for CPU power"""
+    try:
+        entries = sorted(os.listdir(root))
+    except OSError:
+        return []
+    top = []
+    for entry in entries:
+        # intel-rapl:0 is a package; intel-rapl:0:0 is a subzone (core/uncore/dram)
+        if entry.startswith('intel-rapl:') and entry.count(':') == 1:
+            path = os.path.join(root, entry)
+            if os.path.exists(os.path.join(path, 'energy_uj')):
+                top.append(path)
+    names = {path: _read_str(os.path.join(path, 'name')) for path in top}
+    packages = [p for p in top if names[p].startswith('package')]
+    if packages:
+        return packages
+    psys = [p for p in top if names[p] == 'psys']
+    return psys or top
+
+class PowerSampler:
+    """Average CPU power between calls to sample()"""
+
+    def __init__(self, root=POWERCAP_ROOT, clock=time.monotonic):
+        self.clock = clock
+        self.zones = []
+        for path in find_zones(root):
+            try:
+                self.zones.append(RaplZone(path))
+            except (OSError, ValueError):
+                # energy_uj is root-only on most distros since 2020
+                pass
+        self.last_time = clock()
+        self.watts = None
+
+    @property
+    def available(self):
+        return bool(self.zones)
+
+    def sample(self):
+        """Watts since the previous sample (None if unavailable)"""
+        if not self.zones:
+            return None
+        now = self.clock()
+        elapsed = now - self.last_time
+        if elapsed <= 0:
+            return self.watts
+        try:
+            used = sum(zone.delta() for zone in self.zones)
+        except (OSError, ValueError):
+            return self.watts
+        self.last_time = now
+        self.watts = used / 1e6 / elapsed
+        return self.watts
+
+def hashes_per_joule(hashrate, watts):
+    """Mining efficiency: H/s divided by J/s"""
+    if not hashrate or not watts:
+        return None
+    return hashrate / watts
+
+if __name__ == '__main__':
+    sampler = PowerSampler(sys.argv[1] if len(sys.argv) > 1 else POWERCAP_ROOT)
+    if not sampler.available:
+        print("RAPL energy counters not available (needs Linux powercap, often root)")
+        sys.exit(1)
+    print(f"Zones: {', '.join(z.name for z in sampler.zones)}")
+    while True:
+        time.sleep(1)
+        print(f"{sampler.sample():.1f} W")
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+Bridge Trace Replayer
+Drives a bridge build from a trace recorded with `ws_bridge.py --record`.
+
+The replayer plays both sides of the recorded traffic against a fresh
+bridge process:
+- a stand-in proxy (fakeproxy.py) sends the recorded proxy frames
+- fake XMRig clients open the recorded stratum sessions and send their lines
+Everything happens at the recorded times (divided by --speed), so job storms,
+reconnect floods and share spikes keep their real shape.
+
+It reports job fan-out latency (proxy job -> XMRig) and submit latency
+(XMRig submit -> proxy) next to the same numbers from the recording, plus
+throughput and scheduling lag. With --max-job-p95-ms / --max-submit-p95-ms it
+exits non-zero on regressions, so it can gate a new bridge build.
+
+Usage:
+  python ws_bridge.py --record session.trace.gz      # on a real bridge
+  python replay.py session.trace.gz                  # real speed
+  python replay.py session.trace.gz --speed 10 --json result.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import zlib
+
+from fakeproxy import FakeProxy
+
+BRIDGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ws_bridge.py")
+CONNECT_TIMEOUT = 30           # Seconds to wait for the bridge's WebSocket
+RECONNECT_TIMEOUT = 15         # Seconds to wait for the bridge to come back after a recorded drop
+SETTLE_TIME = 2.0              # Seconds to keep listening after the last event
+
+# =============================================================================
+# TRACE LOADING
+# =============================================================================
+def load_trace(path):
+    """Read a trace. Returns (header, events). Tolerates a truncated tail."""
+    events = []
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        try:
+            header = json.loads(f.readline())
+            if header.get('format') != 'bridge-trace':
+                raise ValueError(f"{path} is not a bridge trace")
+            for line in f:
+                if line.strip():
+                    events.append(json.loads(line))
+        except (EOFError, zlib.error, json.JSONDecodeError):
+            # Bridge killed while recording: keep what was written
+            pass
+    return header, events
+
+def _parse(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return {}
+
+def _job_id(msg):
+    """job_id of a proxy job frame or a stratum job notification"""
+    if msg.get('type') == 'job' or msg.get('method') == 'job':
+        return (msg.get('params') or {}).get('job_id')
+    return None
+
+def _nonce(msg):
+    """Share key of a stratum or proxy submit"""
+    if msg.get('type') == 'submit' or msg.get('method') == 'submit':
+        params = msg.get('params') or {}
+        return (params.get('job_id'), params.get('nonce'))
+    return None
+
+def percentiles(samples):
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    return {
+        'count': len(ordered),
+        'p50': round(pick(0.50) * 1000, 2),
+        'p95': round(pick(0.95) * 1000, 2),
+        'max': round(ordered[-1] * 1000, 2),
+    }
+
+# =============================================================================
+# RECORDED LATENCIES
+# =============================================================================
+def recorded_latencies(events):
+    """Job fan-out and submit latencies as they happened in the recording"""
+    job_in = {}
+    job_latency = []
+    submit_in = {}
+    submit_latency = []
+    for t, channel, session, direction, data in events:
+        if direction not in ('in', 'out'):
+            continue
+        msg = _parse(data)
+        if channel == 'ws' and direction == 'in':
+            job_id = _job_id(msg)
+            if job_id is not None:
+                job_in.setdefault(job_id, t)
+        elif channel == 'stratum' and session == '*':
+            job_id = _job_id(msg)
+            if job_id in job_in:
+                job_latency.append(t - job_in.pop(job_id))
+        elif channel == 'stratum' and direction == 'in':
+            key = _nonce(msg)
+            if key:
+                submit_in.setdefault(key, t)
+        elif channel == 'ws' and direction == 'out':
+            key = _nonce(msg)
+            if key in submit_in:
+                submit_latency.append(t - submit_in.pop(key))
+    return job_latency, submit_latency
+
+# =============================================================================
+# REPLAY
+# =============================================================================
+class FakeRig:
+    """One replayed XMRig stratum session"""
+
+    def __init__(self, session, port):
+        self.session = session
+        self.sock = socket.create_connection(('127.0.0.1', port), timeout=10)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.received = []       # (monotonic time, parsed message)
+        threading.Thread(target=self._reader, daemon=True).start()
+
+    def _reader(self):
+        buffer = b''
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                now = time.monotonic()
+                buffer += data
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
+                    if line.strip():
+                        self.received.append((now, _parse(line.decode('utf-8', 'replace'))))
+        except OSError:
+            pass
+
+    def send(self, line):
+        try:
+            self.sock.sendall(line.encode() + b'\n')
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def build_schedule(events):
+    """Replay actions (trace time, kind, session, data), relative to the first proxy connection"""
+    origin = next((e[0] for e in events if e[1] == 'ws' and e[3] == 'open'), 0.0)
+    actions = []
+    for t, channel, session, direction, data in events:
+        if channel == 'ws' and direction == 'in':
+            actions.append((t - origin, 'proxy_send', session, data))
+        elif channel == 'ws' and direction == 'close':
+            actions.append((t - origin, 'proxy_drop', session, None))
+        elif channel == 'stratum' and session != '*' and direction in ('open', 'in', 'close'):
+            actions.append((t - origin, 'rig_' + direction, session, data))
+    actions.sort(key=lambda a: a[0])
+    return actions
+
+def replay(events, speed=1.0, bridge_script=BRIDGE_SCRIPT, bridge_args=(), log_path=None):
+    """Replay a trace against a new bridge process and measure it"""
+    proxy_messages = []          # (monotonic time, parsed message) received by the proxy
+    proxy = FakeProxy(on_message=lambda conn, text: proxy_messages.append((time.monotonic(), _parse(text))))
+    proxy.start()
+    port = free_port()
+    log = open(log_path, 'w') if log_path else subprocess.DEVNULL
+    bridge = subprocess.Popen(
+        [sys.executable, bridge_script, '--proxy-url', proxy.url('replay'), '--port', str(port), '--no-history', *bridge_args],
+        stdout=log, stderr=subprocess.STDOUT
+    )
+
+    rigs = {}
+    job_sent = {}                # job_id -> monotonic time the proxy sent it
+    submit_sent = {}             # (job_id, nonce) -> monotonic time a rig sent it
+    lag = []
+    sent_messages = 0
+    try:
+        conn = proxy.wait_for_connection(CONNECT_TIMEOUT)
+        if conn is None or not wait_for_port(port, CONNECT_TIMEOUT):
+            raise RuntimeError("bridge did not come up (see --log)")
+
+        actions = build_schedule(events)
+        base = time.monotonic()
+        for t, kind, session, data in actions:
+            due = base + max(t, 0.0) / speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            lag.append(max(0.0, time.monotonic() - due))
+
+            if kind == 'proxy_send':
+                if conn is None or conn.closed:
+                    conn = proxy.wait_for_connection(RECONNECT_TIMEOUT, after=conn)
+                    if conn is None:
+                        continue
+                job_id = _job_id(_parse(data))
+                if job_id is not None:
+                    job_sent.setdefault(job_id, time.monotonic())
+                sent_messages += conn.send(data)
+            elif kind == 'proxy_drop':
+                if conn:
+                    conn.close()
+            elif kind == 'rig_open':
+                try:
+                    rigs[session] = FakeRig(session, port)
+                except OSError:
+                    pass
+            elif kind == 'rig_in' and session in rigs:
+                key = _nonce(_parse(data))
+                if key:
+                    submit_sent.setdefault(key, time.monotonic())
+                sent_messages += rigs[session].send(data)
+            elif kind == 'rig_close' and session in rigs:
+                rigs[session].close()
+        time.sleep(SETTLE_TIME)
+        elapsed = time.monotonic() - base
+    finally:
+        bridge.terminate()
+        try:
+            bridge.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            bridge.kill()
+        proxy.stop()
+        for rig in rigs.values():
+            rig.close()
+        if log_path:
+            log.close()
+
+    job_latency = []
+    for rig in rigs.values():
+        seen = set()
+        for t, msg in rig.received:
+            job_id = _job_id(msg)
+            if job_id in job_sent and job_id not in seen:
+                seen.add(job_id)
+                job_latency.append(t - job_sent[job_id])
+
+    submit_latency = []
+    delivered = set()
+    for t, msg in proxy_messages:
+        key = _nonce(msg)
+        if key in submit_sent and key not in delivered:
+            delivered.add(key)
+            submit_latency.append(t - submit_sent[key])
+
+    received_messages = len(proxy_messages) + sum(len(r.received) for r in rigs.values())
+    return {
+        'elapsed': round(elapsed, 3),
+        'jobLatency': job_latency,
+        'submitLatency': submit_latency,
+        'submitsSent': len(submit_sent),
+        'submitsLost': len(set(submit_sent) - delivered),
+        'messagesSent': sent_messages,
+        'messagesReceived': received_messages,
+        'throughput': round((sent_messages + received_messages) / elapsed, 1) if elapsed else 0,
+        'scheduleLag': lag,
+    }
+
+# =============================================================================
+# REPORT
+# =============================================================================
+def build_report(header, events, result, speed):
+    rec_job, rec_submit = recorded_latencies(events)
+    duration = events[-1][0] - events[0][0] if events else 0
+    recorded_messages = sum(1 for e in events if e[3] in ('in', 'out'))
+    report = {
+        'trace': {
+            'bridge': header.get('bridge'),
+            'events': len(events),
+            'duration': round(duration, 3),
+            'throughput': round(recorded_messages / duration, 1) if duration else 0,
+        },
+        'speed': speed,
+        'replay': {
+            'elapsed': result['elapsed'],
+            'throughput': result['throughput'],
+            'submitsSent': result['submitsSent'],
+            'submitsLost': result['submitsLost'],
+            'scheduleLagMs': percentiles(result['scheduleLag']),
+        },
+        'jobLatencyMs': {'recorded': percentiles(rec_job), 'replay': percentiles(result['jobLatency'])},
+        'submitLatencyMs': {'recorded': percentiles(rec_submit), 'replay': percentiles(result['submitLatency'])},
+    }
+    for key in ('jobLatencyMs', 'submitLatencyMs'):
+        recorded, replayed = report[key]['recorded'], report[key]['replay']
+        if recorded.get('count') and replayed.get('count'):
+            report[key]['p95DeltaMs'] = round(replayed['p95'] - recorded['p95'], 2)
+    return report
+
+def print_report(report):
+    trace, rep = report['trace'], report['replay']
+    print("=" * 60)
+    print(f"  Trace: {trace['events']} events over {trace['duration']}s (bridge v{trace['bridge']})")
+    print(f"  Replay: {rep['elapsed']}s at {report['speed']}x, {rep['throughput']} msgs/s "
+          f"(recorded {trace['throughput']} msgs/s)")
+    print("=" * 60)
+    for key, title in (('jobLatencyMs', 'Job fan-out'), ('submitLatencyMs', 'Submit relay')):
+        for side in ('recorded', 'replay'):
+            p = report[key][side]
+            if p.get('count'):
+                print(f"  {title:13} {side:9} n={p['count']:<6} p50={p['p50']}ms p95={p['p95']}ms max={p['max']}ms")
+            else:
+                print(f"  {title:13} {side:9} no samples")
+    lag = rep['scheduleLagMs']
+    if lag.get('count'):
+        print(f"  Schedule lag  p95={lag['p95']}ms max={lag['max']}ms")
+    print(f"  Submits: {rep['submitsSent']} sent, {rep['submitsLost']} lost")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded bridge trace against a bridge build")
+    parser.add_argument('trace', help="Trace file from ws_bridge.py --record")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed multiplier (default 1.0)")
+    parser.add_argument('--bridge', default=BRIDGE_SCRIPT, help="Bridge script to test")
+    parser.add_argument('--bridge-arg', action='append', default=[], help="Extra argument for the bridge")
+    parser.add_argument('--log', help="Write the bridge's output here")
+    parser.add_argument('--json', help="Write the report as JSON here")
+    parser.add_argument('--max-job-p95-ms', type=float, help="Fail if replayed job fan-out p95 exceeds this")
+    parser.add_argument('--max-submit-p95-ms', type=float, help="Fail if replayed submit relay p95 exceeds this")
+    args = parser.parse_args(argv)
+
+    header, events = load_trace(args.trace)
+    result = replay(events, args.speed, args.bridge, args.bridge_arg, args.log)
+    report = build_report(header, events, result, args.speed)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if report['replay']['submitsLost']:
+        failures.append(f"{report['replay']['submitsLost']} submits lost")
+    for key, limit in (('jobLatencyMs', args.max_job_p95_ms), ('submitLatencyMs', args.max_submit_p95_ms)):
+        p95 = report[key]['replay'].get('p95')
+        if limit is not None and p95 is not None and p95 > limit:
+            failures.append(f"{key} p95 {p95}ms > {limit}ms")
+    if failures:
+        print(f"  REGRESSION: {', '.join(failures)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
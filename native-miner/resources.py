@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+CPU Resource Detection for Thread Sizing
+Works out how many hashing threads this machine can really give XMRig,
+instead of trusting os.cpu_count().
+
+- cgroup v2 (cpu.max) and v1 (cpu.cfs_quota_us / cpu.cfs_period_us) CPU quotas
+- the CPU affinity mask (Cpus_allowed_list, sched_getaffinity)
+- the L3 cache limit, from topology.py's thread planner
+- competing load from /proc/stat, excluding XMRig's own CPU time
+
+Everything takes proc_root / sys_root so it can run against fake trees.
+On Windows (no /proc, /sys) it falls back to os.cpu_count().
+
+Usage:
+  python resources.py                 # print the detected budget
+  python resources.py --proc /tmp/proc --sys /tmp/sys
+"""
+
+import os
+import sys
+import time
+import argparse
+
+PROC_ROOT = "/proc"
+SYS_ROOT = "/sys"
+RANDOMX_L3_PER_THREAD = 2 * 1024 * 1024   # Scratchpad per hashing thread
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def parse_cpu_list(text):
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in (text or '').replace('\n', ',').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+def parse_size(text):
+    """sysfs cache size ('32768K', '2M') -> bytes"""
+    if not text:
+        return None
+    text = text.strip().upper()
+    scale = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}.get(text[-1:])
+    try:
+        return int(text[:-1]) * scale if scale else int(text)
+    except ValueError:
+        return None
+
+# =============================================================================
+# CGROUP QUOTAS
+# =============================================================================
+def _cgroup_paths(proc_root):
+    """{controller: path} from /proc/self/cgroup ('' is the v2 unified hierarchy)"""
+    paths = {}
+    for line in (_read(os.path.join(proc_root, 'self', 'cgroup')) or '').splitlines():
+        parts = line.split(':', 2)
+        if len(parts) != 3:
+            continue
+        _, controllers, path = parts
+        if not controllers:
+            paths[''] = path
+        for controller in controllers.split(','):
+            if controller:
+                paths[controller] = path
+    return paths
+
+def _candidate_dirs(mount, path):
+    """Our cgroup directory and its parents; inside a container the mount may already be our cgroup"""
+    dirs = []
+    path = path.strip('/')
+    while True:
+        dirs.append(os.path.join(mount, path) if path else mount)
+        if not path:
+            break
+        path = os.path.dirname(path)
+    return dirs
+
+def cgroup_cpu_limit(proc_root=PROC_ROOT, sys_root=SYS_ROOT):
+    """CPU quota in cores (e.g. 2.5), or None when unlimited/unknown"""
+    paths = _cgroup_paths(proc_root)
+    cgroup_root = os.path.join(sys_root, 'fs', 'cgroup')
+    limits = []
+
+    # cgroup v2: "max 100000" or "250000 100000" at every level up to the root
+    if '' in paths:
+        for d in _candidate_dirs(cgroup_root, paths['']):
+            text = _read(os.path.join(d, 'cpu.max'))
+            if text:
+                quota, _, period = text.partition(' ')
+                if quota != 'max' and period:
+                    limits.append(int(quota) / int(period))
+
+    # cgroup v1: cpu.cfs_quota_us is -1 when unlimited
+    if 'cpu' in paths:
+        for mount in ('cpu,cpuacct', 'cpuacct,cpu', 'cpu'):
+            for d in _candidate_dirs(os.path.join(cgroup_root, mount), paths['cpu']):
+                quota = _read(os.path.join(d, 'cpu.cfs_quota_us'))
+                period = _read(os.path.join(d, 'cpu.cfs_period_us'))
+                if quota and period and int(quota) > 0:
+                    limits.append(int(quota) / int(period))
+
+    return min(limits) if limits else None
+
+# =============================================================================
+# AFFINITY
+# =============================================================================
+def allowed_cpus(proc_root=PROC_ROOT):
+    """CPUs this process may run on"""
+    for line in (_read(os.path.join(proc_root, 'self', 'status')) or '').splitlines():
+        if line.startswith('Cpus_allowed_list:'):
+            return parse_cpu_list(line.split(':', 1)[1])
+    if proc_root == PROC_ROOT and hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+# =============================================================================
+# COMPETING LOAD
+# =============================================================================
+def _cpu_times(proc_root):
+    """{cpu index: (busy, total)} jiffies from /proc/stat"""
+    times = {}
+    for line in (_read(os.path.join(proc_root, 'stat')) or '').splitlines():
+        if not line.startswith('cpu') or line.startswith('cpu '):
+            continue
+        name, *fields = line.split()
+        values = [int(v) for v in fields[:8]]
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        times[int(name[3:])] = (sum(values) - idle, sum(values))
+    return times
+
+def _process_jiffies(proc_root, pid):
+    text = _read(os.path.join(proc_root, str(pid), 'stat'))
+    if not text:
+        return 0
+    # comm can contain spaces: fields start after the closing paren
+    fields = text[text.rfind(')') + 2:].split()
+    return int(fields[11]) + int(fields[12])   # utime + stime
+
+def process_cpu_seconds(pid, proc_root=PROC_ROOT):
+    """CPU time (user + system) a process has used, or None without /proc"""
+    if not os.path.exists(os.path.join(proc_root, str(pid), 'stat')):
+        return None
+    ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+    return _process_jiffies(proc_root, pid) / ticks
+
+class LoadSampler:
+    """Cores' worth of CPU used by everything except our own processes"""
+
+    def __init__(self, cpus, proc_root=PROC_ROOT):
+        self.cpus = set(cpus)
+        self.proc_root = proc_root
+        self.last = None
+
+    def sample(self, own_pids=()):
+        """Competing load in cores since the previous call (None on the first call)"""
+        times = _cpu_times(self.proc_root)
+        own = sum(_process_jiffies(self.proc_root, pid) for pid in own_pids if pid)
+        busy = sum(b for cpu, (b, _) in times.items() if cpu in self.cpus)
+        total = sum(t for cpu, (_, t) in times.items() if cpu in self.cpus)
+        previous, self.last = self.last, (busy, total, own, tuple(own_pids))
+        if previous is None or previous[3] != tuple(own_pids):
+            return None
+        d_busy, d_total, d_own = busy - previous[0], total - previous[1], own - previous[2]
+        if d_total <= 0:
+            return None
+        cores = len([c for c in times if c in self.cpus]) or 1
+        # A process's time can land on CPUs outside our set; never count it below zero
+        return max(0.0, (d_busy - d_own) / d_total * cores)
+
+# =============================================================================
+# BUDGET
+# =============================================================================
+def detect_resources(proc_root=PROC_ROOT, sys_root=SYS_ROOT):
+    """Static CPU budget: what XMRig may use on an otherwise idle machine"""
+    from topology import l3_thread_limit   # topology.py builds on this module
+    logical = os.cpu_count() or 1
+    cpus = allowed_cpus(proc_root)
+    quota = cgroup_cpu_limit(proc_root, sys_root)
+    l3_threads = l3_thread_limit(cpus, sys_root)
+
+    limits = {'affinity': len(cpus)}
+    if quota is not None:
+        limits['quota'] = max(1, int(quota))
+    if l3_threads is not None:
+        limits['l3'] = l3_threads
+    limited_by = min(limits, key=limits.get)
+    return {
+        'logical': logical,
+        'cpus': cpus,
+        'quota': quota,
+        'l3Threads': l3_threads,
+        'threads': limits[limited_by],
+        'limitedBy': limited_by,
+    }
+
+def effective_threads(resources, competing_load):
+    """Threads left once other workloads take their share"""
+    if not competing_load:
+        return resources['threads']
+    free = len(resources['cpus']) - competing_load
+    if resources['quota'] is not None:
+        free = min(free, resources['quota'])
+    return max(1, min(resources['threads'], int(free + 0.5)))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Show the CPU budget XMRig would get")
+    parser.add_argument('--proc', default=PROC_ROOT)
+    parser.add_argument('--sys', default=SYS_ROOT)
+    args = parser.parse_args()
+    res = detect_resources(args.proc, args.sys)
+    print(f"Logical CPUs: {res['logical']}, allowed: {len(res['cpus'])}, "
+          f"quota: {res['quota'] if res['quota'] is not None else 'none'}, "
+          f"L3 threads: {res['l3Threads'] if res['l3Threads'] is not None else 'unknown'}")
+    print(f"Budget: {res['threads']} threads (limited by {res['limitedBy']})")
+    sampler = LoadSampler(res['cpus'], args.proc)
+    sampler.sample()
+    time.sleep(1)
+    load = sampler.sample()
+    if load is not None:
+        print(f"Competing load: {load:.2f} cores -> {effective_threads(res, load)} threads")
+    sys.exit(0)
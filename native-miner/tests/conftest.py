@@ -0,0 +1,5 @@
+"""pytest setup: the native-miner modules are imported flat, as the scripts do"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,133 @@
+"""Console renderer: bounded buffer, rate-limited status bar, headless JSON lines"""
+import json
+import threading
+import time
+
+from console import CLEAR_LINE, Renderer, strip_ansi
+
+
+class FakeStream:
+    """Collects writes; optionally blocks each one until released"""
+    def __init__(self, blocked=False):
+        self.writes = []
+        self.gate = threading.Event()
+        if not blocked:
+            self.gate.set()
+        self.writing = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.gate.wait(5)
+        self.writes.append(text)
+
+    def flush(self):
+        pass
+
+    @property
+    def text(self):
+        return ''.join(self.writes)
+
+
+def test_full_buffer_drops_oldest_and_reports_it():
+    stream = FakeStream()
+    renderer = Renderer(stream, capacity=3)
+    for i in range(5):
+        renderer.log(f"line {i}")
+    renderer.close()            # Not started: renders what is queued right here
+
+    lines = strip_ansi(stream.text).replace('\r', '').splitlines()
+    assert '2 log lines dropped' in lines[0]
+    assert [line.split('] ', 2)[-1] for line in lines[1:]] == ['line 2', 'line 3', 'line 4']
+    assert renderer.dropped_total == 2
+
+    renderer.log("after")
+    renderer.close()
+    assert 'dropped' not in strip_ansi(stream.writes[-1])
+
+
+def test_slow_console_never_blocks_producers():
+    stream = FakeStream(blocked=True)
+    renderer = Renderer(stream, capacity=10, redraw_interval=0).start()
+    renderer.log("first")
+    assert stream.writing.wait(2)           # Renderer thread is now stuck in write()
+
+    began = time.monotonic()
+    for i in range(100):
+        renderer.log(f"line {i}")
+        renderer.status(f"status {i}")
+    assert time.monotonic() - began < 0.5
+    assert renderer.dropped_total == 90
+
+    stream.gate.set()
+    renderer.close()
+    text = strip_ansi(stream.text)
+    assert '90 log lines dropped' in text
+    assert 'line 89' not in text and 'line 99' in text
+    assert text.endswith('status 99')
+
+
+def test_status_bar_redrawn_only_when_changed():
+    stream = FakeStream()
+    renderer = Renderer(stream)
+    renderer.status("hashrate 100")
+    assert renderer._render()
+    assert stream.writes[-1] == f"\r{CLEAR_LINE}hashrate 100"
+    renderer.status("hashrate 100")
+    assert not renderer._render()           # Same text: nothing written
+    renderer.status("hashrate 120")
+    assert renderer._render() and stream.writes[-1].endswith("hashrate 120")
+    # A log line scrolls the bar away, so it is drawn again below the line
+    renderer.log("share accepted")
+    renderer._render()
+    assert stream.writes[-1].index("share accepted") < stream.writes[-1].index("hashrate 120")
+    assert len(stream.writes) == 3
+
+
+def test_redraws_are_rate_limited():
+    stream = FakeStream()
+    renderer = Renderer(stream, redraw_interval=0.2).start()
+    began = time.monotonic()
+    while time.monotonic() - began < 1.0:
+        renderer.status(f"tick {time.monotonic()}")
+        time.sleep(0.005)
+    renderer.status("final")
+    renderer.close()
+    # ~200 updates in a second, at most one write per interval (plus the one on close)
+    assert len(stream.writes) <= 1.0 / 0.2 + 2
+    assert stream.writes[-1].endswith("final")
+
+
+def test_headless_writes_json_lines():
+    stream = FakeStream()
+    renderer = Renderer(stream, headless=True, capacity=2, status_interval=0)
+    renderer.raw("=== banner ===")
+    for i in range(3):
+        renderer.log(f"\033[92mline {i}\033[0m", level='success')
+    renderer.status("ignored bar text", {'hashrate': 100})
+    renderer.close()
+
+    objects = [json.loads(line) for line in stream.text.splitlines()]
+    assert [o['type'] for o in objects] == ['dropped', 'log', 'log', 'status']
+    assert objects[0]['count'] == 1         # The banner is skipped, not dropped
+    assert objects[1]['msg'] == 'line 1' and objects[1]['level'] == 'success'
+    assert objects[3]['hashrate'] == 100
+    assert '\033' not in stream.text
+
+    # Unchanged status is not repeated
+    renderer.status("bar", {'hashrate': 100})
+    assert not renderer._render()
+    renderer.status("bar", {'hashrate': 110})
+    assert renderer._render()
+    assert json.loads(stream.writes[-1])['hashrate'] == 110
+
+
+def test_headless_status_interval():
+    stream = FakeStream()
+    renderer = Renderer(stream, headless=True, status_interval=60)
+    renderer.status("bar", {'hashrate': 100})
+    renderer._render()
+    renderer.status("bar", {'hashrate': 200})
+    assert not renderer._render()           # Changed, but the interval hasn't passed
+    renderer.last_status_at -= 60
+    renderer._render()
+    assert [json.loads(w)['hashrate'] for w in stream.writes] == [100, 200]
@@ -0,0 +1,31 @@
+"""Sampling profiler thread filter"""
+import threading
+import time
+
+from diagnostics import SamplingProfiler
+
+
+def test_profiler_samples_only_named_threads():
+    stop = threading.Event()
+    for name in ('websocket', 'xmrig-client', 'xmrig-client'):
+        threading.Thread(target=stop.wait, name=name, daemon=True).start()
+    profiler = SamplingProfiler(0.005, threads=['websocket'])
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    assert profiler.samples > 0
+    assert profiler.counts
+    assert all(stack.startswith('websocket;') for stack in profiler.counts)
+
+
+def test_profiler_samples_every_thread_by_default():
+    stop = threading.Event()
+    threading.Thread(target=stop.wait, name='xmrig-client', daemon=True).start()
+    profiler = SamplingProfiler(0.005)
+    profiler.start()
+    time.sleep(0.1)
+    profiler.stop()
+    stop.set()
+    roots = {stack.split(';', 1)[0] for stack in profiler.counts}
+    assert {'xmrig-client', 'MainThread'} <= roots
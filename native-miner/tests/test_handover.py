@@ -0,0 +1,43 @@
+"""Bridge upgrade: the old bridge lets go of the history file before the new one opens it"""
+import threading
+
+import pytest
+
+import upgrade
+import ws_bridge
+from history import HistoryWriter
+
+
+@pytest.fixture
+def old_bridge(tmp_path, monkeypatch):
+    parked = threading.Event()
+    parked.set()
+    monkeypatch.setattr(ws_bridge, 'server_parked', parked)
+    monkeypatch.setattr(ws_bridge, 'handing_over', threading.Event())
+    monkeypatch.setattr(ws_bridge, 'handed_over', threading.Event())
+    monkeypatch.setattr(ws_bridge, 'handover_state', lambda: ({'clients': [], 'pending': []}, []))
+    monkeypatch.setattr(ws_bridge, 'resume_after_failed_handover', lambda: None)
+    monkeypatch.setattr(ws_bridge, 'history_writer', HistoryWriter(str(tmp_path / 'bridge.bin')))
+    return ws_bridge
+
+
+def test_history_closed_before_state_is_sent(old_bridge, monkeypatch):
+    writer = old_bridge.history_writer
+    seen = []
+    monkeypatch.setattr(upgrade, 'send_handover', lambda conn, state, socks: seen.append(writer.closed))
+    monkeypatch.setattr(upgrade, 'wait_for_ack', lambda conn: True)
+    assert old_bridge.perform_handover(None)
+    assert seen == [True]
+    assert old_bridge.handed_over.is_set()
+
+
+def test_history_reopened_when_handover_fails(old_bridge, monkeypatch):
+    writer = old_bridge.history_writer
+    monkeypatch.setattr(upgrade, 'send_handover', lambda conn, state, socks: None)
+    monkeypatch.setattr(upgrade, 'wait_for_ack', lambda conn: False)
+    assert not old_bridge.perform_handover(None)
+    assert writer.closed
+    assert old_bridge.history_writer is not writer
+    assert not old_bridge.history_writer.closed
+    old_bridge.history_writer.close()
+    old_bridge.history_writer.close()
@@ -0,0 +1,128 @@
+"""On-disk history rings: wrap-around, downsampling and share deltas"""
+import math
+
+import pytest
+
+import history
+
+TIERS = ((10, 5), (60, 4))
+T0 = 1_000_020          # Start of a 60 s bucket
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'history' / 'test.bin')
+
+
+def record_every(writer, start, end, step=10, **fields):
+    for now in range(start, end, step):
+        writer.record(now=now, **fields)
+
+
+def starts(rows):
+    return [row[0] for row in rows]
+
+
+def test_ring_keeps_newest_records_in_order(path):
+    writer = history.HistoryWriter(path, TIERS)
+    record_every(writer, T0, T0 + 80, hashrate=100.0)
+    writer.close()
+
+    store = history.HistoryStore(path, writable=False)
+    try:
+        # 8 buckets through a ring of 5: the oldest 3 were overwritten
+        assert starts(store.read(0)) == [T0 + 30, T0 + 40, T0 + 50, T0 + 60, T0 + 70]
+        assert store._cursor(0) == (3, 5)
+    finally:
+        store.close()
+
+
+def test_query_across_the_wrap_point(path):
+    writer = history.HistoryWriter(path, TIERS)
+    record_every(writer, T0, T0 + 80, hashrate=100.0)
+    writer.close()
+
+    # Slots 3, 4 | 0, 1, 2 hold T0+30 .. T0+70: ask for rows on both sides
+    result = history.query(path, T0 + 40, T0 + 70, resolution=10)
+    assert result['resolution'] == 10
+    assert [row[0] for row in result['rows']] == [T0 + 40, T0 + 50, T0 + 60]
+    assert history.query(path, T0, T0 + 35, resolution=10)['rows'][0][0] == T0 + 30
+    with pytest.raises(ValueError):
+        history.query(path, T0, None, resolution=15)
+
+
+def test_coarser_tiers_average_and_sum(path):
+    writer = history.HistoryWriter(path, TIERS)
+    for i, now in enumerate(range(T0, T0 + 120, 10)):
+        temp = None if i % 2 else 60.0 + i
+        writer.record(100.0 * (i + 1), temp, None, i, 2 * i, 0, now=now)
+    writer.flush()
+    store = writer.store
+
+    first, second = store.read(1)
+    assert starts([first, second]) == [T0, T0 + 60]
+    assert first[1] == pytest.approx(350.0)            # Mean of 100..600
+    assert first[2] == pytest.approx(62.0)             # Mean of the readings there were (60, 62, 64)
+    assert math.isnan(first[3])                        # No power readings
+    # Shares are counted from the second sample on (the first only sets the baseline)
+    assert (first[4], first[5]) == (5, 10)
+    assert (second[4], second[5]) == (6, 12)
+    # The 10 s ring only has room for the last 5 samples; the 60 s one kept all of them
+    assert [row[4] for row in store.read(0)] == [1] * 5
+
+    rows = history.query(path, T0, None, resolution=60)['rows']
+    assert rows[0][3] is None
+    writer.close()
+
+
+def test_share_counters_are_stored_as_deltas(path):
+    writer = history.HistoryWriter(path, TIERS)
+    writer.record(accepted=10, submitted=12, now=T0)
+    writer.record(accepted=13, submitted=15, rejected=1, now=T0 + 10)
+    # Totals went down: the counting process restarted, so the new total is the delta
+    writer.record(accepted=2, submitted=2, now=T0 + 20)
+    writer.close()
+
+    store = history.HistoryStore(path, writable=False)
+    try:
+        assert [row[4:] for row in store.read(0)] == [(0, 0, 0), (3, 3, 1), (2, 2, 0)]
+        assert store.read(1)[0][4:] == (5, 5, 1)
+    finally:
+        store.close()
+
+
+def test_restart_appends_to_the_same_file(path):
+    writer = history.HistoryWriter(path, TIERS)
+    writer.record(50.0, accepted=4, now=T0)
+    writer.record(50.0, accepted=6, now=T0 + 5)
+    writer.close()
+    writer.close()                  # Idempotent
+
+    # A new process starts its own baseline and keeps the old rows
+    writer = history.HistoryWriter(path, TIERS)
+    writer.record(70.0, accepted=100, now=T0 + 7)
+    writer.record(70.0, accepted=103, now=T0 + 12)
+    writer.close()
+
+    rows = history.query(path, T0, None, resolution=10)['rows']
+    # The partial bucket flushed on shutdown shows up twice: sum the share columns
+    assert [(row[0], row[1], row[4]) for row in rows] == [(T0, 50.0, 2), (T0, 70.0, 0), (T0 + 10, 70.0, 3)]
+    assert writer.record(now=T0 + 20) is None       # Recording after close is a no-op
+
+
+def test_resized_file_starts_over(path):
+    writer = history.HistoryWriter(path, TIERS)
+    record_every(writer, T0, T0 + 30, hashrate=1.0)
+    writer.close()
+
+    writer = history.HistoryWriter(path, ((10, 8),))
+    assert [t[:2] for t in writer.store.tiers] == [(10, 8)]
+    assert writer.store.read(0) == []
+    writer.close()
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a history file' * 20)
+    with pytest.raises(ValueError):
+        history.HistoryStore(str(path), writable=False)
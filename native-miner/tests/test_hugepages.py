@@ -0,0 +1,93 @@
+"""Huge-page needs, readiness and what XMRig reports (recorded logs and /2/summary payloads)"""
+import json
+import os
+
+import pytest
+
+import hugepages
+from hugepages import pages_needed, parse_xmrig_line, from_summary, check
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'xmrig')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('threads, nodes, one_gb, needed', [
+    (8, 1, False, (1176, 0)),      # 1040 dataset + 128 cache + 8 scratchpads
+    (16, 1, False, (1184, 0)),
+    (16, 2, False, (2224, 0)),     # a dataset per NUMA node
+    (8, 1, True, (136, 3)),        # dataset in 3 x 1 GB, the rest on 2 MB pages
+    (8, 2, True, (136, 6)),
+])
+def test_pages_needed(threads, nodes, one_gb, needed):
+    assert pages_needed(threads, nodes, one_gb) == needed
+
+
+def test_parse_recorded_log_all_huge_pages():
+    parsed = [p for p in map(parse_xmrig_line, fixture('startup-huge-pages.log').splitlines()) if p]
+    assert parsed == [('dataset', 100, 1168, 1168), ('threads', 100, 16, 16)]
+
+
+def test_parse_recorded_log_partial_huge_pages():
+    parsed = [p for p in map(parse_xmrig_line, fixture('startup-partial-huge-pages.log').splitlines()) if p]
+    assert parsed == [('dataset', 49, 572, 1168), ('threads', 0, 0, 8)]
+
+
+def test_parse_ignores_other_lines():
+    assert parse_xmrig_line('[2026-10-12 09:14:34.803]  miner    speed 10s/60s/15m 8214.6 n/a n/a H/s') is None
+    assert parse_xmrig_line('') is None
+
+
+def test_from_recorded_summary():
+    assert from_summary(json.loads(fixture('summary-huge-pages.json'))) == {
+        'percent': 100, 'used': 1184, 'total': 1184, 'penaltyPct': 0.0}
+    assert from_summary(json.loads(fixture('summary-partial-huge-pages.json'))) == {
+        'percent': 48, 'used': 572, 'total': 1176, 'penaltyPct': 18.2}
+
+
+def test_from_summary_without_huge_pages():
+    assert from_summary(json.loads(fixture('summary-no-hugepages-field.json'))) is None
+    assert from_summary(None) is None
+    assert from_summary({'hugepages': [0, 0]}) is None
+    assert from_summary({'hugepages': True}) is None
+
+
+def pool(sys_root, size_kb, total, free):
+    d = sys_root / 'kernel' / 'mm' / 'hugepages' / f'hugepages-{size_kb}kB'
+    d.mkdir(parents=True)
+    (d / 'nr_hugepages').write_text(f'{total}\n')
+    (d / 'free_hugepages').write_text(f'{free}\n')
+    (d / 'resv_hugepages').write_text('0\n')
+    return d
+
+
+def test_check_reports_command_without_reserving(tmp_path, monkeypatch):
+    monkeypatch.setattr(hugepages, 'can_reserve', lambda: True)
+    d = pool(tmp_path, 2048, 100, 100)
+    result = check(8, False, proc_root=str(tmp_path), sys_root=str(tmp_path))
+    assert result['ready'] is False
+    assert result['reserved'] == {}
+    assert (d / 'nr_hugepages').read_text() == '100\n'
+    assert 'echo 1176 > /proc/sys/vm/nr_hugepages' in result['reasons'][-1]
+
+
+def test_check_reserves_when_asked(tmp_path, monkeypatch):
+    monkeypatch.setattr(hugepages, 'can_reserve', lambda: True)
+    d = pool(tmp_path, 2048, 100, 100)
+    result = check(8, True, proc_root=str(tmp_path), sys_root=str(tmp_path))
+    assert (d / 'nr_hugepages').read_text() == '1176'
+    assert result['reserved'] == {'2M': 1076}
+    assert result['ready'] is True
+
+
+def test_check_one_gb_pages(tmp_path):
+    pool(tmp_path, 2048, 200, 200)
+    pool(tmp_path, 1048576, 3, 3)
+    result = check(8, False, one_gb=True, proc_root=str(tmp_path), sys_root=str(tmp_path))
+    assert result['ready'] is True
+    assert result['oneGb'] is True
+    assert result['needed'] == {'1G': 3, '2M': 136}
+    assert result['xmrigArgs'] == ['--randomx-1gb-pages']
@@ -0,0 +1,72 @@
+"""Pause ownership between the bridge (proxy pause) and miner.py (thermal pause)"""
+import pytest
+
+import ws_bridge
+from xmrig_api import PauseHolds
+
+
+class FakeApi:
+    def __init__(self, paused=False):
+        self.paused = paused
+
+    def is_paused(self):
+        return self.paused
+
+
+@pytest.fixture
+def bridge(tmp_path, monkeypatch):
+    monkeypatch.setattr(ws_bridge, 'pause_holds', PauseHolds(str(tmp_path)))
+    monkeypatch.setattr(ws_bridge, 'xmrig_api', FakeApi())
+    return ws_bridge
+
+
+def test_holds_shared_through_directory(tmp_path):
+    bridge, miner = PauseHolds(str(tmp_path)), PauseHolds(str(tmp_path))
+    bridge.hold('proxy')
+    miner.hold('thermal')
+    assert miner.holders() == {'proxy', 'thermal'}
+    assert bridge.release('proxy') == {'thermal'}
+    assert miner.release('thermal') == set()
+
+
+def test_holds_in_process():
+    holds = PauseHolds()
+    holds.hold('proxy')
+    assert holds.holders() == {'proxy'}
+    assert holds.release('proxy') == set()
+
+
+def test_proxy_pause_and_resume(bridge):
+    assert bridge.api_pause_step(True, True) == 'pause'
+    bridge.xmrig_api.paused = True
+    assert bridge.api_pause_step(True, False) is None
+    assert bridge.api_pause_step(False, True) == 'resume'
+    assert bridge.pause_holds.holders() == set()
+
+
+def test_never_resumes_thermal_pause(bridge):
+    bridge.pause_holds.hold('thermal')
+    bridge.xmrig_api.paused = True
+    # Proxy is running and nothing changed: the periodic check leaves XMRig alone
+    for _ in range(3):
+        assert bridge.api_pause_step(False, False) is None
+
+
+def test_resume_waits_for_other_holder(bridge):
+    assert bridge.api_pause_step(True, True) == 'pause'
+    bridge.xmrig_api.paused = True
+    bridge.pause_holds.hold('thermal')
+    assert bridge.api_pause_step(False, True) is None
+    assert bridge.pause_holds.holders() == {'thermal'}
+
+
+def test_repauses_after_restart(bridge):
+    bridge.api_pause_step(True, True)
+    bridge.xmrig_api.paused = False    # XMRig restarted unpaused
+    assert bridge.api_pause_step(True, False) == 'pause'
+
+
+def test_unheld_state_left_alone(bridge):
+    bridge.xmrig_api.paused = True
+    assert bridge.api_pause_step(False, False) is None
+    assert bridge.api_pause_step(False, True) is None
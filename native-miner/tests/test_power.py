@@ -0,0 +1,95 @@
+"""RAPL power sampling against a fake /sys/class/powercap tree"""
+import pytest
+
+from power import PowerSampler, RaplZone, find_zones, hashes_per_joule
+
+
+def zone(root, entry, name, energy, max_range=262143328850):
+    path = root / entry
+    path.mkdir(parents=True, exist_ok=True)
+    (path / 'name').write_text(name + '\n')
+    (path / 'energy_uj').write_text(f'{energy}\n')
+    (path / 'max_energy_range_uj').write_text(f'{max_range}\n')
+    return path
+
+
+def set_energy(path, energy):
+    (path / 'energy_uj').write_text(f'{energy}\n')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_find_zones_prefers_packages(tmp_path):
+    zone(tmp_path, 'intel-rapl:0', 'package-0', 0)
+    zone(tmp_path, 'intel-rapl:0:0', 'core', 0)
+    zone(tmp_path, 'intel-rapl:1', 'package-1', 0)
+    zone(tmp_path, 'intel-rapl:2', 'psys', 0)
+    assert [p.split('/')[-1] for p in find_zones(str(tmp_path))] == ['intel-rapl:0', 'intel-rapl:1']
+
+
+def test_find_zones_falls_back_to_psys(tmp_path):
+    zone(tmp_path, 'intel-rapl:0', 'psys', 0)
+    zone(tmp_path, 'intel-rapl:1', 'dram', 0)
+    assert [p.split('/')[-1] for p in find_zones(str(tmp_path))] == ['intel-rapl:0']
+
+
+def test_no_powercap(tmp_path):
+    sampler = PowerSampler(str(tmp_path / 'missing'))
+    assert not sampler.available
+    assert sampler.sample() is None
+
+
+def test_watts_summed_over_packages(tmp_path):
+    p0 = zone(tmp_path, 'intel-rapl:0', 'package-0', 1000000)
+    p1 = zone(tmp_path, 'intel-rapl:1', 'package-1', 5000000)
+    clock = Clock()
+    sampler = PowerSampler(str(tmp_path), clock)
+    assert sampler.available
+    clock.now += 2
+    set_energy(p0, 1000000 + 60000000)    # 60 J
+    set_energy(p1, 5000000 + 40000000)    # 40 J
+    assert sampler.sample() == pytest.approx(50.0)
+
+
+def test_counter_wraparound(tmp_path):
+    path = zone(tmp_path, 'intel-rapl:0', 'package-0', 262143000000, max_range=262143328850)
+    clock = Clock()
+    sampler = PowerSampler(str(tmp_path), clock)
+    clock.now += 1
+    # 328850 uJ to the top of the range, then 671150 uJ after the wrap: 1 J
+    set_energy(path, 671150)
+    assert sampler.sample() == pytest.approx(1.0)
+
+
+def test_wraparound_without_range_never_negative(tmp_path):
+    path = zone(tmp_path, 'intel-rapl:0', 'package-0', 5000)
+    (path / 'max_energy_range_uj').unlink()
+    rapl = RaplZone(str(path))
+    set_energy(path, 1000)
+    assert rapl.delta() == 0
+    set_energy(path, 3000)
+    assert rapl.delta() == 2000
+
+
+def test_unreadable_counter_keeps_last_watts(tmp_path):
+    path = zone(tmp_path, 'intel-rapl:0', 'package-0', 0)
+    clock = Clock()
+    sampler = PowerSampler(str(tmp_path), clock)
+    clock.now += 1
+    set_energy(path, 30000000)
+    assert sampler.sample() == pytest.approx(30.0)
+    (path / 'energy_uj').unlink()
+    clock.now += 1
+    assert sampler.sample() == pytest.approx(30.0)
+
+
+def test_hashes_per_joule():
+    assert hashes_per_joule(5000, 50) == 100
+    assert hashes_per_joule(5000, None) is None
+    assert hashes_per_joule(0, 50) is None
@@ -0,0 +1,146 @@
+"""CPU budget against fake /proc and /sys trees"""
+import os
+import shutil
+
+import pytest
+
+from resources import (cgroup_cpu_limit, allowed_cpus, detect_resources, effective_threads,
+                       LoadSampler, parse_cpu_list, parse_size)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def write(root, path, text):
+    path = root / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+@pytest.fixture
+def proc(tmp_path):
+    return tmp_path / 'proc'
+
+
+@pytest.fixture
+def sys_root(tmp_path):
+    return tmp_path / 'sys'
+
+
+def test_parse_cpu_list_and_size():
+    assert parse_cpu_list('0-3,8,10-11\n') == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpu_list('') == []
+    assert parse_size('32768K') == 32 * 1024 * 1024
+    assert parse_size('2M') == 2 * 1024 * 1024
+    assert parse_size('bogus') is None
+
+
+def test_cgroup_v2_quota(proc, sys_root):
+    write(proc, 'self/cgroup', '0::/user.slice/miner.scope\n')
+    write(sys_root, 'fs/cgroup/user.slice/miner.scope/cpu.max', '250000 100000\n')
+    write(sys_root, 'fs/cgroup/user.slice/cpu.max', 'max 100000\n')
+    assert cgroup_cpu_limit(str(proc), str(sys_root)) == 2.5
+
+
+def test_cgroup_v2_parent_is_tighter(proc, sys_root):
+    write(proc, 'self/cgroup', '0::/user.slice/miner.scope\n')
+    write(sys_root, 'fs/cgroup/user.slice/miner.scope/cpu.max', '400000 100000\n')
+    write(sys_root, 'fs/cgroup/user.slice/cpu.max', '150000 100000\n')
+    assert cgroup_cpu_limit(str(proc), str(sys_root)) == 1.5
+
+
+def test_cgroup_v2_unlimited(proc, sys_root):
+    write(proc, 'self/cgroup', '0::/\n')
+    write(sys_root, 'fs/cgroup/cpu.max', 'max 100000\n')
+    assert cgroup_cpu_limit(str(proc), str(sys_root)) is None
+
+
+def test_cgroup_v2_container_mount_is_own_cgroup(proc, sys_root):
+    # inside a container /proc/self/cgroup names a path the mount doesn't have
+    write(proc, 'self/cgroup', '0::/docker/0123abcd\n')
+    write(sys_root, 'fs/cgroup/cpu.max', '200000 100000\n')
+    assert cgroup_cpu_limit(str(proc), str(sys_root)) == 2.0
+
+
+def test_cgroup_v1_quota(proc, sys_root):
+    write(proc, 'self/cgroup', '12:memory:/docker/0123abcd\n4:cpu,cpuacct:/docker/0123abcd\n')
+    write(sys_root, 'fs/cgroup/cpu,cpuacct/docker/0123abcd/cpu.cfs_quota_us', '150000\n')
+    write(sys_root, 'fs/cgroup/cpu,cpuacct/docker/0123abcd/cpu.cfs_period_us', '100000\n')
+    assert cgroup_cpu_limit(str(proc), str(sys_root)) == 1.5
+
+
+def test_cgroup_v1_unlimited(proc, sys_root):
+    write(proc, 'self/cgroup', '4:cpu,cpuacct:/\n')
+    write(sys_root, 'fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us', '-1\n')
+    write(sys_root, 'fs/cgroup/cpu,cpuacct/cpu.cfs_period_us', '100000\n')
+    assert cgroup_cpu_limit(str(proc), str(sys_root)) is None
+
+
+def test_no_cgroup(proc, sys_root):
+    assert cgroup_cpu_limit(str(proc), str(sys_root)) is None
+
+
+def test_allowed_cpus_from_cpuset(proc):
+    write(proc, 'self/status', 'Name:\tpython\nCpus_allowed:\t0f0f\nCpus_allowed_list:\t0-3,8-11\n')
+    assert allowed_cpus(str(proc)) == [0, 1, 2, 3, 8, 9, 10, 11]
+
+
+def test_allowed_cpus_without_status(proc):
+    assert allowed_cpus(str(proc)) == list(range(os.cpu_count() or 1))
+
+
+def budget(cpus, quota, threads):
+    return {'cpus': list(range(cpus)), 'quota': quota, 'threads': threads}
+
+
+@pytest.mark.parametrize('res, load, threads', [
+    (budget(8, None, 8), None, 8),
+    (budget(8, None, 8), 0.0, 8),
+    (budget(8, None, 8), 2.4, 6),           # 5.6 free cores, rounded
+    (budget(8, None, 6), 1.0, 6),           # never above the static budget
+    (budget(8, 2.5, 2), 1.0, 2),
+    (budget(8, 4.0, 4), 5.0, 3),            # 3 CPUs free, under the quota
+    (budget(4, None, 4), 7.0, 1),           # always at least one
+])
+def test_effective_threads(res, load, threads):
+    assert effective_threads(res, load) == threads
+
+
+def test_detect_resources_limited_by_quota(proc, sys_root):
+    write(proc, 'self/status', 'Cpus_allowed_list:\t0-7\n')
+    write(proc, 'self/cgroup', '0::/\n')
+    write(sys_root, 'fs/cgroup/cpu.max', '300000 100000\n')
+    res = detect_resources(str(proc), str(sys_root))
+    assert res['cpus'] == list(range(8))
+    assert res['quota'] == 3.0
+    assert res['l3Threads'] is None
+    assert (res['threads'], res['limitedBy']) == (3, 'quota')
+
+
+def test_detect_resources_limited_by_affinity(proc, sys_root):
+    write(proc, 'self/status', 'Cpus_allowed_list:\t2-3\n')
+    res = detect_resources(str(proc), str(sys_root))
+    assert (res['threads'], res['limitedBy']) == (2, 'affinity')
+
+
+def test_detect_resources_limited_by_l3(proc, sys_root):
+    shutil.copytree(os.path.join(FIXTURES, 'sysfs', 'intel-i7-8700'), str(sys_root))
+    write(proc, 'self/status', 'Cpus_allowed_list:\t0-11\n')
+    write(proc, 'self/cgroup', '0::/\n')
+    write(sys_root, 'fs/cgroup/cpu.max', '800000 100000\n')
+    res = detect_resources(str(proc), str(sys_root))
+    assert res['l3Threads'] == 6
+    assert (res['threads'], res['limitedBy']) == (6, 'l3')
+
+
+def test_load_sampler_excludes_own_processes(proc):
+    def stat(busy, idle):
+        return ''.join(f'cpu{i} {busy} 0 0 {idle} 0 0 0 0\n' for i in range(2))
+
+    write(proc, 'stat', 'cpu  0 0 0 0\n' + stat(100, 100))
+    write(proc, '42/stat', '42 (xmrig) R ' + ' '.join(['0'] * 10) + ' 10 0 ' + ' '.join(['0'] * 30))
+    sampler = LoadSampler([0, 1], str(proc))
+    assert sampler.sample([42]) is None
+    # 200 busy and 0 idle jiffies across both CPUs, 100 of them XMRig's
+    write(proc, 'stat', 'cpu  0 0 0 0\n' + stat(200, 100))
+    write(proc, '42/stat', '42 (xmrig) R ' + ' '.join(['0'] * 10) + ' 110 0 ' + ' '.join(['0'] * 30))
+    assert sampler.sample([42]) == 1.0
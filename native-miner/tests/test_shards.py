@@ -0,0 +1,15 @@
+"""--workers: every rig gets every job exactly once, whichever shard serves it"""
+import socket
+
+import pytest
+
+import loadbench
+
+
+@pytest.mark.skipif(not hasattr(socket, 'SO_REUSEPORT'), reason="--workers needs SO_REUSEPORT")
+def test_each_rig_gets_each_job_once(monkeypatch):
+    monkeypatch.setattr(loadbench, 'WARMUP', 1.0)
+    monkeypatch.setattr(loadbench, 'JOB_INTERVAL', 0.5)
+    result = loadbench.run(3, 12, 1, duration=3)
+    assert result['rigsWithJobs'] == 12
+    assert result['duplicateJobs'] == 0
@@ -0,0 +1,198 @@
+"""Share correlation and per-worker accounting in the bridge"""
+import pytest
+
+import ws_bridge
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ws_bridge.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def bridge(clock, monkeypatch):
+    monkeypatch.setattr(ws_bridge, 'inflight_shares', {})
+    monkeypatch.setattr(ws_bridge, 'worker_stats', {})
+    monkeypatch.setattr(ws_bridge, 'xmrig_workers', {1: 'alice.rig1', 2: 'bob.rig2'})
+    monkeypatch.setattr(ws_bridge, 'share_times', [])
+    monkeypatch.setattr(ws_bridge, 'share_counter', 0)
+    monkeypatch.setattr(ws_bridge, 'total_shares_valid', 0)
+    monkeypatch.setattr(ws_bridge, 'total_shares_rejected', 0)
+    monkeypatch.setattr(ws_bridge, 'current_difficulty', 5000)
+    return ws_bridge
+
+
+def submit(bridge, cid):
+    share_id = bridge.track_share_submit(cid)
+    bridge.track_share_sent(share_id)
+    return share_id
+
+
+def test_result_matched_by_id(bridge):
+    first, second = submit(bridge, 1), submit(bridge, 2)
+    share_id, share = bridge.track_share_result({'id': second, 'status': 'submitted'})
+    assert share_id == second and share['client'] == 'bob.rig2'
+    assert bridge.inflight_shares[first]['state'] == 'sent'
+    assert bridge.inflight_shares[second]['state'] == 'pool'
+
+
+def test_result_without_id_takes_oldest_sent(bridge):
+    queued = bridge.track_share_submit(1)      # Never sent: can't be the answer
+    first, second = submit(bridge, 1), submit(bridge, 2)
+    assert bridge.track_share_result({'status': 'submitted'})[0] == first
+    assert bridge.track_share_result({'id': 999, 'status': 'submitted'})[0] == second
+    assert bridge.track_share_result({'status': 'submitted'}) == (None, None)
+    assert bridge.inflight_shares[queued]['state'] == 'queued'
+
+
+def test_low_difficulty_counts_as_valid(bridge):
+    share_id = submit(bridge, 1)
+    bridge.track_share_result({'id': share_id, 'status': 'error', 'reason': 'low_difficulty'})
+    stats = bridge.worker_stats['alice.rig1']
+    assert share_id not in bridge.inflight_shares
+    assert (stats.accepted, stats.rejected) == (1, 0)
+    assert bridge.total_shares_valid == 1 and bridge.total_shares_rejected == 0
+    assert bridge.share_times == [(1000.0, 5000)]
+    # Never reaches the pool, so no hash_accepted can claim it
+    assert bridge.track_pool_accept() == (None, None)
+
+
+def test_other_errors_reject(bridge):
+    share_id = submit(bridge, 1)
+    bridge.track_share_result({'id': share_id, 'status': 'error', 'reason': 'invalid_hash'})
+    stats = bridge.worker_stats['alice.rig1']
+    assert share_id not in bridge.inflight_shares
+    assert (stats.accepted, stats.rejected) == (0, 1)
+    assert bridge.total_shares_rejected == 1 and bridge.share_times == []
+
+
+def test_pool_accept_resolves_oldest_pool_share(bridge):
+    first, second = submit(bridge, 1), submit(bridge, 2)
+    bridge.track_share_result({'id': second, 'status': 'submitted'})
+    bridge.track_share_result({'id': first, 'status': 'submitted'})
+    assert bridge.track_pool_accept()[0] == first
+    assert bridge.track_pool_accept()[0] == second
+    assert bridge.track_pool_accept() == (None, None)
+    assert bridge.worker_stats['alice.rig1'].pool_accepted == 1
+    assert bridge.worker_stats['bob.rig2'].pool_accepted == 1
+
+
+def test_unanswered_shares_time_out(bridge, clock):
+    queued = bridge.track_share_submit(1)
+    sent = submit(bridge, 1)
+    clock.now += 10
+    pool = submit(bridge, 2)
+    bridge.track_share_result({'id': pool, 'status': 'submitted'})
+
+    clock.now += bridge.SHARE_ACK_TIMEOUT - 15
+    assert bridge.expire_shares() == 0
+    clock.now += 10
+    assert bridge.expire_shares() == 1
+    assert sent not in bridge.inflight_shares
+    assert bridge.worker_stats['alice.rig1'].timeouts == 1
+
+    # Pool shares get the longer timeout, counted from the proxy's answer
+    clock.now = 1010.0 + bridge.SHARE_POOL_TIMEOUT + 1
+    assert bridge.expire_shares() == 1
+    assert bridge.worker_stats['bob.rig2'].timeouts == 1
+    # Shares still queued for the WebSocket never time out here
+    assert list(bridge.inflight_shares) == [queued]
+
+
+def test_counts_and_latency_per_worker(bridge, clock):
+    fast = submit(bridge, 1)
+    slow = submit(bridge, 2)
+    clock.now += 0.2
+    bridge.track_share_result({'id': fast, 'status': 'submitted'})
+    clock.now += 40
+    bridge.track_share_result({'id': slow, 'status': 'submitted'})
+    bridge.track_pool_accept()
+    submit(bridge, 1)
+
+    workers = bridge.worker_stats_snapshot()
+    alice, bob = workers['alice.rig1'], workers['bob.rig2']
+    assert (alice['submitted'], alice['accepted'], alice['poolAccepted']) == (2, 1, 1)
+    assert (bob['submitted'], bob['accepted'], bob['poolAccepted']) == (1, 1, 0)
+
+    buckets = len(bridge.LATENCY_BUCKETS_MS) + 1
+    assert len(alice['ackLatencyMs']) == buckets
+    # 200 ms falls in the <=250 bucket, 40 s past the last bound
+    assert alice['ackLatencyMs'][bridge.LATENCY_BUCKETS_MS.index(250)] == 1
+    assert sum(alice['ackLatencyMs']) == 1
+    assert bob['ackLatencyMs'][-1] == 1
+    assert alice['poolLatencyMs'][-1] == 1
+
+
+def test_identity_from_login():
+    identity = ws_bridge.worker_identity
+    assert identity({'login': 'wallet', 'rigid': 'rig1', 'pass': 'ignored'}, 7) == 'wallet.rig1'
+    assert identity({'login': 'wallet', 'pass': 'garage'}, 7) == 'wallet.garage'
+    # "x" is XMRig's placeholder password, not a name
+    assert identity({'login': 'wallet', 'pass': 'x'}, 7) == 'wallet'
+    assert identity({'login': '', 'rigid': ' rig1 '}, 7) == 'rig1'
+    assert identity({'pass': 'X'}, 7) == 'xmrig-7'
+    assert identity({}, 7) == 'xmrig-7'
+    assert identity({'login': 'a b/c', 'rigid': 'r' * 80}, 7) == ('a_b_c.' + 'r' * 80)[:64]
+
+
+def login(bridge, cid, params):
+    worker = bridge.worker_identity(params, cid)
+    bridge.register_worker(cid, worker)
+    return worker
+
+
+def disconnect(bridge, cid):
+    bridge.worker_disconnected(bridge.xmrig_workers.pop(cid))
+
+
+def test_stats_survive_reconnect(bridge, clock, monkeypatch):
+    monkeypatch.setattr(bridge, 'xmrig_workers', {})
+    worker = login(bridge, 1, {'login': 'wallet', 'rigid': 'rig1'})
+    bridge.track_share_result({'id': submit(bridge, 1), 'status': 'submitted'})
+    clock.now += 100
+    disconnect(bridge, 1)
+
+    clock.now += 50
+    snapshot = bridge.worker_stats_snapshot()[worker]
+    assert (snapshot['connected'], snapshot['uptime']) == (False, 100)
+
+    # Same rig on a new connection (new client id) keeps its counters
+    assert login(bridge, 9, {'login': 'wallet', 'rigid': 'rig1'}) == worker
+    submit(bridge, 9)
+    clock.now += 20
+    snapshot = bridge.worker_stats_snapshot()[worker]
+    assert snapshot['connected'] and snapshot['sessions'] == 1
+    assert (snapshot['submitted'], snapshot['accepted'], snapshot['uptime']) == (2, 1, 120)
+    assert list(bridge.worker_stats) == [worker]
+
+
+def test_relogin_moves_the_session(bridge, monkeypatch):
+    monkeypatch.setattr(bridge, 'xmrig_workers', {})
+    first = login(bridge, 1, {'login': 'wallet', 'pass': 'old'})
+    second = login(bridge, 1, {'login': 'wallet', 'pass': 'new'})
+    assert bridge.worker_stats[first].sessions == 0
+    assert bridge.worker_stats[second].sessions == 1
+    # Two rigs under one name share its stats
+    login(bridge, 2, {'login': 'wallet', 'pass': 'new'})
+    disconnect(bridge, 1)
+    assert bridge.worker_stats[second].sessions == 1
+
+
+def test_gone_workers_expire(bridge, clock, monkeypatch):
+    monkeypatch.setattr(bridge, 'xmrig_workers', {})
+    worker = login(bridge, 1, {'login': 'wallet', 'rigid': 'rig1'})
+    disconnect(bridge, 1)
+    clock.now += bridge.WORKER_EXPIRY - 1
+    assert worker in bridge.worker_stats_snapshot()
+    clock.now += 2
+    assert worker not in bridge.worker_stats_snapshot()
@@ -0,0 +1,113 @@
+"""Change-driven status reporting: which fields go to the proxy, and when"""
+import pytest
+
+import ws_bridge
+
+
+def snapshot(**changes):
+    status = {
+        'status': 'mining',
+        'temperature': 70.0,
+        'hashrate': 1000.0,
+        'power': 50.0,
+        'hashesPerJoule': 20.0,
+        'hugePages': [0, 0],
+        'activeClients': 1,
+        'pendingShares': 0,
+        'totalSubmitted': 10,
+        'totalAccepted': 9,
+        'workers': {'rig1': {'connected': True, 'uptime': 100, 'hashrate': 1000.0, 'accepted': 9}},
+        'latencyBucketsMs': list(ws_bridge.LATENCY_BUCKETS_MS),
+        'version': ws_bridge.BRIDGE_VERSION,
+    }
+    status.update(changes)
+    return status
+
+
+class Reporter:
+    """The status updater's bookkeeping, with every send succeeding"""
+    def __init__(self):
+        self.last_sent = {}
+        self.last_send_time = 0
+
+    def sample(self, now, current):
+        kind, params = ws_bridge.status_step(self.last_sent, self.last_send_time, current, now)
+        if kind:
+            self.last_sent = ws_bridge._merge_status(self.last_sent, params)
+            self.last_send_time = now
+        return kind, params
+
+
+@pytest.fixture
+def reporter():
+    reporter = Reporter()
+    assert reporter.sample(1000, snapshot()) == ('full', snapshot())
+    return reporter
+
+
+def test_unchanged_status_sends_only_heartbeats(reporter):
+    heartbeat = 1000 + ws_bridge.STATUS_HEARTBEAT_INTERVAL
+    for now in range(1002, heartbeat, 2):
+        assert reporter.sample(now, snapshot()) == (None, None)
+    assert reporter.sample(heartbeat, snapshot()) == ('heartbeat', {})
+    # The heartbeat is the keepalive: the next one is a full interval later
+    assert reporter.sample(heartbeat + 2, snapshot()) == (None, None)
+    assert reporter.sample(heartbeat * 2 - 1000, snapshot()) == ('heartbeat', {})
+
+
+def test_update_also_serves_as_keepalive(reporter):
+    assert reporter.sample(1040, snapshot(activeClients=2)) == ('delta', {'activeClients': 2})
+    assert reporter.sample(1040 + ws_bridge.STATUS_HEARTBEAT_INTERVAL - 2, snapshot(activeClients=2)) == (None, None)
+    assert reporter.sample(1040 + ws_bridge.STATUS_HEARTBEAT_INTERVAL, snapshot(activeClients=2)) == ('heartbeat', {})
+
+
+def test_client_count_and_status_go_out_at_once(reporter):
+    assert reporter.sample(1002, snapshot(activeClients=3)) == ('delta', {'activeClients': 3})
+    assert reporter.sample(1004, snapshot(activeClients=3, status='paused')) == ('delta', {'status': 'paused'})
+    assert reporter.sample(1006, snapshot(activeClients=3, status='paused')) == (None, None)
+
+
+def test_temperature_within_band_is_batched(reporter):
+    small = ws_bridge.TEMP_CHANGE / 2
+    assert reporter.sample(1002, snapshot(temperature=70.0 + small)) == (None, None)
+    assert reporter.sample(1004, snapshot(temperature=73.0)) == (None, None)
+    assert reporter.sample(1000 + ws_bridge.STATUS_MIN_INTERVAL, snapshot(temperature=73.0)) == \
+        ('delta', {'temperature': 73.0})
+    # Below TEMP_CHANGE of what was last sent: not worth an update
+    assert reporter.sample(1100, snapshot(temperature=73.0 + small)) == ('heartbeat', {})
+
+
+def test_temperature_band_change_goes_out_at_once(reporter):
+    reporter.last_sent['temperature'] = ws_bridge.TEMP_THROTTLE - 0.5
+    hot = ws_bridge.TEMP_THROTTLE + 0.5
+    # Even a change below TEMP_CHANGE is sent when it crosses into another band
+    assert reporter.sample(1002, snapshot(temperature=hot, status='temp-throttle')) == \
+        ('delta', {'temperature': hot, 'status': 'temp-throttle'})
+    assert reporter.sample(1004, snapshot(temperature=None, status='temp-throttle')) == \
+        ('delta', {'temperature': None})
+
+
+def test_minor_changes_are_batched(reporter):
+    batched = 1000 + ws_bridge.STATUS_MIN_INTERVAL
+    changed = snapshot(hashrate=1200.0, totalSubmitted=12)
+    assert reporter.sample(1002, changed) == (None, None)
+    # Within HASHRATE_CHANGE: not reported even once the batch is due
+    assert reporter.sample(batched, snapshot(hashrate=1050.0)) == (None, None)
+    kind, params = reporter.sample(batched + 2, changed)
+    assert kind == 'delta' and params == {'hashrate': 1200.0, 'totalSubmitted': 12}
+
+
+def test_only_changed_workers_are_sent(reporter):
+    workers = {
+        'rig1': {'connected': True, 'uptime': 130, 'hashrate': 1000.0, 'accepted': 9},
+        'rig2': {'connected': True, 'uptime': 0, 'hashrate': 0.0, 'accepted': 0},
+    }
+    kind, params = reporter.sample(1030, snapshot(workers=workers))
+    # Uptime alone isn't a change; the new worker is
+    assert kind == 'delta' and params == {'workers': {'rig2': workers['rig2']}}
+    assert set(reporter.last_sent['workers']) == {'rig1', 'rig2'}
+
+
+def test_resync_sends_full_snapshot(reporter):
+    reporter.last_sent = {}
+    assert reporter.sample(1002, snapshot(activeClients=2)) == ('full', snapshot(activeClients=2))
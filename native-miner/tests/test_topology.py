@@ -0,0 +1,111 @@
+"""Thread plans for recorded sysfs trees and WMI rows (tests/fixtures/)"""
+import json
+import os
+
+import pytest
+
+import resources
+from topology import read_sysfs, topology_from_wmi, plan_threads, affinity_mask, l3_thread_limit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def sysfs(model):
+    return os.path.join(FIXTURES, 'sysfs', model)
+
+
+def wmi(model):
+    with open(os.path.join(FIXTURES, 'wmi', model + '.json')) as f:
+        rows = json.load(f)
+    return [rows] if isinstance(rows, dict) else rows
+
+
+@pytest.mark.parametrize('model, threads, affinity', [
+    # 12 MB for 6c/12t: one thread per core, no SMT siblings
+    ('intel-i7-8700', 6, list(range(6))),
+    # Zen 2: each 16 MB CCX feeds all 8 of its CPUs
+    ('amd-ryzen7-3700x', 16, list(range(16))),
+    # two sockets, 15 MB each: 4 cores + 3 siblings per socket
+    ('intel-2x-xeon-e5-2637v2', 14, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 12, 13, 14]),
+    # no L3 at all: one thread per CPU
+    ('rpi4-cortex-a72', 4, [0, 1, 2, 3]),
+])
+def test_plan_for_recorded_machines(model, threads, affinity):
+    plan = plan_threads(sorted(read_sysfs(sysfs(model))), sys_root=sysfs(model))
+    assert plan['source'] == 'sysfs'
+    assert plan['threads'] == threads
+    assert plan['affinity'] == affinity
+    assert plan['mask'] == affinity_mask(plan['order'], threads)
+
+
+def test_read_sysfs_siblings_and_l3():
+    topo = read_sysfs(sysfs('amd-ryzen7-3700x'))
+    assert sorted(topo) == list(range(16))
+    assert topo[3]['siblings'] == frozenset([3, 11])
+    shared, size = topo[11]['l3']
+    assert shared == frozenset([0, 1, 2, 3, 8, 9, 10, 11])
+    assert size == 16 * 1024 * 1024
+    assert read_sysfs(sysfs('rpi4-cortex-a72'))[0]['l3'] is None
+
+
+def test_order_spreads_over_l3_and_drops_siblings_first():
+    plan = plan_threads(list(range(16)), sys_root=sysfs('amd-ryzen7-3700x'))
+    # cores alternate between the two CCXs, then the SMT siblings
+    assert plan['order'][:8] == [0, 4, 1, 5, 2, 6, 3, 7]
+    assert set(plan['order'][8:]) == set(range(8, 16))
+    assert affinity_mask(plan['order'], 2) == 0b10001
+
+
+def test_affinity_and_quota_limit_the_plan():
+    root = sysfs('intel-2x-xeon-e5-2637v2')
+    plan = plan_threads([0, 1, 8, 9], sys_root=root)
+    assert plan['threads'] == 4     # 15 MB would feed 7, only 4 CPUs allowed
+    plan = plan_threads(list(range(16)), quota=2.5, sys_root=root)
+    assert plan['threads'] == 2
+    assert plan['affinity'] == [0, 4]
+    assert any('quota' in reason for reason in plan['reasons'])
+
+
+def test_affinity_mask():
+    assert affinity_mask([3, 0, 5], 2) == 0b1001
+    assert affinity_mask([3, 0, 5], 0) == 0
+    assert affinity_mask([], 4) == 0
+
+
+def test_topology_from_wmi_single_package():
+    topo = topology_from_wmi(wmi('intel-i7-8700'))
+    assert sorted(topo) == list(range(12))
+    # WMI has no sibling numbering: assumed adjacent
+    assert topo[4]['siblings'] == frozenset([4, 5])
+    assert topo[0]['l3'] == (frozenset(range(12)), 12 * 1024 * 1024)
+    plan = plan_threads(list(range(12)), topology=topo)
+    assert plan['threads'] == 6
+    assert plan['affinity'] == [0, 2, 4, 6, 8, 10]
+
+
+def test_topology_from_wmi_two_packages():
+    topo = topology_from_wmi(wmi('intel-2x-xeon-e5-2637v2'))
+    assert topo[7]['l3'][0] == frozenset(range(8))
+    assert topo[8]['l3'][0] == frozenset(range(8, 16))
+    assert topo[9]['siblings'] == frozenset([8, 9])
+    assert plan_threads(list(range(16)), topology=topo)['threads'] == 14
+
+
+def test_topology_from_wmi_without_l3():
+    topo = topology_from_wmi(wmi('vm-no-l3'))
+    assert topo == {0: {'siblings': frozenset([0]), 'l3': None}, 1: {'siblings': frozenset([1]), 'l3': None}}
+    assert topology_from_wmi([{'NumberOfLogicalProcessors': 0}]) == {}
+
+
+def test_one_l3_model_for_budget_and_plan(tmp_path):
+    # resources.detect_resources() takes its L3 limit from the planner
+    root = sysfs('intel-2x-xeon-e5-2637v2')
+    assert l3_thread_limit(list(range(16)), root) == 14
+    assert l3_thread_limit([0, 1, 2, 3], root) == 4
+    assert l3_thread_limit([0, 1], sysfs('rpi4-cortex-a72')) is None
+    proc = tmp_path / 'proc' / 'self'
+    proc.mkdir(parents=True)
+    (proc / 'status').write_text('Cpus_allowed_list:\t0-15\n')
+    res = resources.detect_resources(str(tmp_path / 'proc'), root)
+    assert res['l3Threads'] == 14
+    assert res['threads'] == 14 and res['limitedBy'] == 'l3'
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Cache-Topology Thread Planner for RandomX
+Decides how many hashing threads to run and on which CPUs, straight from
+the cache and core layout - no benchmark, so it is instant at startup.
+
+RandomX wants ~2 MB of L3 per thread. For every L3 cache (CCX on AMD, the
+whole die on most Intel parts) the planner:
+- gives it size / 2 MB threads, but no more than its allowed CPUs
+- fills one CPU per physical core first, then SMT siblings only if the L3
+  still has room (an Intel 8c/16t with 16 MB gets 8 threads, one per core;
+  a Zen 2 CCX with 16 MB for 4c/8t gets all 8)
+- orders CPUs so fewer threads (throttling, competing load) drop SMT
+  siblings first and stay spread evenly over the L3 caches
+
+Sources: /sys/devices/system/cpu/cpu*/{topology,cache} on Linux; WMI
+(Win32_Processor via PowerShell) on Windows, which only reports L3 per
+package and assumes siblings are numbered next to each other.
+The affinity mask is for XMRig's --cpu-affinity (process-wide).
+
+Usage:
+  python topology.py                  # plan for this machine, with reasons
+  python topology.py --sys /tmp/sys   # plan for a recorded sysfs tree
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+
+from resources import SYS_ROOT, RANDOMX_L3_PER_THREAD, _read, parse_cpu_list, parse_size, allowed_cpus
+
+MB = 1024 * 1024
+
+def format_cpu_list(cpus):
+    """[0, 1, 2, 3, 8] -> '0-3,8'"""
+    parts, run = [], []
+    for cpu in sorted(cpus):
+        if run and cpu != run[-1] + 1:
+            parts.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+            run = []
+        run.append(cpu)
+    if run:
+        parts.append(f"{run[0]}-{run[-1]}" if len(run) > 1 else str(run[0]))
+    return ','.join(parts)
+
+# =============================================================================
+# TOPOLOGY SOURCES
+# =============================================================================
+def read_sysfs(sys_root=SYS_ROOT):
+    """{cpu: {'siblings': frozenset, 'l3': (frozenset, bytes) or None}} for online CPUs"""
+    cpu_root = os.path.join(sys_root, 'devices', 'system', 'cpu')
+    online = _read(os.path.join(cpu_root, 'online'))
+    try:
+        present = sorted(int(d[3:]) for d in os.listdir(cpu_root) if d.startswith('cpu') and d[3:].isdigit())
+    except OSError:
+        return {}
+    if online:
+        present = [cpu for cpu in present if cpu in set(parse_cpu_list(online))]
+    topo = {}
+    for cpu in present:
+        d = os.path.join(cpu_root, f'cpu{cpu}')
+        siblings = frozenset(parse_cpu_list(_read(os.path.join(d, 'topology', 'thread_siblings_list')))) or frozenset([cpu])
+        l3 = None
+        try:
+            indexes = [i for i in os.listdir(os.path.join(d, 'cache')) if i.startswith('index')]
+        except OSError:
+            indexes = []
+        for index in indexes:
+            c = os.path.join(d, 'cache', index)
+            if _read(os.path.join(c, 'level')) != '3':
+                continue
+            shared = frozenset(parse_cpu_list(_read(os.path.join(c, 'shared_cpu_list'))))
+            size = parse_size(_read(os.path.join(c, 'size')))
+            if shared and size:
+                l3 = (shared, size)
+        topo[cpu] = {'siblings': siblings, 'l3': l3}
+    return topo
+
+def wmi_processors():
+    """Win32_Processor rows (L3CacheSize in KB, NumberOfCores, NumberOfLogicalProcessors)"""
+    try:
+        result = subprocess.run(
+            ['powershell', '-NoProfile', '-Command',
+             'Get-CimInstance Win32_Processor | Select-Object L3CacheSize,NumberOfCores,'
+             'NumberOfLogicalProcessors | ConvertTo-Json'],
+            capture_output=True, text=True, timeout=15)
+        rows = json.loads(result.stdout or 'null')
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return []
+    if isinstance(rows, dict):
+        rows = [rows]
+    return rows or []
+
+def topology_from_wmi(rows):
+    """Same shape as read_sysfs(); packages numbered in order, siblings adjacent"""
+    topo, base = {}, 0
+    for row in rows:
+        logical = int(row.get('NumberOfLogicalProcessors') or 0)
+        cores = int(row.get('NumberOfCores') or logical)
+        l3_kb = int(row.get('L3CacheSize') or 0)
+        if not logical or not cores:
+            continue
+        package = frozenset(range(base, base + logical))
+        per_core = max(1, logical // cores)
+        for cpu in package:
+            first = base + (cpu - base) // per_core * per_core
+            topo[cpu] = {
+                'siblings': frozenset(range(first, min(first + per_core, base + logical))),
+                'l3': (package, l3_kb * 1024) if l3_kb else None,
+            }
+        base += logical
+    return topo
+
+def read_topology(sys_root=SYS_ROOT):
+    """(topology, source): sysfs on Linux, WMI on Windows, ({}, 'none') otherwise"""
+    topo = read_sysfs(sys_root)
+    if topo:
+        return topo, 'sysfs'
+    if platform.system() == 'Windows' and sys_root == SYS_ROOT:
+        topo = topology_from_wmi(wmi_processors())
+        if topo:
+            return topo, 'wmi'
+    return {}, 'none'
+
+# =============================================================================
+# PLANNER
+# =============================================================================
+def _interleave(groups):
+    """Round-robin over lists: [[0, 1], [8, 9]] -> [0, 8, 1, 9]"""
+    out = []
+    for i in range(max((len(g) for g in groups), default=0)):
+        out.extend(g[i] for g in groups if i < len(g))
+    return out
+
+def plan_threads(cpus=None, quota=None, sys_root=SYS_ROOT, topology=None):
+    """Thread count and CPU order for RandomX.
+
+    Returns {'threads', 'order', 'affinity', 'mask', 'source', 'reasons'}:
+    `order` lists the chosen CPUs best first (a smaller thread count uses a
+    prefix of it), `affinity`/`mask` are the CPUs for `threads` threads.
+    """
+    allowed = set(cpus if cpus is not None else allowed_cpus())
+    if topology is None:
+        topo, source = read_topology(sys_root)
+    else:
+        topo, source = topology, 'given'
+    reasons = []
+
+    domains = {}                          # l3 cpus -> (size, allowed cpus under it)
+    uncached = []
+    for cpu in sorted(allowed):
+        info = topo.get(cpu)
+        if info and info['l3']:
+            shared, size = info['l3']
+            domains.setdefault(shared, (size, []))[1].append(cpu)
+        else:
+            uncached.append(cpu)
+
+    primaries, secondaries = [], []
+    for shared, (size, members) in sorted(domains.items(), key=lambda d: min(d[0])):
+        cores = {}
+        for cpu in members:
+            cores.setdefault(topo[cpu]['siblings'], []).append(cpu)
+        ordered = sorted(cores.values(), key=min)
+        first = [core[0] for core in ordered]
+        rest = _interleave([core[1:] for core in ordered])
+        take = min(len(members), max(1, size // RANDOMX_L3_PER_THREAD))
+        primaries.append(first[:take])
+        secondaries.append(rest[:max(0, take - len(first))])
+        smt = max(0, take - len(first))
+        reasons.append(f"L3 {size / MB:g} MB on CPUs {format_cpu_list(shared)}: "
+                       f"{len(members)} allowed CPUs on {len(cores)} cores -> {take} threads "
+                       f"({min(take, len(first))} cores" + (f" + {smt} SMT siblings)" if smt else ")"))
+    order = _interleave(primaries) + _interleave(secondaries)
+    order += uncached
+    if uncached and domains:
+        reasons.append(f"No L3 information for CPUs {format_cpu_list(uncached)}: one thread each")
+
+    threads = len(order) or len(allowed) or 1
+    if quota is not None and int(quota) < threads:
+        threads = max(1, int(quota))
+        reasons.append(f"CPU quota {quota:g} cores -> {threads} threads")
+    if not domains:
+        reasons.insert(0, f"No cache topology ({source}): one thread per allowed CPU")
+    affinity = sorted(order[:threads])
+    return {
+        'threads': threads,
+        'order': order,
+        'affinity': affinity,
+        'mask': affinity_mask(order, threads),
+        'source': source,
+        'reasons': reasons,
+    }
+
+def l3_thread_limit(cpus, sys_root=SYS_ROOT, topology=None):
+    """Threads plan_threads() gives `cpus` before any quota, or None without L3 information"""
+    topo = read_topology(sys_root)[0] if topology is None else topology
+    if not any(topo.get(cpu, {}).get('l3') for cpu in cpus):
+        return None
+    return plan_threads(cpus, topology=topo)['threads']
+
+def affinity_mask(order, threads):
+    """Bit mask of the first `threads` CPUs of a plan's order (0 if unknown)"""
+    return sum(1 << cpu for cpu in order[:threads])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plan RandomX threads from the cache topology")
+    parser.add_argument('--sys', default=SYS_ROOT, help="sysfs root (a recorded tree for testing)")
+    parser.add_argument('--cpus', help="Allowed CPUs, e.g. 0-7 (default: this process's affinity)")
+    parser.add_argument('--quota', type=float, help="CPU quota in cores")
+    args = parser.parse_args()
+    cpus = parse_cpu_list(args.cpus) if args.cpus else None
+    if cpus is None and args.sys != SYS_ROOT:
+        cpus = sorted(read_sysfs(args.sys)) or None
+    plan = plan_threads(cpus, args.quota, args.sys)
+    print(f"Plan: {plan['threads']} threads on CPUs {format_cpu_list(plan['affinity'])} "
+          f"(mask {plan['mask']:#x}, from {plan['source']})")
+    for reason in plan['reasons']:
+        print(f"  {reason}")
+    sys.exit(0)
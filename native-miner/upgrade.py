@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Socket Handover for Zero-Downtime Bridge Upgrades
+Passes open sockets (SCM_RIGHTS) and a JSON state blob from a running bridge
+to its replacement over a Unix socket, so XMRig connections never drop.
+
+Protocol on the Unix socket (new bridge connects, old bridge answers):
+  new -> old   b'T'                      takeover request
+  old -> new   4-byte length + JSON      state; state['fds'] = number of sockets
+  old -> new   b'F' + up to 200 fds      repeated until all sockets are sent
+  new -> old   b'K'                      adopted; old bridge closes its copies and exits
+
+Only on Unix with Python 3.9+ (socket.send_fds); supported() says whether it works.
+"""
+
+import os
+import json
+import socket
+import struct
+import tempfile
+
+SOCKET_TEMPLATE = os.path.join(tempfile.gettempdir(), "ws-bridge-{port}.sock")
+MAX_FDS_PER_MESSAGE = 200      # Linux allows 253 (SCM_MAX_FD)
+HANDOVER_TIMEOUT = 10          # Seconds either side waits for the other
+
+def supported():
+    return hasattr(socket, 'AF_UNIX') and hasattr(socket, 'send_fds')
+
+def socket_path(port):
+    return SOCKET_TEMPLATE.format(port=port)
+
+def listen(path):
+    """Unix socket the running bridge waits for a successor on"""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    os.chmod(path, 0o600)
+    server.listen(1)
+    return server
+
+def _recv_exact(conn, size):
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("handover connection closed")
+        data += chunk
+    return data
+
+def send_handover(conn, state, socks):
+    """Old side: send the state and every socket's descriptor"""
+    state = dict(state, fds=len(socks))
+    body = json.dumps(state).encode()
+    conn.sendall(struct.pack('!I', len(body)) + body)
+    fds = [s.fileno() for s in socks]
+    for i in range(0, len(fds), MAX_FDS_PER_MESSAGE):
+        socket.send_fds(conn, [b'F'], fds[i:i + MAX_FDS_PER_MESSAGE])
+
+def recv_handover(conn):
+    """New side: (state, sockets) in the order the old side sent them"""
+    size, = struct.unpack('!I', _recv_exact(conn, 4))
+    state = json.loads(_recv_exact(conn, size))
+    fds = []
+    while len(fds) < state['fds']:
+        data, received, _, _ = socket.recv_fds(conn, 1, MAX_FDS_PER_MESSAGE)
+        if not data:
+            raise ConnectionError("handover connection closed")
+        fds.extend(received)
+    return state, [socket.socket(fileno=fd) for fd in fds]
+
+def request_handover(path):
+    """New side: ask the bridge listening on `path` for its sockets.
+
+    Returns (conn, state, sockets); send ack(conn) once the sockets are served.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.settimeout(HANDOVER_TIMEOUT * 2)   # Old side drains in-flight shares first
+    conn.connect(path)
+    conn.sendall(b'T')
+    state, socks = recv_handover(conn)
+    return conn, state, socks
+
+def ack(conn):
+    conn.sendall(b'K')
+    conn.close()
+
+def wait_for_ack(conn):
+    """Old side: True once the new bridge confirmed it serves the sockets"""
+    conn.settimeout(HANDOVER_TIMEOUT)
+    try:
+        return conn.recv(1) == b'K'
+    except OSError:
+        return False
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 """
-WebSocket-to-Stratum Bridge for Native Miners v4.1.0
+WebSocket-to-Stratum Bridge for Native Miners v4.11.0
 SIMPLE THREADED VERSION - No async complexity.
 
 Key improvements:
@@ -8,11 +8,25 @@ Key improvements:
 - WebSocket reconnects automatically in background
 - Shares queued when WebSocket is down
 - Uses threading instead of asyncio for simplicity
+- Shares tracked from submit to pool acceptance (latency + per-client counts)
+- Status sent on change (deltas) with a slow heartbeat instead of fixed timers
+- Hashrate/temperature/share history kept on disk (history.py), served on 127.0.0.1:3380
+- Opt-in diagnostics (--diagnostics): lock wait/hold times, SIGUSR1 dumps, flame-graph profile
+- Proxy pause/stop really stops hashing: XMRig paused through its API (--xmrig-api),
+  otherwise rigs are disconnected and held until resume; submits are not forwarded
+- Zero-downtime upgrades (Unix): `--upgrade` takes the listening socket, XMRig
+  connections, current job and share state over from the running bridge
+- Sharding for big farms (Linux): `--workers N` runs N stratum processes on one
+  port (SO_REUSEPORT) behind a single proxy WebSocket
 
 Usage:
   python ws_bridge.py
+  python ws_bridge.py --lan          # Serve every rig on the LAN (0.0.0.0, large backlog)
+  python ws_bridge.py --upgrade      # Replace the running bridge without dropping rigs
+  python ws_bridge.py --lan --workers 4   # Spread rigs over 4 processes
   
 Then point XMRig to: stratum+tcp://127.0.0.1:3333
+In LAN mode give each rig its own name: xmrig -u <login> -p <worker> (or --rig-id <worker>)
 """
 
 import json
@@ -26,6 +40,20 @@ import socket
 import threading
 import select
 import queue
+import argparse
+import gzip
+import signal
+import multiprocessing
+from collections import deque
+
+from power import PowerSampler, hashes_per_joule
+from history import HistoryWriter, HISTORY_DIR, HISTORY_PORT, start_server
+from xmrig_api import XmrigApi, PauseHolds
+from hugepages import from_summary as huge_pages_from_summary
+from resources import LoadSampler, allowed_cpus
+import upgrade
+import diagnostics
+from diagnostics import make_lock   # Plain threading.Lock unless --diagnostics
 
 try:
     import websocket
@@ -34,42 +62,107 @@ except ImportError:
     subprocess.run([sys.executable, "-m", "pip", "install", "websocket-client"], check=True)
     import websocket
 
-BRIDGE_VERSION = "4.1.1"
+BRIDGE_VERSION = "4.11.0"
 
 # Temperature thresholds (Celsius)
 TEMP_THROTTLE = 80
 TEMP_STOP = 90
 TEMP_RESUME = 70
 
+# Share tracking
+HASHRATE_WINDOW = 60           # Seconds of accepted shares used for the hashrate estimate
+SHARE_ACK_TIMEOUT = 30         # Seconds to wait for the proxy's share_result
+SHARE_POOL_TIMEOUT = 180       # Seconds to wait for hash_accepted once a share went to the pool
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Status reporting (change-driven)
+STATUS_SAMPLE_INTERVAL = 2     # Seconds between checks for changes
+TEMP_SAMPLE_INTERVAL = 10      # Temperature reads are slow on Windows (PowerShell)
+STATUS_MIN_INTERVAL = 30       # Minor changes are batched this long
+STATUS_HEARTBEAT_INTERVAL = 45 # Keepalive when nothing changed (proxy times out at 60s)
+STATUS_RATE_REPORT_INTERVAL = 3600
+HASHRATE_CHANGE = 0.10         # Relative hashrate/power change worth reporting
+TEMP_CHANGE = 2.0              # Temperature change (°C) worth reporting
+LEGACY_STATUS_RATE = 720       # Old behavior: status_update + ping every 10s
+
 # =============================================================================
 # GLOBAL STATE
 # =============================================================================
 ws_connection = None           # WebSocket to proxy
 ws_connected = False           # Is WebSocket connected?
-ws_lock = threading.Lock()     # Thread-safe access
+ws_lock = make_lock('ws_lock')     # Thread-safe access
 current_job = None             # Current mining job from pool
-current_job_lock = threading.Lock()
+current_job_lock = make_lock('current_job_lock')
 xmrig_clients = {}             # {client_id: socket} - Connected XMRig instances
-xmrig_lock = threading.Lock()
+xmrig_lock = make_lock('xmrig_lock')
 outgoing_queue = queue.Queue()  # Messages to send to proxy
 pending_shares = []            # Shares waiting to be sent when WS reconnects
-pending_lock = threading.Lock()
+pending_lock = make_lock('pending_lock')
 client_counter = 0
+xmrig_workers = {}             # {client_id: worker name} - Identity from stratum login
 
 # Stats
 current_hashrate = 0.0
 current_temp = None
+current_watts = None           # CPU power from RAPL (None if unavailable)
+current_huge_pages = None      # XMRig's huge-page use from its API summary (--xmrig-api)
+power_sampler = None
 current_difficulty = 1000
-share_times = []               # For hashrate estimation
-share_times_lock = threading.Lock()
+share_times = []               # (time, difficulty) of accepted shares, for hashrate estimation
+share_times_lock = make_lock('share_times_lock')
 total_shares_submitted = 0
 total_shares_accepted = 0
+total_shares_valid = 0         # share_result accepted (incl. low_difficulty), for history
+total_shares_rejected = 0
+
+# Share lifecycle tracking (submit -> share_result -> hash_accepted)
+inflight_shares = {}           # {share_id: share record} - Shares waiting for the proxy/pool
+inflight_lock = make_lock('inflight_lock')
+share_counter = 0
+worker_stats = {}              # {worker name: WorkerStats} - Survives reconnects (guarded by inflight_lock)
+
+# On-disk history (--no-history disables)
+history_writer = None
+
+# Trace recording (--record)
+recorder = None                # TraceRecorder when recording, else None
+ws_session = 0                 # Counts WebSocket connections, for traces
+
+# Status reporting
+bridge_start_time = time.time()
+status_resync = True           # Next status_update must be a full snapshot
+status_messages = {}           # {'full'|'delta'|'heartbeat': count}
+status_stats_lock = make_lock('status_stats_lock')
 
 # Control flags
 mining_paused = False
 pool_suspended = False
 running = True
 
+# Pause propagation
+xmrig_api = None               # XmrigApi (--xmrig-api): pause XMRig in place instead of holding it
+pause_changed = threading.Event()
+pause_holds = PauseHolds()        # --pause-holds: shared with miner.py's thermal pause
+paused_at = None               # When the current pause started
+paused_submits = 0             # Submits dropped while paused
+pause_cpu = None               # LoadSampler started at pause: CPU busy while paused (Linux)
+
+# Zero-downtime upgrade (--upgrade)
+HANDOVER_DRAIN = 5             # Seconds to wait for answers to shares already sent
+handing_over = threading.Event()   # Set while sockets are passed to a new bridge
+handed_over = threading.Event()    # The new bridge took over; this one exits
+server_parked = threading.Event()  # Accept loop stopped, listening socket left open
+handover_lock = make_lock('handover_lock')
+parked_clients = {}            # {client_id: unparsed bytes} - Readers stopped for the handover
+stratum_server_sock = None
+
+# Sharding (--workers): the coordinator owns the WebSocket, shard processes own the rigs
+SHARD_CID_SPAN = 1000000       # Client ids of shard i start at i * SHARD_CID_SPAN
+shard_conn = None              # In a shard: pipe to the coordinator
+shard_send_lock = make_lock('shard_send_lock')
+shard_pipes = []               # In the coordinator: pipes to the shards
+shard_clients = {}             # In the coordinator: {client_id: shard index} (guarded by xmrig_lock)
+
 # =============================================================================
 # CLIENT ID
 # =============================================================================
@@ -91,6 +184,11 @@ def get_or_create_client_id():
 BRIDGE_CLIENT_ID = get_or_create_client_id()
 PROXY_WS_URL = f"wss://respectable-gilemette-timco-f0e524a9.koyeb.app/proxy?clientId={BRIDGE_CLIENT_ID}"
 LOCAL_PORT = 3333
+BIND_HOST = "127.0.0.1"        # Local only by default
+LAN_BIND_HOST = "0.0.0.0"      # --lan: serve every rig on the site
+LISTEN_BACKLOG = 5
+LAN_LISTEN_BACKLOG = 1024      # Rigs reconnect in bursts after a restart
+WORKER_EXPIRY = 24 * 3600      # Forget workers not seen for this long
 
 # =============================================================================
 # TEMPERATURE
@@ -131,19 +229,20 @@ def get_cpu_temp():
 # HASHRATE ESTIMATION
 # =============================================================================
 def update_hashrate():
-    """Estimate hashrate from share submission rate"""
+    """Estimate effective hashrate from shares the proxy accepted (not just submitted)"""
     global current_hashrate, share_times
     now = time.time()
     with share_times_lock:
-        share_times = [t for t in share_times if now - t < 60]
+        share_times = [(t, d) for t, d in share_times if now - t < HASHRATE_WINDOW]
         
         if len(share_times) >= 2:
-            time_span = now - share_times[0]
+            time_span = now - share_times[0][0]
             if time_span > 0:
-                shares_per_sec = len(share_times) / time_span
-                current_hashrate = shares_per_sec * current_difficulty
-        elif len(share_times) == 1 and (now - share_times[0]) > 5:
-            current_hashrate = current_difficulty / (now - share_times[0])
+                current_hashrate = sum(d for _, d in share_times) / time_span
+        elif len(share_times) == 1 and (now - share_times[0][0]) > 5:
+            current_hashrate = share_times[0][1] / (now - share_times[0][0])
+        elif not share_times:
+            current_hashrate = 0.0
     
     return current_hashrate
 
@@ -157,6 +256,296 @@ def target_to_difficulty(target):
         return 1000000
     return int(0xFFFFFFFF / target_value)
 
+# =============================================================================
+# SHARE TRACKING
+# =============================================================================
+# Every submit gets a correlation id and stays in inflight_shares until the
+# proxy answers it. Lifecycle:
+#   queued  - waiting in pending_shares for the WebSocket to come back
+#   sent    - sent to the proxy, waiting for share_result
+#   pool    - proxy forwarded it to the pool, waiting for hash_accepted
+# share_result is matched by the echoed id, or by order (the proxy answers
+# submits in order on one socket). hash_accepted carries no id and is
+# broadcast to every miner, so it is matched to the oldest share in "pool"
+# state; accepts with no such share belong to other miners and are ignored.
+
+class WorkerStats:
+    """Accounting for one worker identity, kept across reconnects"""
+    __slots__ = ('sessions', 'connected_since', 'uptime', 'last_seen',
+                 'submitted', 'accepted', 'rejected', 'timeouts', 'pool_accepted',
+                 'share_times', 'ack_latency', 'pool_latency')
+    
+    def __init__(self):
+        self.sessions = 0            # Live stratum connections using this identity
+        self.connected_since = None
+        self.uptime = 0.0            # Connected seconds from finished sessions
+        self.last_seen = time.time()
+        self.submitted = 0
+        self.accepted = 0            # Valid work acknowledged by the proxy
+        self.rejected = 0
+        self.timeouts = 0
+        self.pool_accepted = 0
+        self.share_times = deque(maxlen=256)   # (time, difficulty) of accepted shares
+        self.ack_latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.pool_latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    
+    def total_uptime(self, now):
+        if self.connected_since is None:
+            return self.uptime
+        return self.uptime + (now - self.connected_since)
+    
+    def hashrate(self, now):
+        recent = [(t, d) for t, d in self.share_times if now - t < HASHRATE_WINDOW]
+        if not recent:
+            return 0.0
+        span = max(now - recent[0][0], 5.0)
+        return sum(d for _, d in recent) / span
+    
+    def snapshot(self, now):
+        return {
+            'connected': self.sessions > 0,
+            'sessions': self.sessions,
+            'uptime': round(self.total_uptime(now)),
+            'hashrate': round(self.hashrate(now), 1),
+            'submitted': self.submitted,
+            'accepted': self.accepted,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'poolAccepted': self.pool_accepted,
+            'ackLatencyMs': list(self.ack_latency),
+            'poolLatencyMs': list(self.pool_latency),
+        }
+
+def worker_identity(params, cid):
+    """Stable worker name from the stratum login (login + rigid/pass)"""
+    login = str(params.get('login') or '').strip()
+    password = str(params.get('pass') or '').strip()
+    rigid = str(params.get('rigid') or '').strip()
+    suffix = rigid or (password if password.lower() not in ('', 'x') else '')
+    name = f"{login}.{suffix}" if login and suffix else (login or suffix)
+    name = ''.join(c if c.isalnum() or c in '._-' else '_' for c in name)[:64]
+    return name or f'xmrig-{cid}'
+
+def client_label(cid):
+    """Name a stratum client is reported under"""
+    return xmrig_workers.get(cid) or f'xmrig-{cid}'
+
+def _worker(label):
+    """Get (or create) stats for a worker. Call with inflight_lock held."""
+    stats = worker_stats.get(label)
+    if stats is None:
+        stats = worker_stats[label] = WorkerStats()
+    return stats
+
+def worker_connected(label):
+    now = time.time()
+    with inflight_lock:
+        stats = _worker(label)
+        if stats.sessions == 0:
+            stats.connected_since = now
+        stats.sessions += 1
+        stats.last_seen = now
+
+def worker_disconnected(label):
+    now = time.time()
+    with inflight_lock:
+        stats = _worker(label)
+        stats.sessions = max(0, stats.sessions - 1)
+        stats.last_seen = now
+        if stats.sessions == 0 and stats.connected_since is not None:
+            stats.uptime += now - stats.connected_since
+            stats.connected_since = None
+
+def worker_stats_snapshot():
+    """Per-worker accounting for status_update (also drops long-gone workers)"""
+    now = time.time()
+    with inflight_lock:
+        for name in [n for n, w in worker_stats.items()
+                     if w.sessions == 0 and now - w.last_seen > WORKER_EXPIRY]:
+            del worker_stats[name]
+        return {name: w.snapshot(now) for name, w in worker_stats.items()}
+
+def _observe_latency(histogram, seconds):
+    ms = seconds * 1000
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if ms <= bound:
+            histogram[i] += 1
+            return
+    histogram[-1] += 1
+
+def track_share_submit(cid):
+    """Register a new share from XMRig and return its correlation id"""
+    global share_counter
+    with inflight_lock:
+        share_counter += 1
+        share_id = share_counter
+        label = client_label(cid)
+        inflight_shares[share_id] = {
+            'client': label,
+            'difficulty': current_difficulty,
+            'submitted_at': time.time(),
+            'sent_at': None,
+            'state': 'queued',
+        }
+        stats = _worker(label)
+        stats.submitted += 1
+        stats.last_seen = time.time()
+    return share_id
+
+def track_share_sent(share_id):
+    """Mark a share as sent to the proxy (call before the send so the answer can't race it)"""
+    with inflight_lock:
+        share = inflight_shares.get(share_id)
+        if share and share['state'] == 'queued':
+            share['state'] = 'sent'
+            share['sent_at'] = time.time()
+
+def track_share_queued(share_id):
+    """Put a share back in queued state after a failed send"""
+    with inflight_lock:
+        share = inflight_shares.get(share_id)
+        if share and share['state'] == 'sent':
+            share['state'] = 'queued'
+            share['sent_at'] = None
+
+def _oldest_share(state):
+    for share_id, share in inflight_shares.items():
+        if share['state'] == state:
+            return share_id
+    return None
+
+def track_share_result(msg):
+    """Resolve a share_result from the proxy. Returns (share_id, share) or (None, None)."""
+    global total_shares_valid, total_shares_rejected
+    with inflight_lock:
+        share_id = msg.get('id')
+        share = inflight_shares.get(share_id)
+        if share is None or share['state'] != 'sent':
+            share_id = _oldest_share('sent')
+            share = inflight_shares.get(share_id)
+        if share is None:
+            return None, None
+        
+        now = time.time()
+        stats = _worker(share['client'])
+        _observe_latency(stats.ack_latency, now - share['submitted_at'])
+        share['acked_at'] = now
+        
+        status = msg.get('status', '')
+        if status == 'submitted':
+            # Valid work, now waiting for the pool
+            share['state'] = 'pool'
+        elif status == 'error' and msg.get('reason') == 'low_difficulty':
+            # Met our target but not the pool's - the proxy still credits the work
+            del inflight_shares[share_id]
+        else:
+            stats.rejected += 1
+            total_shares_rejected += 1
+            del inflight_shares[share_id]
+            return share_id, share
+        stats.accepted += 1
+        total_shares_valid += 1
+        stats.share_times.append((now, share['difficulty']))
+    
+    with share_times_lock:
+        share_times.append((now, share['difficulty']))
+    return share_id, share
+
+def track_pool_accept():
+    """Resolve a hash_accepted from the proxy. Returns (share_id, share) or (None, None)."""
+    with inflight_lock:
+        share_id = _oldest_share('pool')
+        if share_id is None:
+            return None, None
+        share = inflight_shares.pop(share_id)
+        stats = _worker(share['client'])
+        stats.pool_accepted += 1
+        _observe_latency(stats.pool_latency, time.time() - share['submitted_at'])
+    return share_id, share
+
+def _expire_shares(is_expired):
+    expired = 0
+    with inflight_lock:
+        for share_id, share in list(inflight_shares.items()):
+            if is_expired(share):
+                _worker(share['client']).timeouts += 1
+                del inflight_shares[share_id]
+                expired += 1
+    return expired
+
+def expire_shares():
+    """Time out shares the proxy or pool never answered. Returns how many expired."""
+    now = time.time()
+    def is_expired(share):
+        if share['state'] == 'sent':
+            return now - share['sent_at'] > SHARE_ACK_TIMEOUT
+        if share['state'] == 'pool':
+            return now - share['acked_at'] > SHARE_POOL_TIMEOUT
+        return False
+    return _expire_shares(is_expired)
+
+def drop_unacked_shares():
+    """Answers for shares sent on a closed WebSocket will never arrive"""
+    return _expire_shares(lambda share: share['state'] == 'sent')
+
+# =============================================================================
+# TRACE RECORDING
+# =============================================================================
+# --record FILE writes both sides of the bridge's traffic to a gzipped
+# JSON-lines trace that replay.py can drive a bridge build with. The first
+# line is a header; every other line is one event:
+#   [seconds since start (monotonic), channel, session, direction, data]
+# channel is "ws" (session = connection number) or "stratum" (session =
+# client id, "*" for job broadcasts); direction is "in", "out", "open" or
+# "close". Events go through a queue so recording never blocks on disk.
+
+TRACE_FORMAT = 'bridge-trace'
+TRACE_VERSION = 1
+
+class TraceRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.start = time.monotonic()
+        self.events = queue.SimpleQueue()
+        self.file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=6)
+        self.file.write(json.dumps({
+            'format': TRACE_FORMAT,
+            'version': TRACE_VERSION,
+            'bridge': BRIDGE_VERSION,
+            'started': time.time(),
+        }) + '\n')
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+    
+    def record(self, channel, session, direction, data=None):
+        self.events.put([round(time.monotonic() - self.start, 6), channel, session, direction, data])
+    
+    def _writer(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            self.file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        self.file.close()
+    
+    def close(self):
+        self.events.put(None)
+        self.thread.join(timeout=5)
+
+def record(channel, session, direction, data=None):
+    if recorder is not None:
+        recorder.record(channel, session, direction, data)
+
+def ws_send(ws, text):
+    """Send a frame to the proxy (and record it)"""
+    record('ws', ws_session, 'out', text)
+    ws.send(text)
+
+def stratum_send(cid, sock, text):
+    """Send a line to an XMRig client (and record it)"""
+    record('stratum', cid, 'out', text)
+    sock.sendall(text.encode())
+
 # =============================================================================
 # WEBSOCKET CALLBACKS
 # =============================================================================
@@ -164,6 +553,7 @@ def on_ws_message(ws, message):
     """Handle message from proxy"""
     global current_job, current_difficulty, mining_paused, pool_suspended, total_shares_accepted
     
+    record('ws', ws_session, 'in', message)
     try:
         msg = json.loads(message)
         msg_type = msg.get('type')
@@ -182,15 +572,20 @@ def on_ws_message(ws, message):
             broadcast_job(job)
             
         elif msg_type == 'hash_accepted':
-            total_shares_accepted += 1
-            print(f"[WS] ✓ Share accepted by pool!")
+            share_id, share = track_pool_accept()
+            if share_id is not None:
+                total_shares_accepted += 1
+                latency = time.time() - share['submitted_at']
+                print(f"[WS] ✓ Share #{share_id} ({share['client']}) accepted by pool! ({latency:.1f}s)")
             
         elif msg_type == 'share_result':
             status = msg.get('status', '')
+            share_id, share = track_share_result(msg)
+            tag = f" #{share_id} ({share['client']}, {(share['acked_at'] - share['submitted_at']) * 1000:.0f} ms)" if share else ""
             if status == 'submitted':
-                print(f"[WS] Share submitted")
+                print(f"[WS] Share{tag} submitted")
             elif status == 'error':
-                print(f"[WS] Share error: {msg.get('reason')}")
+                print(f"[WS] Share{tag} error: {msg.get('reason')}")
         
         elif msg_type == 'pong':
             pass  # Keepalive response
@@ -198,13 +593,19 @@ def on_ws_message(ws, message):
         elif msg_type == 'command':
             action = msg.get('action', '')
             if action in ('stop', 'pause'):
+                was_paused = mining_paused
                 mining_paused = True
                 pool_suspended = (action == 'stop')
                 print(f"[WS] ⏸ Mining paused: {msg.get('reason', '')}")
+                if not was_paused:
+                    apply_pause()
             elif action in ('start', 'resume'):
+                was_paused = mining_paused
                 mining_paused = False
                 pool_suspended = False
                 print(f"[WS] ▶ Mining resumed")
+                if was_paused:
+                    apply_resume()
             elif action == 'kick':
                 print(f"[WS] Kicked by server")
                 os._exit(0)
@@ -222,27 +623,36 @@ def on_ws_close(ws, close_status_code, close_msg):
     with ws_lock:
         ws_connected = False
         ws_connection = None
+    record('ws', ws_session, 'close')
+    lost = drop_unacked_shares()
     print(f"[WS] Connection closed")
+    if lost:
+        print(f"[WS] {lost} share(s) sent without an answer counted as timed out")
 
 def on_ws_open(ws):
     """Handle WebSocket open"""
-    global ws_connected, ws_connection
+    global ws_connected, ws_connection, status_resync, ws_session
     with ws_lock:
         ws_connected = True
         ws_connection = ws
+        ws_session += 1
+    status_resync = True
+    record('ws', ws_session, 'open')
     print(f"[WS] ✓ Connected to proxy!")
     
     # Send auth
-    ws.send(json.dumps({'type': 'auth', 'params': {}}))
+    ws_send(ws, json.dumps({'type': 'auth', 'params': {}}))
     
     # Send any pending shares
     with pending_lock:
         while pending_shares:
             share = pending_shares.pop(0)
             try:
-                ws.send(json.dumps(share))
+                track_share_sent(share.get('id'))
+                ws_send(ws, json.dumps(share))
                 print(f"[WS] Sent queued share")
             except:
+                track_share_queued(share.get('id'))
                 pending_shares.insert(0, share)
                 break
 
@@ -277,16 +687,20 @@ def websocket_thread():
 # =============================================================================
 def send_to_proxy(msg):
     """Send a message to proxy, queue if disconnected"""
+    is_share = msg.get('type') == 'submit'
     with ws_lock:
         if ws_connected and ws_connection:
             try:
-                ws_connection.send(json.dumps(msg))
+                if is_share:
+                    track_share_sent(msg.get('id'))
+                ws_send(ws_connection, json.dumps(msg))
                 return True
             except:
                 pass
     
     # Queue for later
-    if msg.get('type') == 'submit':
+    if is_share:
+        track_share_queued(msg.get('id'))
         with pending_lock:
             pending_shares.append(msg)
         print(f"[WS] Share queued (WS disconnected)")
@@ -303,6 +717,7 @@ def broadcast_job(job):
         'params': job
     }) + '\n'
     data = msg.encode()
+    record('stratum', '*', 'out', msg)
     
     with xmrig_lock:
         dead_clients = []
@@ -313,22 +728,39 @@ def broadcast_job(job):
                 dead_clients.append(cid)
         for cid in dead_clients:
             del xmrig_clients[cid]
+    shard_broadcast('job', job)
 
 # =============================================================================
 # XMRIG CLIENT HANDLER
 # =============================================================================
-def handle_xmrig_client(client_sock, client_addr, cid):
-    """Handle a single XMRig connection"""
+def register_worker(cid, worker):
+    """Record the worker name a client logged in with"""
+    with xmrig_lock:
+        previous = xmrig_workers.get(cid)
+        xmrig_workers[cid] = worker
+    if previous != worker:
+        if previous:
+            worker_disconnected(previous)
+        worker_connected(worker)
+
+def handle_xmrig_client(client_sock, client_addr, cid, worker=None, buffer=b''):
+    """Handle a single XMRig connection (worker/buffer are set for sockets adopted in an upgrade)"""
     global total_shares_submitted
     
-    print(f"[Stratum] XMRig #{cid} connected from {client_addr}")
+    if worker is None:
+        print(f"[Stratum] XMRig #{cid} connected from {client_addr}")
+    record('stratum', cid, 'open', f"{client_addr[0]}:{client_addr[1]}")
     
     with xmrig_lock:
         xmrig_clients[cid] = client_sock
+        if worker:
+            xmrig_workers[cid] = worker
+    if worker:
+        worker_connected(worker)
+    shard_send('open', cid, worker)
     
-    buffer = b''
     try:
-        while running:
+        while running and not handing_over.is_set():
             try:
                 readable, _, _ = select.select([client_sock], [], [], 1.0)
                 if not readable:
@@ -344,6 +776,7 @@ def handle_xmrig_client(client_sock, client_addr, cid):
                     line = line.decode().strip()
                     if not line:
                         continue
+                    record('stratum', cid, 'in', line)
                     
                     try:
                         msg = json.loads(line)
@@ -351,6 +784,9 @@ def handle_xmrig_client(client_sock, client_addr, cid):
                         msg_id = msg.get('id')
                         
                         if method == 'login':
+                            worker = worker_identity(msg.get('params') or {}, cid)
+                            register_worker(cid, worker)
+                            shard_send('login', cid, worker)
                             with current_job_lock:
                                 job = current_job or {
                                     'job_id': 'waiting',
@@ -370,20 +806,32 @@ def handle_xmrig_client(client_sock, client_addr, cid):
                                 },
                                 'error': None
                             }) + '\n'
-                            client_sock.sendall(response.encode())
-                            print(f"[Stratum] #{cid} logged in")
+                            stratum_send(cid, client_sock, response)
+                            print(f"[Stratum] #{cid} logged in as {worker}")
                             
                         elif method == 'submit':
-                            with share_times_lock:
-                                share_times.append(time.time())
+                            if mining_paused:
+                                # Work finished just before the pause; the proxy doesn't want it
+                                count_paused_submit()
+                                response = json.dumps({
+                                    'id': msg_id,
+                                    'jsonrpc': '2.0',
+                                    'result': None,
+                                    'error': {'code': -1, 'message': 'Mining paused'}
+                                }) + '\n'
+                                stratum_send(cid, client_sock, response)
+                                continue
                             total_shares_submitted += 1
-                            update_hashrate()
                             
-                            ws_msg = {
-                                'type': 'submit',
-                                'params': msg.get('params', {})
-                            }
-                            send_to_proxy(ws_msg)
+                            if shard_conn is not None:
+                                shard_send('submit', cid, msg.get('params', {}))
+                            else:
+                                ws_msg = {
+                                    'type': 'submit',
+                                    'id': track_share_submit(cid),
+                                    'params': msg.get('params', {})
+                                }
+                                send_to_proxy(ws_msg)
                             
                             response = json.dumps({
                                 'id': msg_id,
@@ -391,7 +839,7 @@ def handle_xmrig_client(client_sock, client_addr, cid):
                                 'result': {'status': 'OK'},
                                 'error': None
                             }) + '\n'
-                            client_sock.sendall(response.encode())
+                            stratum_send(cid, client_sock, response)
                             
                         elif method == 'keepalived':
                             response = json.dumps({
@@ -400,7 +848,7 @@ def handle_xmrig_client(client_sock, client_addr, cid):
                                 'result': {'status': 'KEEPALIVED'},
                                 'error': None
                             }) + '\n'
-                            client_sock.sendall(response.encode())
+                            stratum_send(cid, client_sock, response)
                             
                     except json.JSONDecodeError:
                         pass
@@ -414,137 +862,786 @@ def handle_xmrig_client(client_sock, client_addr, cid):
     except Exception as e:
         print(f"[Stratum] #{cid} error: {e}")
     finally:
+        if handing_over.is_set():
+            # Keep the socket open: it goes to the new bridge with any unparsed bytes
+            with handover_lock:
+                parked_clients[cid] = buffer
+            return
         with xmrig_lock:
             if cid in xmrig_clients:
                 del xmrig_clients[cid]
+            worker = xmrig_workers.pop(cid, None)
+        if worker:
+            worker_disconnected(worker)
+        shard_send('close', cid, None)
         try:
             client_sock.close()
         except:
             pass
+        record('stratum', cid, 'close')
         print(f"[Stratum] #{cid} disconnected")
 
+# =============================================================================
+# PAUSE PROPAGATION
+# =============================================================================
+# A proxy pause/stop has to stop hashing, not just be reported:
+# - with --xmrig-api, XMRig is paused through its HTTP API. Threads and the
+#   RandomX dataset stay allocated, so resume restarts work immediately. The
+#   control thread re-applies the pause if XMRig comes back unpaused (restart).
+#   The bridge only acts on proxy pause/resume transitions and records its
+#   pause as the 'proxy' hold (--pause-holds, shared with miner.py): a resume
+#   leaves XMRig paused while another holder (the thermal cutoff) remains, and
+#   the bridge never resumes a pause it didn't start.
+# - without it, rigs are disconnected and new logins are closed until resume.
+#   XMRig stops hashing when it has no pool and reconnects on its retry timer
+#   (--retry-pause, 5 s by default), so resume takes up to that long.
+# Submits that arrive while paused are answered with an error and dropped.
+
+def holding_rigs():
+    return mining_paused and xmrig_api is None
+
+def count_paused_submit():
+    global paused_submits
+    with inflight_lock:
+        paused_submits += 1
+
+def apply_pause():
+    global paused_at, pause_cpu
+    paused_at = time.time()
+    pause_cpu = LoadSampler(allowed_cpus())
+    pause_cpu.sample()
+    shard_broadcast('pause', True)
+    if xmrig_api:
+        pause_changed.set()
+        return
+    with xmrig_lock:
+        socks = list(xmrig_clients.values())
+    for sock in socks:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    if socks:
+        print(f"[Pause] Disconnected {len(socks)} rig(s); holding logins until resume")
+
+def apply_resume():
+    paused_for = time.time() - paused_at if paused_at else 0
+    busy = pause_cpu.sample() if pause_cpu else None
+    with inflight_lock:
+        dropped = paused_submits
+    cpu = f", CPU busy {busy:.2f} cores (whole machine)" if busy is not None else ""
+    print(f"[Pause] Paused for {paused_for:.0f}s{cpu}, {dropped} submit(s) dropped so far")
+    shard_broadcast('pause', False)
+    if xmrig_api:
+        pause_changed.set()
+
+def api_pause_step(want_paused, changed):
+    """One pass of the pause control: hold/release on a proxy transition, re-pause after a restart"""
+    held = 'proxy' in pause_holds.holders()
+    if changed and want_paused and not held:
+        pause_holds.hold('proxy')
+    elif changed and not want_paused and held:
+        others = pause_holds.release('proxy')
+        if others:
+            print(f"[Pause] Proxy resumed; XMRig stays paused for: {', '.join(sorted(others))}")
+            return None
+        return 'resume'
+    if not pause_holds.holders():
+        return None    # Nobody holds it: whatever XMRig is doing isn't ours to change
+    is_paused = xmrig_api.is_paused()
+    return 'pause' if is_paused is False else None
+
+def pause_control_thread():
+    """Apply the proxy's pause/resume to XMRig, without overriding other pause holders"""
+    while running:
+        changed = pause_changed.wait(STATUS_SAMPLE_INTERVAL)
+        pause_changed.clear()
+        action = api_pause_step(mining_paused, changed)
+        if action is None:
+            continue
+        start = time.time()
+        ok = xmrig_api.pause() if action == 'pause' else xmrig_api.resume()
+        elapsed = (time.time() - start) * 1000
+        if ok:
+            print(f"[Pause] XMRig {action}d via API ({elapsed:.0f} ms)")
+        else:
+            print(f"[Pause] XMRig API {action} failed")
+
 # =============================================================================
 # STRATUM SERVER THREAD
 # =============================================================================
-def stratum_server_thread():
-    """Local stratum server that XMRig connects to"""
-    global client_counter, running
+def stratum_server_thread(bind_host=BIND_HOST, port=LOCAL_PORT, backlog=LISTEN_BACKLOG, server_sock=None,
+                          reuse_port=False):
+    """Local stratum server that XMRig connects to (server_sock: listening socket from an upgrade)"""
+    global client_counter, running, stratum_server_sock
     
-    server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    server_sock.bind(('127.0.0.1', LOCAL_PORT))
-    server_sock.listen(5)
+    if server_sock is None:
+        server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            # Every shard binds the port; the kernel spreads new connections across them
+            server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server_sock.bind((bind_host, port))
+        server_sock.listen(backlog)
+        print(f"[Stratum] Server listening on {bind_host}:{port} (backlog {backlog})")
+    else:
+        print(f"[Stratum] Serving the listening socket handed over by the previous bridge")
     server_sock.settimeout(1.0)
+    stratum_server_sock = server_sock
     
-    print(f"[Stratum] Server listening on 127.0.0.1:{LOCAL_PORT}")
-    
-    while running:
+    while running and not handing_over.is_set():
         try:
             client_sock, client_addr = server_sock.accept()
+            if holding_rigs():
+                # Paused without an API: XMRig stops hashing while it has no pool
+                client_sock.close()
+                continue
             client_sock.settimeout(30)
             client_counter += 1
             cid = client_counter
             
-            t = threading.Thread(target=handle_xmrig_client, args=(client_sock, client_addr, cid), daemon=True)
+            t = threading.Thread(target=handle_xmrig_client, args=(client_sock, client_addr, cid),
+                                 name='xmrig-client', daemon=True)
             t.start()
         except socket.timeout:
             continue
         except Exception as e:
             print(f"[Stratum] Accept error: {e}")
     
-    server_sock.close()
+    if handing_over.is_set():
+        # Connections waiting in the backlog are accepted by the new bridge
+        server_parked.set()
+    else:
+        server_sock.close()
+
+# =============================================================================
+# SHARDING (--workers)
+# =============================================================================
+# One JSON parser and one core per process limits a single bridge to a few
+# thousand rigs. With --workers N:
+# - N shard processes each bind the stratum port with SO_REUSEPORT and run the
+#   normal client handlers; the kernel balances new connections between them
+# - the coordinator (main process) keeps the only proxy WebSocket, so the pool
+#   still sees one combined worker, plus all share tracking and status
+# - jobs and pause state go coordinator -> shards over a pipe per shard, once
+#   per shard rather than once per rig; logins, submits and disconnects come back
+# Shards exit when the coordinator's end of their pipe closes.
+
+def shard_send(kind, cid, data):
+    """In a shard: report a client event to the coordinator (no-op otherwise)"""
+    if shard_conn is None:
+        return
+    with shard_send_lock:
+        shard_conn.send((kind, cid, data))
+
+def shard_broadcast(kind, data):
+    """In the coordinator: send a command to every shard"""
+    for conn in list(shard_pipes):
+        try:
+            conn.send((kind, data))
+        except (OSError, ValueError):
+            shard_pipes.remove(conn)
+
+def shard_reader_thread(index, conn):
+    """Coordinator: apply one shard's client events"""
+    global total_shares_submitted
+    while running:
+        try:
+            kind, cid, data = conn.recv()
+        except (EOFError, OSError):
+            print(f"[Shard {index}] Exited")
+            break
+        if kind == 'open':
+            with xmrig_lock:
+                shard_clients[cid] = index
+            if data:
+                register_worker(cid, data)
+        elif kind == 'login':
+            register_worker(cid, data)
+        elif kind == 'submit':
+            total_shares_submitted += 1
+            send_to_proxy({'type': 'submit', 'id': track_share_submit(cid), 'params': data})
+        elif kind == 'close':
+            with xmrig_lock:
+                shard_clients.pop(cid, None)
+                worker = xmrig_workers.pop(cid, None)
+            if worker:
+                worker_disconnected(worker)
+    with xmrig_lock:
+        gone = [cid for cid, i in shard_clients.items() if i == index]
+        for cid in gone:
+            del shard_clients[cid]
+    for cid in gone:
+        with xmrig_lock:
+            worker = xmrig_workers.pop(cid, None)
+        if worker:
+            worker_disconnected(worker)
+
+def shard_main(index, conn, bind_host, port, backlog):
+    """Shard process: serve rigs on the shared port, follow the coordinator's commands"""
+    global shard_conn, client_counter, recorder, current_job, current_difficulty, mining_paused
+    shard_conn = conn
+    # Forked with the coordinator's ends of the earlier shards' pipes: drop them, or
+    # broadcast_job()/apply_pause() here would send to those shards a second time
+    for inherited in shard_pipes:
+        inherited.close()
+    shard_pipes.clear()
+    client_counter = index * SHARD_CID_SPAN
+    recorder = None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)   # Ctrl+C is handled by the coordinator
+    threading.Thread(target=stratum_server_thread, args=(bind_host, port, backlog, None, True),
+                     name='stratum-server', daemon=True).start()
+    while True:
+        try:
+            kind, data = conn.recv()
+        except (EOFError, OSError):
+            break
+        if kind == 'job':
+            with current_job_lock:
+                current_job = data
+            if data.get('target'):
+                current_difficulty = target_to_difficulty(data['target'])
+            broadcast_job(data)
+        elif kind == 'pause':
+            mining_paused = data
+            if data:
+                apply_pause()
+    os._exit(0)
+
+def start_shards(count, bind_host, port, backlog):
+    """Fork the shard processes (before any other thread starts)"""
+    ctx = multiprocessing.get_context('fork')
+    for index in range(1, count + 1):
+        parent, child = ctx.Pipe()
+        process = ctx.Process(target=shard_main, args=(index, child, bind_host, port, backlog),
+                              name=f'bridge-shard-{index}', daemon=True)
+        process.start()
+        child.close()
+        shard_pipes.append(parent)
+        threading.Thread(target=shard_reader_thread, args=(index, parent),
+                         name=f'shard-{index}', daemon=True).start()
+
+# =============================================================================
+# ZERO-DOWNTIME UPGRADE
+# =============================================================================
+# The running bridge listens on a Unix socket (upgrade.socket_path(port)).
+# A bridge started with --upgrade connects to it and the old one:
+# - stops accepting and parks every client reader (sockets stay open; bytes
+#   that arrive meanwhile wait in the kernel for the new bridge)
+# - waits up to HANDOVER_DRAIN for answers to shares already sent
+# - sends the listening socket, the client sockets (SCM_RIGHTS) and the job,
+#   queued/pool-pending shares, counters and pause state
+# - exits once the new bridge acknowledges, or resumes serving if it doesn't
+# Rigs keep their TCP connection and job throughout.
+
+def _shares_awaiting_ack():
+    with inflight_lock:
+        return sum(1 for share in inflight_shares.values() if share['state'] == 'sent')
+
+def handover_state():
+    """(state dict, sockets) to send: listening socket first, then parked clients"""
+    with current_job_lock:
+        job = current_job
+    with inflight_lock:
+        shares = {str(k): v for k, v in inflight_shares.items() if v['state'] != 'sent'}
+        counter = share_counter
+    with pending_lock:
+        pending = list(pending_shares)
+    with handover_lock:
+        parked = dict(parked_clients)
+    clients, socks = [], [stratum_server_sock]
+    with xmrig_lock:
+        for cid, buffer in parked.items():
+            if cid in xmrig_clients:
+                clients.append({'cid': cid, 'worker': xmrig_workers.get(cid), 'buffer': buffer.decode('latin-1')})
+                socks.append(xmrig_clients[cid])
+    state = {
+        'bridge': BRIDGE_VERSION,
+        'job': job,
+        'difficulty': current_difficulty,
+        'clientCounter': client_counter,
+        'shareCounter': counter,
+        'inflight': shares,
+        'pending': pending,
+        'clients': clients,
+        'paused': mining_paused,
+        'suspended': pool_suspended,
+        'totals': [total_shares_submitted, total_shares_accepted, total_shares_valid, total_shares_rejected],
+    }
+    return state, socks
+
+def adopt_state(state):
+    """New bridge: take over the previous bridge's job, shares and counters"""
+    global current_job, current_difficulty, client_counter, share_counter, mining_paused, pool_suspended
+    global total_shares_submitted, total_shares_accepted, total_shares_valid, total_shares_rejected
+    with current_job_lock:
+        current_job = state['job']
+    current_difficulty = state['difficulty']
+    client_counter = state['clientCounter']
+    with inflight_lock:
+        share_counter = state['shareCounter']
+        inflight_shares.update({int(k): v for k, v in state['inflight'].items()})
+    with pending_lock:
+        pending_shares.extend(state['pending'])
+    mining_paused, pool_suspended = state['paused'], state['suspended']
+    (total_shares_submitted, total_shares_accepted,
+     total_shares_valid, total_shares_rejected) = state['totals']
+
+def start_client(sock, cid, worker=None, buffer=b''):
+    try:
+        addr = sock.getpeername()
+    except OSError:
+        sock.close()
+        return
+    sock.settimeout(30)
+    threading.Thread(target=handle_xmrig_client, args=(sock, addr, cid, worker, buffer),
+                     name='xmrig-client', daemon=True).start()
+
+def resume_after_failed_handover():
+    """Old bridge: the new one never confirmed, so keep serving everything"""
+    with handover_lock:
+        parked = dict(parked_clients)
+        parked_clients.clear()
+    handing_over.clear()
+    server_parked.clear()
+    with xmrig_lock:
+        socks = {cid: xmrig_clients.get(cid) for cid in parked}
+    for cid, buffer in parked.items():
+        if socks[cid] is not None:
+            # worker=None: the worker session was never closed, xmrig_workers still has it
+            start_client(socks[cid], cid, None, buffer)
+    threading.Thread(target=stratum_server_thread, kwargs={'server_sock': stratum_server_sock},
+                     name='stratum-server', daemon=True).start()
+
+def perform_handover(conn):
+    """Old bridge: pass everything to the new bridge on `conn`. True if it took over."""
+    global history_writer
+    print("[Upgrade] New bridge requested a handover")
+    handing_over.set()
+    server_parked.wait(3)
+    deadline = time.time() + 3
+    while time.time() < deadline:
+        with xmrig_lock, handover_lock:
+            if set(xmrig_clients) <= set(parked_clients):
+                break
+        time.sleep(0.05)
+    deadline = time.time() + HANDOVER_DRAIN
+    while _shares_awaiting_ack() and time.time() < deadline:
+        time.sleep(0.05)
+    
+    # The new bridge opens bridge.bin once it has the state: release it first
+    history_path = None
+    if history_writer:
+        history_path = history_writer.store.path
+        history_writer.close()
+    state, socks = handover_state()
+    try:
+        upgrade.send_handover(conn, state, socks)
+        ok = upgrade.wait_for_ack(conn)
+    except OSError as e:
+        print(f"[Upgrade] Handover error: {e}")
+        ok = False
+    if not ok:
+        print("[Upgrade] New bridge did not take over - carrying on")
+        if history_path:
+            try:
+                history_writer = HistoryWriter(history_path)
+            except (OSError, ValueError) as e:
+                print(f"[History] Disabled: {e}")
+        resume_after_failed_handover()
+        return False
+    
+    # The new bridge has its own descriptors; close ours without shutdown()
+    with xmrig_lock:
+        xmrig_clients.clear()
+    for sock in socks:
+        sock.close()
+    lost = drop_unacked_shares()
+    print(f"[Upgrade] Handed over {len(state['clients'])} rig(s), "
+          f"{len(state['pending'])} queued share(s)" + (f", {lost} unanswered share(s) dropped" if lost else ""))
+    handed_over.set()
+    return True
+
+def upgrade_listener_thread(path):
+    """Wait for a newer bridge started with --upgrade"""
+    try:
+        server = upgrade.listen(path)
+    except OSError as e:
+        print(f"[Upgrade] Can't listen on {path}: {e}")
+        return
+    server.settimeout(1.0)
+    while running and not handed_over.is_set():
+        try:
+            conn, _ = server.accept()
+        except socket.timeout:
+            continue
+        except OSError:
+            break
+        try:
+            conn.settimeout(upgrade.HANDOVER_TIMEOUT)
+            if conn.recv(1) == b'T':
+                perform_handover(conn)
+        except OSError as e:
+            print(f"[Upgrade] Handover error: {e}")
+        finally:
+            conn.close()
+    server.close()
+    if not handed_over.is_set():
+        # The new bridge already bound its own socket at this path
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
 
 # =============================================================================
 # STATUS UPDATER THREAD
 # =============================================================================
+# Status is reported by change instead of a full snapshot every 10 seconds:
+# - significant changes (status, temperature band, client count) go out at once
+# - minor changes (hashrate, counters, workers) are batched for STATUS_MIN_INTERVAL
+# - only the fields that changed are sent; the proxy applies fields one by one
+# - when nothing changed, an empty status_update goes out every
+#   STATUS_HEARTBEAT_INTERVAL as the keepalive (proxy drops bridges after 60s)
+# - after a reconnect the next update is a full snapshot
+
+def get_status():
+    if pool_suspended:
+        return "pool-suspended"
+    if mining_paused:
+        return "paused"
+    if current_temp and current_temp >= TEMP_STOP:
+        return "temp-stop"
+    if current_temp and current_temp >= TEMP_THROTTLE:
+        return "temp-throttle"
+    return "mining"
+
+def temp_band(temp):
+    if temp is None:
+        return None
+    if temp >= TEMP_STOP:
+        return 'stop'
+    if temp >= TEMP_THROTTLE:
+        return 'throttle'
+    return 'ok'
+
+def _round(value, digits):
+    return round(value, digits) if value is not None else None
+
+def build_status():
+    """Full status snapshot"""
+    with xmrig_lock:
+        active_clients = len(xmrig_clients) + len(shard_clients)
+    with pending_lock:
+        pending_count = len(pending_shares)
+    
+    return {
+        'status': get_status(),
+        'temperature': current_temp,
+        'hashrate': current_hashrate,
+        'power': _round(current_watts, 1),
+        'hashesPerJoule': _round(hashes_per_joule(current_hashrate, current_watts), 3),
+        'hugePages': current_huge_pages,
+        'activeClients': active_clients,
+        'pendingShares': pending_count,
+        'totalSubmitted': total_shares_submitted,
+        'totalAccepted': total_shares_accepted,
+        'workers': worker_stats_snapshot(),
+        'latencyBucketsMs': list(LATENCY_BUCKETS_MS),
+        'version': BRIDGE_VERSION
+    }
+
+def _hashrate_changed(old, new):
+    if old is None or new is None:
+        return old != new
+    return abs(new - old) > max(old, new) * HASHRATE_CHANGE
+
+def _worker_changed(old, new):
+    if old is None:
+        return True
+    for key, value in new.items():
+        if key == 'hashrate':
+            if _hashrate_changed(old.get(key), value):
+                return True
+        elif key != 'uptime' and old.get(key) != value:
+            return True
+    return False
+
+def status_delta(last, current):
+    """Fields of current that changed since last. Returns (delta, significant)."""
+    delta = {}
+    significant = False
+    for key, value in current.items():
+        old = last.get(key)
+        if key in ('hashrate', 'power', 'hashesPerJoule'):
+            changed = _hashrate_changed(old, value)
+        elif key == 'temperature':
+            band_changed = temp_band(old) != temp_band(value)
+            changed = band_changed or (old is None) != (value is None) or (
+                value is not None and abs(value - old) >= TEMP_CHANGE)
+            significant |= band_changed
+        elif key == 'workers':
+            old = old or {}
+            value = {name: w for name, w in value.items() if _worker_changed(old.get(name), w)}
+            changed = bool(value)
+        else:
+            changed = key not in last or old != value
+            significant |= changed and key in ('status', 'activeClients')
+        if changed:
+            delta[key] = value
+    return delta, significant
+
+def _merge_status(last, delta):
+    merged = dict(last)
+    for key, value in delta.items():
+        if key == 'workers':
+            merged[key] = {**last.get(key, {}), **value}
+        else:
+            merged[key] = value
+    return merged
+
+def status_step(last_sent, last_send_time, current, now):
+    """What the status updater sends for this sample: (kind, params) or (None, None)"""
+    if last_sent:
+        delta, significant = status_delta(last_sent, current)
+    else:
+        delta, significant = current, True
+    if delta and (significant or not last_sent or now - last_send_time >= STATUS_MIN_INTERVAL):
+        return ('full' if not last_sent else 'delta'), delta
+    if now - last_send_time >= STATUS_HEARTBEAT_INTERVAL:
+        return 'heartbeat', {}
+    return None, None
+
+def count_status_message(kind):
+    with status_stats_lock:
+        status_messages[kind] = status_messages.get(kind, 0) + 1
+
+def status_message_rate():
+    """Status/keepalive messages per hour since start, vs. the old fixed timers"""
+    hours = max(time.time() - bridge_start_time, 1) / 3600
+    with status_stats_lock:
+        total = sum(status_messages.values())
+    return total / hours
+
 def status_updater_thread():
-    """Send status updates to proxy every 10 seconds"""
-    global current_temp, running
+    """Report status to proxy when it changes, with a heartbeat when it doesn't"""
+    global current_temp, current_watts, current_huge_pages, running, status_resync
+    
+    last_sent = {}
+    last_send_time = 0
+    last_temp_time = 0
+    last_rate_report = time.time()
     
     while running:
-        time.sleep(10)
+        time.sleep(STATUS_SAMPLE_INTERVAL)
+        now = time.time()
         
-        current_temp = get_cpu_temp()
+        if now - last_temp_time >= TEMP_SAMPLE_INTERVAL:
+            current_temp = get_cpu_temp()
+            if power_sampler:
+                current_watts = power_sampler.sample()
+            if xmrig_api:
+                current_huge_pages = huge_pages_from_summary(xmrig_api.summary()) or current_huge_pages
+            last_temp_time = now
+        expire_shares()
         update_hashrate()
+        if history_writer:
+            history_writer.record(current_hashrate, current_temp, current_watts,
+                                  total_shares_valid, total_shares_submitted, total_shares_rejected, now)
         
-        if pool_suspended:
-            status = "pool-suspended"
-        elif mining_paused:
-            status = "paused"
-        elif current_temp and current_temp >= TEMP_STOP:
-            status = "temp-stop"
-        elif current_temp and current_temp >= TEMP_THROTTLE:
-            status = "temp-throttle"
-        else:
-            status = "mining"
-        
-        with xmrig_lock:
-            active_clients = len(xmrig_clients)
-        with pending_lock:
-            pending_count = len(pending_shares)
+        current = build_status()
+        if status_resync:
+            status_resync = False
+            last_sent = {}
+        kind, params = status_step(last_sent, last_send_time, current, now)
+        if kind and send_to_proxy({'type': 'status_update', 'params': params}):
+            count_status_message(kind)
+            last_sent = _merge_status(last_sent, params)
+            last_send_time = now
         
-        send_to_proxy({
-            'type': 'status_update',
-            'params': {
-                'status': status,
-                'temperature': current_temp,
-                'hashrate': current_hashrate,
-                'activeClients': active_clients,
-                'pendingShares': pending_count,
-                'totalSubmitted': total_shares_submitted,
-                'version': BRIDGE_VERSION
-            }
-        })
-
-# =============================================================================
-# KEEPALIVE PINGER THREAD
-# =============================================================================
-def keepalive_thread():
-    """Send ping to proxy every 10 seconds"""
-    global running
-    
-    while running:
-        time.sleep(10)
-        send_to_proxy({'type': 'ping'})
+        if now - last_rate_report >= STATUS_RATE_REPORT_INTERVAL:
+            last_rate_report = now
+            rate = status_message_rate()
+            print(f"[Status] {rate:.0f} msgs/hour (fixed timers: {LEGACY_STATUS_RATE}/hour, "
+                  f"{100 - rate * 100 / LEGACY_STATUS_RATE:.0f}% fewer)")
 
 # =============================================================================
 # MAIN
 # =============================================================================
-def main():
-    global running
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket-to-Stratum bridge for native miners")
+    parser.add_argument('--lan', action='store_true',
+                        help=f"LAN farm mode: listen on {LAN_BIND_HOST} with a large backlog")
+    parser.add_argument('--bind', help=f"Address to listen on (default {BIND_HOST})")
+    parser.add_argument('--port', type=int, default=LOCAL_PORT, help=f"Stratum port (default {LOCAL_PORT})")
+    parser.add_argument('--backlog', type=int,
+                        help=f"Listen backlog (default {LISTEN_BACKLOG}, {LAN_LISTEN_BACKLOG} with --lan)")
+    parser.add_argument('--proxy-url', default=PROXY_WS_URL, help="Proxy WebSocket URL")
+    parser.add_argument('--record', metavar='FILE',
+                        help="Record proxy and stratum traffic to a trace file (replay with replay.py)")
+    parser.add_argument('--history-port', type=int, default=HISTORY_PORT,
+                        help=f"Serve history on 127.0.0.1:PORT (default {HISTORY_PORT}, 0 = off)")
+    parser.add_argument('--no-history', action='store_true',
+                        help="Don't record history (test harnesses)")
+    parser.add_argument('--xmrig-api', metavar='URL',
+                        help="XMRig HTTP API (e.g. http://127.0.0.1:3334) used to pause/resume it in place")
+    parser.add_argument('--xmrig-token', help="XMRig --http-access-token")
+    parser.add_argument('--pause-holds', metavar='DIR',
+                        help="Directory of pause holders shared with miner.py (default: this process only)")
+    parser.add_argument('--workers', type=int, default=0, metavar='N',
+                        help="Serve rigs from N processes sharing the port (Linux SO_REUSEPORT)")
+    parser.add_argument('--upgrade', action='store_true',
+                        help="Take over sockets and state from the bridge running on --port (Unix)")
+    parser.add_argument('--diagnostics', action='store_true',
+                        help="Instrument locks, dump stacks on SIGUSR1 and profile (or BRIDGE_DIAGNOSTICS=1)")
+    parser.add_argument('--profile-out', default='bridge-profile.folded', metavar='FILE',
+                        help="Collapsed stacks written on exit in diagnostics mode")
+    parser.add_argument('--profile-hz', type=float, default=1 / diagnostics.PROFILE_INTERVAL,
+                        help=f"Profiler samples per second (default {1 / diagnostics.PROFILE_INTERVAL:g})")
+    parser.add_argument('--profile-threads', metavar='NAMES',
+                        help="Only profile these threads, e.g. websocket,status (default: all, "
+                             "including one xmrig-client per rig)")
+    args = parser.parse_args(argv)
+    if args.bind is None:
+        args.bind = LAN_BIND_HOST if args.lan else BIND_HOST
+    if args.backlog is None:
+        args.backlog = LAN_LISTEN_BACKLOG if args.lan else LISTEN_BACKLOG
+    return args
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+def main(argv=None):
+    global running, recorder, power_sampler, history_writer, xmrig_api, pause_holds, PROXY_WS_URL
+    
+    args = parse_args(argv)
+    PROXY_WS_URL = args.proxy_url
+    if args.workers and (not hasattr(socket, 'SO_REUSEPORT') or args.upgrade):
+        print("[Shard] --workers needs SO_REUSEPORT (Linux) and can't be combined with --upgrade")
+        return 1
+    if args.xmrig_api:
+        xmrig_api = XmrigApi(args.xmrig_api, args.xmrig_token)
+        pause_holds = PauseHolds(args.pause_holds)
+    if args.workers:
+        # Fork first: shards must not inherit the recorder, history or profiler threads
+        start_shards(args.workers, args.bind, args.port, args.backlog)
+    if args.record:
+        recorder = TraceRecorder(args.record)
+    power_sampler = PowerSampler()
+    profile_threads = args.profile_threads.split(',') if args.profile_threads else None
+    profiler = diagnostics.start(True, 1 / args.profile_hz, profile_threads) if diagnostics.ENABLED else None
+    
+    handover = None
+    if args.upgrade:
+        if not upgrade.supported():
+            print("[Upgrade] Socket handover needs a Unix system and Python 3.9+")
+            return 1
+        try:
+            conn, state, socks = upgrade.request_handover(upgrade.socket_path(args.port))
+        except (OSError, ValueError) as e:
+            print(f"[Upgrade] No bridge to take over on port {args.port}: {e}")
+            return 1
+        adopt_state(state)
+        handover = (conn, state, socks)
+        print(f"[Upgrade] Took over {len(state['clients'])} rig(s) from bridge v{state['bridge']}")
+    
+    history_server = None
+    if not args.no_history:
+        # With --upgrade the old bridge closed bridge.bin before sending its state
+        try:
+            history_writer = HistoryWriter(os.path.join(HISTORY_DIR, 'bridge.bin'))
+        except (OSError, ValueError) as e:
+            print(f"[History] Disabled: {e}")
+        if args.history_port and not handover:
+            history_server = start_server(HISTORY_DIR, '127.0.0.1', args.history_port)
     
     print("=" * 60)
     print(f"  WebSocket-to-Stratum Bridge v{BRIDGE_VERSION}")
     print("=" * 60)
     print(f"  Client ID: {BRIDGE_CLIENT_ID}")
     print(f"  Proxy: {PROXY_WS_URL[:50]}...")
-    print(f"  Local Stratum: stratum+tcp://127.0.0.1:{LOCAL_PORT}")
+    print(f"  Local Stratum: stratum+tcp://{args.bind}:{args.port}")
+    if args.lan:
+        print(f"  LAN farm mode: rigs identified by stratum login/pass (or rig-id)")
+    if args.workers:
+        print(f"  Sharded: {args.workers} stratum processes on port {args.port}")
+    if recorder:
+        print(f"  Recording traffic to: {args.record}")
+    if history_server:
+        print(f"  History: http://127.0.0.1:{args.history_port}/history")
+    if xmrig_api:
+        print(f"  Pause/resume XMRig via API: {args.xmrig_api}")
+    else:
+        print("  No --xmrig-api: pause disconnects rigs; resume waits for XMRig's reconnect (~5s)")
+    if diagnostics.ENABLED:
+        print(f"  Diagnostics: kill -USR1 {os.getpid()} dumps stacks; profile -> {args.profile_out}")
     print("=" * 60)
     print()
     print("  XMRig connects to local bridge - ALWAYS stays connected")
     print("  WebSocket to proxy reconnects automatically in background")
     print()
     
+    server_sock = handover[2][0] if handover else None
     threads = [
-        threading.Thread(target=stratum_server_thread, daemon=True),
-        threading.Thread(target=websocket_thread, daemon=True),
-        threading.Thread(target=status_updater_thread, daemon=True),
-        threading.Thread(target=keepalive_thread, daemon=True),
+        threading.Thread(target=websocket_thread, name='websocket', daemon=True),
+        threading.Thread(target=status_updater_thread, name='status', daemon=True),
     ]
+    if not args.workers:
+        threads.append(threading.Thread(target=stratum_server_thread,
+                                        args=(args.bind, args.port, args.backlog, server_sock),
+                                        name='stratum-server', daemon=True))
+    if xmrig_api:
+        threads.append(threading.Thread(target=pause_control_thread, name='pause-control', daemon=True))
     
     for t in threads:
         t.start()
     
+    if handover:
+        conn, state, socks = handover
+        for info, sock in zip(state['clients'], socks[1:]):
+            start_client(sock, info['cid'], info['worker'], info['buffer'].encode('latin-1'))
+        upgrade.ack(conn)
+        if args.history_port and not args.no_history:
+            history_server = start_server(HISTORY_DIR, '127.0.0.1', args.history_port, wait=10)
+    if upgrade.supported() and not args.workers:
+        threading.Thread(target=upgrade_listener_thread, args=(upgrade.socket_path(args.port),),
+                         name='upgrade', daemon=True).start()
+    
+    # miner.py and replay.py stop the bridge with terminate(); shut down cleanly
+    signal.signal(signal.SIGTERM, _terminate)
+    
     try:
-        while True:
-            time.sleep(1)
+        while not handed_over.wait(1):
+            pass
+        print("\n[Bridge] Handed over to the new bridge, exiting...")
     except KeyboardInterrupt:
         print("\n[Bridge] Shutting down...")
-        running = False
-        time.sleep(1)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)   # Finish flushing history/trace
+    if history_server:
+        # Free the port for the new bridge
+        history_server.shutdown()
+        history_server.server_close()
+    with status_stats_lock:
+        counts = dict(status_messages)
+    print(f"[Status] Sent {counts} - {status_message_rate():.0f} msgs/hour "
+          f"(fixed timers: {LEGACY_STATUS_RATE}/hour)")
+    running = False
+    if handed_over.is_set() and ws_connection:
+        ws_connection.close()
+    time.sleep(1)
+    if history_writer:
+        history_writer.close()
+    if recorder:
+        recorder.close()
+        print(f"[Bridge] Trace saved to {recorder.path}")
+    if diagnostics.ENABLED:
+        profiler.stop()
+        profiler.write(args.profile_out)
+        print(f"[Diagnostics] {profiler.samples} samples written to {args.profile_out}")
+        print("\n".join(diagnostics.lock_report()))
+    return 0
 
 if __name__ == '__main__':
     print()
     print(f"[Bridge v{BRIDGE_VERSION}] Starting...")
     print()
-    main()
+    sys.exit(main())
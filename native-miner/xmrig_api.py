@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+XMRig HTTP API Client
+Pauses and resumes a running XMRig without restarting it (the RandomX
+dataset stays in memory, so work restarts immediately) and reads its summary.
+
+XMRig must be started with the HTTP API and write access:
+  xmrig --http-host 127.0.0.1 --http-port 3334 --http-access-token <token> --http-no-restricted
+
+Several processes may pause the same XMRig (the bridge for a proxy pause,
+miner.py for the thermal cutoff). PauseHolds records who holds it paused as
+one file per holder in a shared directory; a holder that lets go only
+resumes XMRig when nobody else still holds it.
+
+Usage:
+  python xmrig_api.py http://127.0.0.1:3334 <token> pause|resume|summary
+"""
+
+import os
+import sys
+import json
+import urllib.request
+
+API_TIMEOUT = 2   # Seconds; the API is local and answers in milliseconds
+
+class XmrigApi:
+    def __init__(self, url, token=None):
+        self.url = url.rstrip('/')
+        self.token = token
+
+    def _request(self, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.url + path, data=data)
+        req.add_header('Content-Type', 'application/json')
+        if self.token:
+            req.add_header('Authorization', f'Bearer {self.token}')
+        with urllib.request.urlopen(req, timeout=API_TIMEOUT) as resp:
+            return json.loads(resp.read().decode() or 'null')
+
+    def _rpc(self, method):
+        reply = self._request('/json_rpc', {'jsonrpc': '2.0', 'id': 1, 'method': method})
+        if reply and reply.get('error'):
+            raise RuntimeError(reply['error'].get('message', 'XMRig API error'))
+        return reply
+
+    def pause(self):
+        """Stop hashing; threads and dataset stay allocated. True on success."""
+        try:
+            self._rpc('pause')
+            return True
+        except Exception:
+            return False
+
+    def resume(self):
+        try:
+            self._rpc('resume')
+            return True
+        except Exception:
+            return False
+
+    def summary(self):
+        """GET /2/summary as a dict, or None if XMRig isn't reachable"""
+        try:
+            return self._request('/2/summary')
+        except Exception:
+            return None
+
+    def is_paused(self):
+        """True/False from the summary, None if unknown"""
+        summary = self.summary()
+        return summary.get('paused') if summary else None
+
+class PauseHolds:
+    """Who is holding XMRig paused; shared through `directory`, in-process if None"""
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.local = set()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def hold(self, owner):
+        self.local.add(owner)
+        if self.directory:
+            with open(os.path.join(self.directory, owner), 'w'):
+                pass
+
+    def release(self, owner):
+        """Drop `owner`'s hold; returns the holders that remain"""
+        self.local.discard(owner)
+        if self.directory:
+            try:
+                os.remove(os.path.join(self.directory, owner))
+            except OSError:
+                pass
+        return self.holders()
+
+    def holders(self):
+        if not self.directory:
+            return set(self.local)
+        try:
+            return set(os.listdir(self.directory))
+        except OSError:
+            return set(self.local)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[3] not in ('pause', 'resume', 'summary'):
+        print(__doc__.strip().splitlines()[-1].strip())
+        sys.exit(2)
+    api = XmrigApi(sys.argv[1], sys.argv[2])
+    if sys.argv[3] == 'summary':
+        print(json.dumps(api.summary(), indent=2))
+        sys.exit(0)
+    ok = getattr(api, sys.argv[3])()
+    print('OK' if ok else 'Failed')
+    sys.exit(0 if ok else 1)
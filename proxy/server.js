@@ -14,7 +14,7 @@ const path = require('path');
 // =============================================================================
 // VERSION - Update this when making changes!
 // =============================================================================
-const SERVER_VERSION = '4.4.4';
+const SERVER_VERSION = '4.4.5';
 const VERSION_DATE = '2025-12-29';
 
 // =============================================================================
@@ -2075,9 +2075,9 @@ wss.on('connection', (ws, req) => {
           
           // Send result back to worker
           if (result.submitted) {
-            ws.send(JSON.stringify({ type: 'share_result', status: 'submitted', message: 'Share submitted to pool!' }));
+            ws.send(JSON.stringify({ type: 'share_result', id: msg.id, status: 'submitted', message: 'Share submitted to pool!' }));
           } else {
-            ws.send(JSON.stringify({ type: 'share_result', status: 'error', reason: result.reason }));
+            ws.send(JSON.stringify({ type: 'share_result', id: msg.id, status: 'error', reason: result.reason }));
           }
         }
         globalStats.totalHashes++;
@@ -2135,9 +2135,13 @@ wss.on('connection', (ws, req) => {
   ws.on('close', () => {
     clearInterval(keepAlive);
     // Only delete miner entry if this is NOT an info socket (or is orphan info socket that created its own entry)
-    if (!isInfoSocket || !existingMiner) {
+    // A bridge upgrade reconnects with the same clientId before the old socket closes:
+    // only drop the entry if it still belongs to this socket
+    if ((!isInfoSocket || !existingMiner) && globalStats.activeMiners.get(clientId)?.ws === ws) {
       globalStats.activeMiners.delete(clientId);
       console.log(`[Miner #${clientId}] Disconnected (${globalStats.activeMiners.size} active)`);
+    } else if (!isInfoSocket || !existingMiner) {
+      console.log(`[Miner #${clientId}] Replaced socket disconnected`);
     } else {
       console.log(`[Info Socket] Disconnected from ${clientIP}`);
     }
@@ -2147,7 +2151,7 @@ wss.on('connection', (ws, req) => {
     console.error(`[${isInfoSocket && existingMiner ? 'Info Socket' : 'Miner #' + clientId}] Error:`, err.message);
     clearInterval(keepAlive);
     // Only delete miner entry if this is NOT an info socket (or is orphan info socket)
-    if (!isInfoSocket || !existingMiner) {
+    if ((!isInfoSocket || !existingMiner) && globalStats.activeMiners.get(clientId)?.ws === ws) {
       globalStats.activeMiners.delete(clientId);
     }
   });